@@ -4,31 +4,13 @@ This module contains @register_command decorated handlers for managing
 the sandboxing system.
 """
 
-import uuid
+import functools
+import sys
 
 from code_puppy.command_line.command_registry import register_command
 from code_puppy.messaging import emit_error, emit_info, emit_success, emit_warning
 
-
-@register_command(
-    name="sandbox",
-    description="Manage code execution sandboxing",
-    usage="/sandbox <enable|disable|status|allow-domain|allow-path>",
-    category="security",
-)
-def handle_sandbox_command(command: str) -> bool:
-    """Manage sandbox settings."""
-    try:
-        from code_puppy.sandbox import SandboxConfig
-    except ImportError:
-        emit_error("Sandboxing is not available in this installation")
-        return True
-
-    tokens = command.split()
-
-    # Show help if no subcommand
-    if len(tokens) == 1:
-        help_text = """
+_SANDBOX_HELP = """
 # 🔒 Sandbox Management
 
 The sandbox provides filesystem and network isolation for shell commands.
@@ -64,148 +46,210 @@ The sandbox provides filesystem and network isolation for shell commands.
 /sandbox status
 ```
 """
-        emit_info(help_text)
-        return True
 
-    subcommand = tokens[1].lower()
+_SANDBOX_UNAVAILABLE_HINT = (
+    "⚠️  Sandboxing is not available on this system.\n\n"
+    "**Linux:** Install bubblewrap: `apt install bubblewrap` or `yum install bubblewrap`\n"
+    "**macOS:** sandbox-exec is built-in but may require specific configurations.\n"
+    "**Windows:** Sandboxing is not yet supported."
+)
 
-    # Enable sandboxing
-    if subcommand == "enable":
-        try:
-            from code_puppy.config import set_sandbox_enabled
+# Status labels indexed by a boolean flag
+_YES_NO = ("❌ No", "✅ Yes")
+_EN_DIS = ("❌ Disabled", "✅ Enabled")
 
-            set_sandbox_enabled(True)
-            config = SandboxConfig()
-            config.enabled = True
-            emit_success("✅ Sandbox enabled! Shell commands will run in isolated environment.")
-        except Exception as e:
-            emit_error(f"Failed to enable sandbox: {e}")
-        return True
+# allow-* subcommand -> (SandboxConfig method, argument name, allowlist label)
+_ALLOW_TABLE = {
+    "allow-domain": ("add_allowed_domain", "domain", "network allowlist"),
+    "allow-path": ("add_allowed_write_path", "path", "write allowlist"),
+    "allow-read-path": ("add_allowed_read_path", "path", "read allowlist"),
+}
 
-    # Disable sandboxing
-    elif subcommand == "disable":
-        try:
-            from code_puppy.config import set_sandbox_enabled
-
-            set_sandbox_enabled(False)
-            config = SandboxConfig()
-            config.enabled = False
-            emit_warning("⚠️  Sandbox disabled. Commands will run without isolation.")
-        except Exception as e:
-            emit_error(f"Failed to disable sandbox: {e}")
-        return True
 
-    # Show status
-    elif subcommand == "status":
-        try:
-            from code_puppy.sandbox import SandboxCommandWrapper
+def _get_sandbox_config():
+    """Return the SandboxConfig shared by all /sandbox subcommands.
+
+    This is the process-wide instance the command runner also uses, so
+    mutations made here (enable/disable, allowlist additions) take effect
+    for the next shell command as well as being persisted.
+    """
+    from code_puppy.sandbox import get_sandbox_config
+
+    return get_sandbox_config()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_wrapper():
+    """Return the SandboxCommandWrapper shared by status and test.
+
+    Reusing the wrapper keeps its isolator probe from being repeated on
+    every invocation. Call ``_get_wrapper.cache_clear()`` after changing
+    sandbox state so the next query re-probes.
+    """
+    from code_puppy.sandbox import SandboxCommandWrapper
+
+    return SandboxCommandWrapper(_get_sandbox_config())
 
-            config = SandboxConfig()
-            wrapper = SandboxCommandWrapper(config)
-            status = wrapper.get_status()
 
-            status_text = f"""
+def _do_enable(tokens: list[str]) -> bool:
+    """Enable sandboxing."""
+    try:
+        from code_puppy.config import set_sandbox_enabled
+
+        set_sandbox_enabled(True)
+        config = _get_sandbox_config()
+        config.enabled = True
+        _get_wrapper.cache_clear()
+        emit_success(
+            "✅ Sandbox enabled! Shell commands will run in isolated environment."
+        )
+    except Exception as e:
+        emit_error(f"Failed to enable sandbox: {e}")
+    return True
+
+
+def _do_disable(tokens: list[str]) -> bool:
+    """Disable sandboxing."""
+    try:
+        from code_puppy.config import set_sandbox_enabled
+
+        set_sandbox_enabled(False)
+        config = _get_sandbox_config()
+        config.enabled = False
+        _get_wrapper.cache_clear()
+        emit_warning("⚠️  Sandbox disabled. Commands will run without isolation.")
+    except Exception as e:
+        emit_error(f"Failed to disable sandbox: {e}")
+    return True
+
+
+def _do_status(tokens: list[str]) -> bool:
+    """Show the current sandbox status."""
+    try:
+        wrapper = _get_wrapper()
+        status = wrapper.get_status()
+
+        enabled = _YES_NO[bool(status["enabled"])]
+        fs_isolation = _EN_DIS[bool(status["filesystem_isolation"])]
+        net_isolation = _EN_DIS[bool(status["network_isolation"])]
+        available = _YES_NO[bool(status["isolator_available"])]
+        proxy_running = _YES_NO[bool(status["proxy_running"])]
+
+        parts = [
+            f"""
 # Sandbox Status
 
-**Enabled:** {"✅ Yes" if status['enabled'] else "❌ No"}
-**Filesystem Isolation:** {"✅ Enabled" if status['filesystem_isolation'] else "❌ Disabled"}
-**Network Isolation:** {"✅ Enabled" if status['network_isolation'] else "❌ Disabled"}
+**Enabled:** {enabled}
+**Filesystem Isolation:** {fs_isolation}
+**Network Isolation:** {net_isolation}
 
-**Platform:** {status['isolator_platform']}
-**Isolator:** {status['isolator']}
-**Available:** {"✅ Yes" if status['isolator_available'] else "❌ No"}
-**Proxy Running:** {"✅ Yes" if status['proxy_running'] else "❌ No"}
+**Platform:** {status["isolator_platform"]}
+**Isolator:** {status["isolator"]}
+**Available:** {available}
+**Proxy Running:** {proxy_running}
 
-**Allowed Domains:** {status['allowed_domains_count']} domains
-**Allowed Read Paths:** {len(status['allowed_read_paths'])} paths
-**Allowed Write Paths:** {len(status['allowed_write_paths'])} paths
+**Allowed Domains:** {status["allowed_domains_count"]} domains
+**Allowed Read Paths:** {len(status["allowed_read_paths"])} paths
+**Allowed Write Paths:** {len(status["allowed_write_paths"])} paths
 """
-            if status['allowed_read_paths']:
-                status_text += "\n**Read Paths:**\n"
-                for path in status['allowed_read_paths']:
-                    status_text += f"  - {path}\n"
-
-            if status['allowed_write_paths']:
-                status_text += "\n**Write Paths:**\n"
-                for path in status['allowed_write_paths']:
-                    status_text += f"  - {path}\n"
-
-            emit_info(status_text)
-        except Exception as e:
-            emit_error(f"Failed to get sandbox status: {e}")
-        return True
+        ]
+        if status["allowed_read_paths"]:
+            parts.append("\n**Read Paths:**\n")
+            parts.extend(f"  - {path}\n" for path in status["allowed_read_paths"])
+
+        if status["allowed_write_paths"]:
+            parts.append("\n**Write Paths:**\n")
+            parts.extend(f"  - {path}\n" for path in status["allowed_write_paths"])
+
+        emit_info("".join(parts))
+    except Exception as e:
+        emit_error(f"Failed to get sandbox status: {e}")
+    return True
 
-    # Test availability
-    elif subcommand == "test":
-        try:
-            from code_puppy.sandbox import SandboxCommandWrapper
-
-            wrapper = SandboxCommandWrapper()
-            available = wrapper.is_sandboxing_available()
-
-            if available:
-                emit_success(
-                    "✅ Sandboxing is available on this system! "
-                    "Use `/sandbox enable` to activate it."
-                )
-            else:
-                emit_warning(
-                    "⚠️  Sandboxing is not available on this system.\n\n"
-                    "**Linux:** Install bubblewrap: `apt install bubblewrap` or `yum install bubblewrap`\n"
-                    "**macOS:** sandbox-exec is built-in but may require specific configurations.\n"
-                    "**Windows:** Sandboxing is not yet supported."
-                )
-        except Exception as e:
-            emit_error(f"Failed to test sandbox availability: {e}")
-        return True
 
-    # Allow domain
-    elif subcommand == "allow-domain":
-        if len(tokens) < 3:
-            emit_error("Usage: /sandbox allow-domain <domain>")
-            return True
-
-        domain = tokens[2]
-        try:
-            config = SandboxConfig()
-            config.add_allowed_domain(domain)
-            emit_success(f"✅ Added '{domain}' to network allowlist")
-        except Exception as e:
-            emit_error(f"Failed to add domain: {e}")
-        return True
+def _do_test(tokens: list[str]) -> bool:
+    """Test whether sandboxing is available on this system."""
+    try:
+        wrapper = _get_wrapper()
+        available = wrapper.is_sandboxing_available()
+
+        if available:
+            emit_success(
+                "✅ Sandboxing is available on this system! "
+                "Use `/sandbox enable` to activate it."
+            )
+        else:
+            emit_warning(_SANDBOX_UNAVAILABLE_HINT)
+    except Exception as e:
+        emit_error(f"Failed to test sandbox availability: {e}")
+    return True
 
-    # Allow write path
-    elif subcommand == "allow-path":
-        if len(tokens) < 3:
-            emit_error("Usage: /sandbox allow-path <path>")
-            return True
-
-        path = " ".join(tokens[2:])  # Support paths with spaces
-        try:
-            config = SandboxConfig()
-            config.add_allowed_write_path(path)
-            emit_success(f"✅ Added '{path}' to write allowlist")
-        except Exception as e:
-            emit_error(f"Failed to add path: {e}")
-        return True
 
-    # Allow read path
-    elif subcommand == "allow-read-path":
-        if len(tokens) < 3:
-            emit_error("Usage: /sandbox allow-read-path <path>")
-            return True
-
-        path = " ".join(tokens[2:])  # Support paths with spaces
-        try:
-            config = SandboxConfig()
-            config.add_allowed_read_path(path)
-            emit_success(f"✅ Added '{path}' to read allowlist")
-        except Exception as e:
-            emit_error(f"Failed to add read path: {e}")
+def _do_allow(tokens: list[str], kind: str) -> bool:
+    """Add the command argument to the allowlist selected by ``kind``."""
+    method_name, arg_name, label = _ALLOW_TABLE[kind]
+    # Paths keep their whitespace verbatim; a domain is a single word
+    arg = tokens[2].strip() if len(tokens) == 3 else ""
+    if not arg or (arg_name == "domain" and len(arg.split()) > 1):
+        emit_error(f"Usage: /sandbox {kind} <{arg_name}>")
         return True
 
-    else:
-        emit_error(f"Unknown subcommand: {subcommand}")
-        emit_info("Use `/sandbox` to see available commands")
+    try:
+        getattr(_get_sandbox_config(), method_name)(arg)
+        emit_success(f"✅ Added '{arg}' to {label}")
+    except Exception as e:
+        emit_error(f"Failed to add {arg_name}: {e}")
+    return True
+
 
+def _unknown(subcommand: str) -> bool:
+    """Report an unrecognised subcommand."""
+    emit_error(f"Unknown subcommand: {subcommand}")
+    emit_info("Use `/sandbox` to see available commands")
     return True
+
+
+# Subcommand name -> handler taking the tokenized command
+_SUBCOMMANDS = {
+    "enable": _do_enable,
+    "disable": _do_disable,
+    "status": _do_status,
+    "test": _do_test,
+    "allow-domain": functools.partial(_do_allow, kind="allow-domain"),
+    "allow-path": functools.partial(_do_allow, kind="allow-path"),
+    "allow-read-path": functools.partial(_do_allow, kind="allow-read-path"),
+}
+
+# Closed set of legal subcommand names
+_VALID_SUBCOMMANDS = frozenset(_SUBCOMMANDS)
+
+
+@register_command(
+    name="sandbox",
+    description="Manage code execution sandboxing",
+    usage="/sandbox <enable|disable|status|allow-domain|allow-path>",
+    category="security",
+)
+def handle_sandbox_command(command: str) -> bool:
+    """Manage sandbox settings."""
+    # Split off at most the subcommand and its argument so that paths
+    # containing whitespace are preserved verbatim.
+    tokens = command.split(maxsplit=2)
+
+    # Show help if no subcommand
+    if len(tokens) == 1:
+        emit_info(_SANDBOX_HELP)
+        return True
+
+    subcommand = sys.intern(tokens[1].lower())
+    if subcommand not in _VALID_SUBCOMMANDS:
+        return _unknown(subcommand)
+
+    # Subcommands import the sandbox package lazily; a broken dependency
+    # gets the install hint instead of a traceback
+    try:
+        import code_puppy.sandbox  # noqa: F401
+    except ImportError:
+        emit_error("Sandboxing is not available in this installation")
+        return True
+    return _SUBCOMMANDS[subcommand](tokens)
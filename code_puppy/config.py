@@ -1,13 +1,25 @@
+import atexit
 import configparser
+import contextlib
 import datetime
+import functools
+import io
 import json
 import os
-import pathlib
-from typing import Optional
-
-from code_puppy.session_storage import save_session
-
-CONFIG_DIR = os.path.join(os.getenv("HOME", os.path.expanduser("~")), ".code_puppy")
+import re
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - optional dep
+    _orjson = None
+
+# Only fall back to expanduser() (a pwd lookup) when HOME is not set at all
+_HOME = os.environ["HOME"] if "HOME" in os.environ else os.path.expanduser("~")
+CONFIG_DIR = os.path.join(_HOME, ".code_puppy")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "puppy.cfg")
 MCP_SERVERS_FILE = os.path.join(CONFIG_DIR, "mcp_servers.json")
 COMMAND_HISTORY_FILE = os.path.join(CONFIG_DIR, "command_history.txt")
@@ -21,38 +33,152 @@ _DEFAULT_SQLITE_FILE = os.path.join(CONFIG_DIR, "dbos_store.sqlite")
 DBOS_DATABASE_URL = os.environ.get(
     "DBOS_SYSTEM_DATABASE_URL", f"sqlite:///{_DEFAULT_SQLITE_FILE}"
 )
+# Old command history timestamp format: "# YYYY-MM-DD HH:MM:SS.ffffff"
+_OLD_TS_RE = re.compile(r"# (\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})\.(\d+)")
+_HISTORY_IO_BUFFER = 128 * 1024
+
 # DBOS enable switch is controlled solely via puppy.cfg using key 'enable_dbos'.
 # Default: False (DBOS disabled) unless explicitly enabled.
 
+# Values treated as "on" by the boolean getters (compared case-insensitively)
+_TRUE_VALS = frozenset({"1", "true", "yes", "on"})
+
+
+@functools.lru_cache(maxsize=64)
+def _normalize(val: str) -> str:
+    """Return ``val`` stripped and lower-cased (config values repeat, so memoize)."""
+    return val.strip().lower()
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_truthy(val: str) -> bool:
+    """Return True if ``val`` is one of _TRUE_VALS, ignoring case and whitespace."""
+    return _normalize(val) in _TRUE_VALS
+
+
+def _bool(key: str, default: bool) -> bool:
+    """Read ``key`` from puppy.cfg as a boolean, returning ``default`` if unset."""
+    val = get_value(key)
+    if val is None:
+        return default
+    # puppy.cfg values are always strings; only coerce the odd non-str
+    return _parse_truthy(val if isinstance(val, str) else str(val))
+
 
 def get_use_dbos() -> bool:
     """Return True if DBOS should be used based on 'enable_dbos' (default False)."""
-    cfg_val = get_value("enable_dbos")
-    if cfg_val is None:
-        return False
-    return str(cfg_val).strip().lower() in {"1", "true", "yes", "on"}
+    return _bool("enable_dbos", False)
 
 
 DEFAULT_SECTION = "puppy"
 REQUIRED_KEYS = ["puppy_name", "owner_name"]
 
+# Accepted values for the enumerated settings
+_VALID_COMPACTION = frozenset({"summarization", "truncation"})
+_VALID_HIGHLIGHT = frozenset({"text", "highlighted"})
+_VALID_PERMISSIONS = frozenset({"none", "low", "medium", "high", "critical"})
+_VALID_REASONING = frozenset({"low", "medium", "high"})
+
+# Fallbacks for string settings that are unset or empty in puppy.cfg
+_CFG_DEFAULTS = {
+    "puppy_name": "Puppy",
+    "owner_name": "Master",
+    "openai_reasoning_effort": "medium",
+    "compaction_strategy": "truncation",
+    "diff_highlight_style": "text",
+    "diff_addition_color": "sea_green1",
+    "diff_deletion_color": "orange1",
+}
+
 # Runtime-only autosave session ID (per-process)
 _CURRENT_AUTOSAVE_ID: Optional[str] = None
-
-# Cache containers for model validation and defaults
-_model_validation_cache = {}
+_autosave_id_lock = threading.Lock()
+
+# Autosaves landing within this window of the previous one are coalesced into a
+# single trailing write
+_AUTOSAVE_DEBOUNCE_SECONDS = 0.5
+_autosave_lock = threading.RLock()
+_last_autosave_time = 0.0
+_pending_autosave: Optional[threading.Timer] = None
+# Bumped on cancel so a timer that already fired does not write stale history
+_autosave_generation = 0
+
+# Cache containers for model defaults
 _default_model_cache = None
 _default_vision_model_cache = None
 _default_vqa_model_cache = None
 
+# model name -> max protected token count (75% of its context length)
+_ctx_cache = {}
+
+# Parsed ModelFactory.load_config() result, keyed on the source files' signatures
+_models_config_cache = {"key": None, "data": None, "index": None}
+
+# Multimodal fallbacks, in order of preference, when no model is explicitly tagged
+_VISION_CANDIDATES = (
+    "gpt-4.1",
+    "gpt-4.1-mini",
+    "gpt-4.1-nano",
+    "claude-4-0-sonnet",
+    "gemini-2.5-flash-preview-05-20",
+)
+_VQA_CANDIDATES = (
+    "gpt-4.1",
+    "gpt-4.1-mini",
+    "claude-4-0-sonnet",
+    "gemini-2.5-flash-preview-05-20",
+    "gpt-4.1-nano",
+)
+
+# Parsed puppy.cfg, reused until the file's (path, mtime, size) signature changes
+_config_lock = threading.RLock()
+_config_cache = {
+    "key": None,
+    "parser": None,
+    "written": None,
+    "values": None,
+    "values_version": None,
+    "checked": None,
+}
+
+# Cached getters re-stat puppy.cfg at most this often (seconds); writes made
+# through this module and clear_config_cache() take effect immediately
+_CONFIG_RECHECK_INTERVAL = 1.0
+
+# Placeholder for values whose interpolation fails; get_value re-raises for them
+_INTERP_ERROR = object()
+
+# Per-thread nesting depth of config_transaction()
+_config_tx = threading.local()
+
+# Parsed mcp_servers.json, keyed on its (path, mtime, size) signature
+_mcp_cache = {"key": None, "value": None}
+
+# Signature (path, mtime, size) of the last .env passed to load_dotenv
+_dotenv_key = {"key": None}
+
+# Append handle for the command history file, kept open between commands;
+# every open, write and close of it happens under _history_lock
+_history_fh: Optional[TextIO] = None
+_history_lock = threading.RLock()
+
+# Directories already created or confirmed to exist during this process
+_ensured_dirs = set()
+
+# Memoized getter results, valid only for the config version they were computed at
+_config_version = 0
+_getter_cache = {}
+
+# agent name -> pinned model, built from the agent_model_* keys per config version
+_agent_model_index = {"version": None, "models": {}}
+
 
 def ensure_config_exists():
     """
     Ensure that the .code_puppy dir and puppy.cfg exist, prompting if needed.
     Returns configparser.ConfigParser for reading.
     """
-    if not os.path.exists(CONFIG_DIR):
-        os.makedirs(CONFIG_DIR, exist_ok=True)
+    _ensure_dir(CONFIG_DIR)
     exists = os.path.isfile(CONFIG_FILE)
     config = configparser.ConfigParser()
     if exists:
@@ -82,32 +208,219 @@ def ensure_config_exists():
 
     # Write the config if we made any changes
     if missing or not exists:
-        with open(CONFIG_FILE, "w") as f:
-            config.write(f)
+        _write_config(config)
+    else:
+        _store_config(config)
     return config
 
 
+def _ensure_dir(path: str):
+    """Create ``path`` if needed, checking the filesystem only once per process."""
+    if path in _ensured_dirs:
+        return
+    if not os.path.exists(path):
+        os.makedirs(path, exist_ok=True)
+    _ensured_dirs.add(path)
+
+
+def _config_file_key():
+    """Return a signature of puppy.cfg used to detect on-disk changes."""
+    try:
+        st = os.stat(CONFIG_FILE)
+    except OSError:
+        return (CONFIG_FILE, None, None)
+    return (CONFIG_FILE, st.st_mtime_ns, st.st_size)
+
+
+def _bump_config_version():
+    """Invalidate all memoized getter results."""
+    global _config_version
+    with _config_lock:
+        _config_version += 1
+        _getter_cache.clear()
+
+
+def _store_config(config: configparser.ConfigParser, written: Optional[str] = None):
+    """Make ``config`` the cached parser for the current puppy.cfg.
+
+    ``written`` is the serialized text just written to disk, if any; it lets
+    later writes of identical content be skipped.
+    """
+    key = _config_file_key()
+    with _config_lock:
+        _config_cache["key"] = key
+        _config_cache["parser"] = config
+        _config_cache["written"] = written
+        _bump_config_version()
+
+
+def _get_parser() -> configparser.ConfigParser:
+    """Return the parsed puppy.cfg, re-reading it only if it changed on disk."""
+    key = _config_file_key()
+    with _config_lock:
+        _config_cache["checked"] = (CONFIG_FILE, time.monotonic())
+        parser = _config_cache["parser"]
+        if parser is None or _config_cache["key"] != key:
+            parser = configparser.ConfigParser()
+            parser.read(CONFIG_FILE)
+            _config_cache["key"] = key
+            _config_cache["parser"] = parser
+            _config_cache["written"] = None
+            _bump_config_version()
+        return parser
+
+
+def _cached_getter(func):
+    """Memoize a no-argument config getter until puppy.cfg changes.
+
+    The cached value is keyed on the config version, which is bumped whenever
+    the file is re-read, written, or the caches are explicitly cleared. External
+    edits are noticed on the next stat, at most _CONFIG_RECHECK_INTERVAL late.
+    """
+
+    @functools.wraps(func)
+    def wrapper():
+        checked = _config_cache["checked"]
+        if (
+            checked is None
+            or checked[0] != CONFIG_FILE
+            or time.monotonic() - checked[1] >= _CONFIG_RECHECK_INTERVAL
+        ):
+            _get_parser()
+        key = (func.__name__, _config_version)
+        try:
+            return _getter_cache[key]
+        except KeyError:
+            pass
+        value = func()
+        _getter_cache[key] = value
+        return value
+
+    return wrapper
+
+
+def _write_config(config: configparser.ConfigParser):
+    """Persist ``config`` to puppy.cfg and keep it as the cached parser.
+
+    The file is replaced atomically via a temporary file, and the write is
+    skipped when the serialized config matches what we last wrote.
+    """
+    buf = io.StringIO()
+    config.write(buf)
+    text = buf.getvalue()
+    with _config_lock:
+        if (
+            text == _config_cache["written"]
+            and _config_cache["key"] == _config_file_key()
+        ):
+            _config_cache["parser"] = config
+            return
+    tmp_file = CONFIG_FILE + ".tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            f.write(text)
+        os.replace(tmp_file, CONFIG_FILE)
+    except Exception:
+        # The in-memory parser may now disagree with the file; re-read next time
+        clear_config_cache()
+        raise
+    _store_config(config, written=text)
+
+
+@contextlib.contextmanager
+def config_transaction():
+    """Batch several config updates into a single write of puppy.cfg.
+
+    Yields the cached parser; mutations made through it (or through
+    ``set_config_value`` and friends) are written once when the outermost
+    transaction exits. If the block raises, nothing is written and the
+    pending changes are discarded.
+    """
+    with _config_lock:
+        depth = getattr(_config_tx, "depth", 0)
+        config = _get_parser()
+        _config_tx.depth = depth + 1
+        try:
+            yield config
+        except BaseException:
+            if depth == 0:
+                clear_config_cache()
+            raise
+        finally:
+            _config_tx.depth = depth
+        # Changes made directly on the parser must reach get_value's snapshot
+        _bump_config_version()
+        if depth == 0:
+            _write_config(config)
+
+
+def clear_config_cache():
+    """Drop the cached puppy.cfg parser so the next read goes to disk.
+
+    Also forgets which config directories are known to exist, the parsed
+    mcp_servers.json and which .env was last loaded.
+    """
+    with _config_lock:
+        _ensured_dirs.clear()
+        _dotenv_key["key"] = None
+        _mcp_cache["key"] = None
+        _mcp_cache["value"] = None
+        _config_cache["key"] = None
+        _config_cache["parser"] = None
+        _config_cache["written"] = None
+        _config_cache["checked"] = None
+        _bump_config_version()
+
+
+def _get_values():
+    """Return the cached parser and a flat snapshot of its [puppy] section.
+
+    The snapshot is rebuilt once per config version, so reads are a plain dict
+    lookup instead of a ConfigParser ``get`` with interpolation.
+    """
+    config = _get_parser()
+    with _config_lock:
+        if _config_cache["values_version"] != _config_version:
+            values = {}
+            if DEFAULT_SECTION in config:
+                section = config[DEFAULT_SECTION]
+                for key in section:
+                    try:
+                        values[key] = section[key]
+                    except configparser.Error:
+                        values[key] = _INTERP_ERROR
+            _config_cache["values"] = values
+            _config_cache["values_version"] = _config_version
+        return config, _config_cache["values"]
+
+
 def get_value(key: str):
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
-    val = config.get(DEFAULT_SECTION, key, fallback=None)
+    config, values = _get_values()
+    val = values.get(config.optionxform(key))
+    if val is _INTERP_ERROR:
+        return config.get(DEFAULT_SECTION, key, fallback=None)
     return val
 
 
+def _get_str(key: str) -> str:
+    """Read ``key`` from puppy.cfg, falling back to its entry in _CFG_DEFAULTS."""
+    return get_value(key) or _CFG_DEFAULTS[key]
+
+
+@_cached_getter
 def get_puppy_name():
-    return get_value("puppy_name") or "Puppy"
+    return _get_str("puppy_name")
 
 
+@_cached_getter
 def get_owner_name():
-    return get_value("owner_name") or "Master"
+    return _get_str("owner_name")
 
 
+@_cached_getter
 def get_sandbox_enabled() -> bool:
     """Get whether sandboxing is enabled."""
-    val = get_value("sandbox_enabled")
-    if val is None:
-        return False  # Opt-in by default
-    return str(val).lower() in ("1", "true", "yes", "on")
+    return _bool("sandbox_enabled", False)
 
 
 def set_sandbox_enabled(enabled: bool):
@@ -120,15 +433,13 @@ def set_sandbox_enabled(enabled: bool):
 # using get_protected_token_count() and get_summarization_threshold()
 
 
+@_cached_getter
 def get_allow_recursion() -> bool:
     """
     Get the allow_recursion configuration value.
     Returns True if recursion is allowed, False otherwise.
     """
-    val = get_value("allow_recursion")
-    if val is None:
-        return True  # Default to False for safety
-    return str(val).lower() in ("1", "true", "yes", "on")
+    return _bool("allow_recursion", True)
 
 
 def get_model_context_length() -> int:
@@ -136,9 +447,7 @@ def get_model_context_length() -> int:
     Get the context length for the currently configured model from models.json
     """
     try:
-        from code_puppy.model_factory import ModelFactory
-
-        model_configs = ModelFactory.load_config()
+        model_configs = _load_models_config()
         model_name = get_global_model_name()
 
         # Get context length from model config
@@ -175,8 +484,7 @@ def get_config_keys():
     # Add DBOS control key
     default_keys.append("enable_dbos")
 
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
+    config = _get_parser()
     keys = set(config[DEFAULT_SECTION].keys()) if DEFAULT_SECTION in config else set()
     keys.update(default_keys)
     return sorted(keys)
@@ -186,16 +494,24 @@ def set_config_value(key: str, value: str):
     """
     Sets a config value in the persistent config file.
     """
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
-    if DEFAULT_SECTION not in config:
-        config[DEFAULT_SECTION] = {}
-    config[DEFAULT_SECTION][key] = value
-    with open(CONFIG_FILE, "w") as f:
-        config.write(f)
+    with config_transaction() as config:
+        if DEFAULT_SECTION not in config:
+            config[DEFAULT_SECTION] = {}
+        config[DEFAULT_SECTION][key] = value
+        # Let getters see the new value before the transaction commits
+        _bump_config_version()
 
 
 # --- MODEL STICKY EXTENSION STARTS HERE ---
+def _load_json_file(path):
+    """Parse a JSON file, using orjson when it is installed."""
+    if _orjson is not None:
+        with open(path, "rb") as f:
+            return _orjson.loads(f.read())
+    with open(path, "r") as f:
+        return json.load(f)
+
+
 def load_mcp_server_configs():
     """
     Loads the MCP server configurations from ~/.code_puppy/mcp_servers.json.
@@ -205,16 +521,98 @@ def load_mcp_server_configs():
     from code_puppy.messaging.message_queue import emit_error
 
     try:
-        if not pathlib.Path(MCP_SERVERS_FILE).exists():
+        try:
+            st = os.stat(MCP_SERVERS_FILE)
+        except FileNotFoundError:
             return {}
-        with open(MCP_SERVERS_FILE, "r") as f:
-            conf = json.loads(f.read())
-            return conf["mcp_servers"]
+        # Reuse the last parse until the file is edited; callers must not mutate it
+        key = (MCP_SERVERS_FILE, st.st_mtime_ns, st.st_size)
+        with _config_lock:
+            if _mcp_cache["key"] == key:
+                return _mcp_cache["value"]
+        servers = _load_json_file(MCP_SERVERS_FILE)["mcp_servers"]
+        with _config_lock:
+            _mcp_cache["key"] = key
+            _mcp_cache["value"] = servers
+        return servers
     except Exception as e:
         emit_error(f"Failed to load MCP servers - {str(e)}")
         return {}
 
 
+def _models_config_key():
+    """Return (path, mtime, size) signatures for the files models are loaded from.
+
+    The bundled models.json is tracked rather than MODELS_FILE, since
+    ``ModelFactory.load_config()`` rewrites the latter on every call.
+    """
+    from code_puppy.plugins.chatgpt_oauth.config import get_chatgpt_models_path
+    from code_puppy.plugins.claude_code_oauth.config import get_claude_models_path
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "models.json"),
+        EXTRA_MODELS_FILE,
+        str(get_chatgpt_models_path()),
+        str(get_claude_models_path()),
+    )
+    key = []
+    for path in paths:
+        try:
+            st = os.stat(os.path.expanduser(path))
+        except OSError:
+            key.append((path, None, None))
+        else:
+            key.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+
+def _load_models_config():
+    """Return ``ModelFactory.load_config()``, re-loading only when a source file changes."""
+    return _load_models_with_index()[0]
+
+
+def _load_models_with_index():
+    """Return the cached models config together with its capability index."""
+    from code_puppy.model_factory import ModelFactory
+
+    key = _models_config_key()
+    with _config_lock:
+        if (
+            _models_config_cache["data"] is not None
+            and _models_config_cache["key"] == key
+        ):
+            return _models_config_cache["data"], _models_config_cache["index"]
+    data = ModelFactory.load_config()
+    index = _build_models_index(data)
+    with _config_lock:
+        _models_config_cache["key"] = key
+        _models_config_cache["data"] = data
+        _models_config_cache["index"] = index
+    return data, index
+
+
+def _build_models_index(models_config) -> dict:
+    """Precompute capability lookups for a loaded models config.
+
+    ``vision``/``vqa`` list the models explicitly tagged with
+    ``supports_vision``/``supports_vqa`` in file order, and the ``*_preferred``
+    entries hold the first present fallback candidate (or None).
+    """
+    index = {"vision": [], "vqa": []}
+    for name, config in models_config.items():
+        if config.get("supports_vision"):
+            index["vision"].append(name)
+        if config.get("supports_vqa"):
+            index["vqa"].append(name)
+    index["vision_preferred"] = next(
+        (c for c in _VISION_CANDIDATES if c in models_config), None
+    )
+    index["vqa_preferred"] = next(
+        (c for c in _VQA_CANDIDATES if c in models_config), None
+    )
+    return index
+
+
 def _default_model_from_models_json():
     """Load the default model name from models.json.
 
@@ -228,9 +626,7 @@ def _default_model_from_models_json():
         return _default_model_cache
 
     try:
-        from code_puppy.model_factory import ModelFactory
-
-        models_config = ModelFactory.load_config()
+        models_config = _load_models_config()
         if models_config:
             # Prefer synthetic-GLM-4.6 as default
             if "synthetic-GLM-4.6" in models_config:
@@ -255,28 +651,13 @@ def _default_vision_model_from_models_json() -> str:
         return _default_vision_model_cache
 
     try:
-        from code_puppy.model_factory import ModelFactory
-
-        models_config = ModelFactory.load_config()
+        models_config, index = _load_models_with_index()
         if models_config:
-            # Prefer explicitly tagged vision models
-            for name, config in models_config.items():
-                if config.get("supports_vision"):
-                    _default_vision_model_cache = name
-                    return name
-
-            # Fallback heuristic: common multimodal models
-            preferred_candidates = (
-                "gpt-4.1",
-                "gpt-4.1-mini",
-                "gpt-4.1-nano",
-                "claude-4-0-sonnet",
-                "gemini-2.5-flash-preview-05-20",
-            )
-            for candidate in preferred_candidates:
-                if candidate in models_config:
-                    _default_vision_model_cache = candidate
-                    return candidate
+            # Prefer explicitly tagged vision models, then common multimodal ones
+            name = index["vision"][0] if index["vision"] else index["vision_preferred"]
+            if name is not None:
+                _default_vision_model_cache = name
+                return name
 
             # Last resort: use the general default model
             _default_vision_model_cache = _default_model_from_models_json()
@@ -297,28 +678,13 @@ def _default_vqa_model_from_models_json() -> str:
         return _default_vqa_model_cache
 
     try:
-        from code_puppy.model_factory import ModelFactory
-
-        models_config = ModelFactory.load_config()
+        models_config, index = _load_models_with_index()
         if models_config:
-            # Allow explicit VQA hints if present
-            for name, config in models_config.items():
-                if config.get("supports_vqa"):
-                    _default_vqa_model_cache = name
-                    return name
-
-            # Reuse multimodal heuristics before falling back to generic default
-            preferred_candidates = (
-                "gpt-4.1",
-                "gpt-4.1-mini",
-                "claude-4-0-sonnet",
-                "gemini-2.5-flash-preview-05-20",
-                "gpt-4.1-nano",
-            )
-            for candidate in preferred_candidates:
-                if candidate in models_config:
-                    _default_vqa_model_cache = candidate
-                    return candidate
+            # Allow explicit VQA hints, then reuse multimodal heuristics
+            name = index["vqa"][0] if index["vqa"] else index["vqa_preferred"]
+            if name is not None:
+                _default_vqa_model_cache = name
+                return name
 
             _default_vqa_model_cache = _default_model_from_models_json()
             return _default_vqa_model_cache
@@ -331,36 +697,24 @@ def _default_vqa_model_from_models_json() -> str:
 
 
 def _validate_model_exists(model_name: str) -> bool:
-    """Check if a model exists in models.json with caching to avoid redundant calls."""
-    global _model_validation_cache
-
-    # Check cache first
-    if model_name in _model_validation_cache:
-        return _model_validation_cache[model_name]
-
+    """Check if a model exists in the (cached) models config."""
     try:
-        from code_puppy.model_factory import ModelFactory
-
-        models_config = ModelFactory.load_config()
-        exists = model_name in models_config
-
-        # Cache the result
-        _model_validation_cache[model_name] = exists
-        return exists
+        models_config = _load_models_config()
     except Exception:
         # If we can't validate, assume it exists to avoid breaking things
-        _model_validation_cache[model_name] = True
         return True
+    return model_name in models_config
 
 
 def clear_model_cache():
-    """Clear the model validation cache. Call this when models.json changes."""
-    global \
-        _model_validation_cache, \
-        _default_model_cache, \
-        _default_vision_model_cache, \
-        _default_vqa_model_cache
-    _model_validation_cache.clear()
+    """Clear the cached models config and defaults. Call this when models.json changes."""
+    global _default_model_cache, _default_vision_model_cache, _default_vqa_model_cache
+    _ctx_cache.clear()
+    with _config_lock:
+        _models_config_cache["key"] = None
+        _models_config_cache["data"] = None
+        _models_config_cache["index"] = None
+    _bump_config_version()
     _default_model_cache = None
     _default_vision_model_cache = None
     _default_vqa_model_cache = None
@@ -389,13 +743,10 @@ def get_global_model_name():
 
 def set_model_name(model: str):
     """Sets the model name in the persistent config file."""
-    config = configparser.ConfigParser()
-    config.read(CONFIG_FILE)
-    if DEFAULT_SECTION not in config:
-        config[DEFAULT_SECTION] = {}
-    config[DEFAULT_SECTION]["model"] = model or ""
-    with open(CONFIG_FILE, "w") as f:
-        config.write(f)
+    with config_transaction() as config:
+        if DEFAULT_SECTION not in config:
+            config[DEFAULT_SECTION] = {}
+        config[DEFAULT_SECTION]["model"] = model or ""
 
     # Clear model cache when switching models to ensure fresh validation
     clear_model_cache()
@@ -425,22 +776,21 @@ def set_puppy_token(token: str):
     set_config_value("puppy_token", token)
 
 
+@_cached_getter
 def get_openai_reasoning_effort() -> str:
     """Return the configured OpenAI reasoning effort (low, medium, high)."""
-    allowed_values = {"low", "medium", "high"}
-    configured = (get_value("openai_reasoning_effort") or "medium").strip().lower()
-    if configured not in allowed_values:
-        return "medium"
+    configured = _normalize(_get_str("openai_reasoning_effort"))
+    if configured not in _VALID_REASONING:
+        return _CFG_DEFAULTS["openai_reasoning_effort"]
     return configured
 
 
 def set_openai_reasoning_effort(value: str) -> None:
     """Persist the OpenAI reasoning effort ensuring it remains within allowed values."""
-    allowed_values = {"low", "medium", "high"}
     normalized = (value or "").strip().lower()
-    if normalized not in allowed_values:
+    if normalized not in _VALID_REASONING:
         raise ValueError(
-            f"Invalid reasoning effort '{value}'. Allowed: {', '.join(sorted(allowed_values))}"
+            f"Invalid reasoning effort '{value}'. Allowed: {', '.join(sorted(_VALID_REASONING))}"
         )
     set_config_value("openai_reasoning_effort", normalized)
 
@@ -456,7 +806,6 @@ def normalize_command_history():
     - "# 2025-08-05T10:35:33" (ISO)
     """
     import os
-    import re
 
     # Skip implementation during tests
     import sys
@@ -469,19 +818,8 @@ def normalize_command_history():
     if not command_history_exists:
         return
 
+    tmp_file = COMMAND_HISTORY_FILE + ".tmp"
     try:
-        # Read the entire file
-        with open(COMMAND_HISTORY_FILE, "r") as f:
-            content = f.read()
-
-        # Skip empty files
-        if not content.strip():
-            return
-
-        # Define regex pattern for old timestamp format
-        # Format: "# YYYY-MM-DD HH:MM:SS.ffffff"
-        old_timestamp_pattern = r"# (\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})\.(\d+)"
-
         # Function to convert matched timestamp to ISO format
         def convert_to_iso(match):
             date = match.group(1)
@@ -489,19 +827,34 @@ def normalize_command_history():
             # Create ISO format (YYYY-MM-DDThh:mm:ss)
             return f"# {date}T{time}"
 
-        # Replace all occurrences of the old timestamp format with the new ISO format
-        updated_content = re.sub(old_timestamp_pattern, convert_to_iso, content)
-
-        # Write the updated content back to the file only if changes were made
-        if content != updated_content:
-            with open(COMMAND_HISTORY_FILE, "w") as f:
-                f.write(updated_content)
+        # Stream line by line into a temp file so large histories aren't held in memory
+        changed = False
+        with (
+            open(COMMAND_HISTORY_FILE, "r", buffering=_HISTORY_IO_BUFFER) as src,
+            open(tmp_file, "w", buffering=_HISTORY_IO_BUFFER) as dst,
+        ):
+            for line in src:
+                new_line, count = _OLD_TS_RE.subn(convert_to_iso, line)
+                if count:
+                    changed = True
+                dst.write(new_line)
+
+        # Swap the file in only if changes were made
+        if changed:
+            with _history_lock:
+                # The open append handle would keep writing to the old file
+                _close_history_fh()
+                os.replace(tmp_file, COMMAND_HISTORY_FILE)
+        else:
+            os.remove(tmp_file)
     except Exception as e:
         from rich.console import Console
 
         direct_console = Console()
         error_msg = f"❌ An unexpected error occurred while normalizing command history: {str(e)}"
         direct_console.print(f"[bold red]{error_msg}[/bold red]")
+        with contextlib.suppress(OSError):
+            os.remove(tmp_file)
 
 
 def get_user_agents_directory() -> str:
@@ -511,7 +864,7 @@ def get_user_agents_directory() -> str:
         Path to the user's Code Puppy agents directory.
     """
     # Ensure the agents directory exists
-    os.makedirs(AGENTS_DIR, exist_ok=True)
+    _ensure_dir(AGENTS_DIR)
     return AGENTS_DIR
 
 
@@ -524,8 +877,7 @@ def initialize_command_history_file():
     from pathlib import Path
 
     # Ensure the config directory exists before trying to create the history file
-    if not os.path.exists(CONFIG_DIR):
-        os.makedirs(CONFIG_DIR, exist_ok=True)
+    _ensure_dir(CONFIG_DIR)
 
     command_history_exists = os.path.isfile(COMMAND_HISTORY_FILE)
     if not command_history_exists:
@@ -553,21 +905,17 @@ def initialize_command_history_file():
             direct_console.print(f"[bold red]{error_msg}[/bold red]")
 
 
+@_cached_getter
 def get_yolo_mode():
     """
     Checks puppy.cfg for 'yolo_mode' (case-insensitive in value only).
     Defaults to True if not set.
     Allowed values for ON: 1, '1', 'true', 'yes', 'on' (all case-insensitive for value).
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("yolo_mode")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return True
+    return _bool("yolo_mode", True)
 
 
+@_cached_getter
 def get_safety_permission_level():
     """
     Checks puppy.cfg for 'safety_permission_level' (case-insensitive in value only).
@@ -575,15 +923,15 @@ def get_safety_permission_level():
     Allowed values: 'none', 'low', 'medium', 'high', 'critical' (all case-insensitive for value).
     Returns the normalized lowercase string.
     """
-    valid_levels = {"none", "low", "medium", "high", "critical"}
     cfg_val = get_value("safety_permission_level")
     if cfg_val is not None:
-        normalized = str(cfg_val).strip().lower()
-        if normalized in valid_levels:
+        normalized = _normalize(cfg_val if isinstance(cfg_val, str) else str(cfg_val))
+        if normalized in _VALID_PERMISSIONS:
             return normalized
     return "medium"  # Default to medium risk threshold
 
 
+@_cached_getter
 def get_mcp_disabled():
     """
     Checks puppy.cfg for 'disable_mcp' (case-insensitive in value only).
@@ -591,15 +939,10 @@ def get_mcp_disabled():
     Allowed values for ON: 1, '1', 'true', 'yes', 'on' (all case-insensitive for value).
     When enabled, Code Puppy will skip loading MCP servers entirely.
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("disable_mcp")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return False
+    return _bool("disable_mcp", False)
 
 
+@_cached_getter
 def get_grep_output_verbose():
     """
     Checks puppy.cfg for 'grep_output_verbose' (case-insensitive in value only).
@@ -609,13 +952,7 @@ def get_grep_output_verbose():
     When False (default): Shows only file names with match counts
     When True: Shows full output with line numbers and content
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("grep_output_verbose")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return False
+    return _bool("grep_output_verbose", False)
 
 
 def get_protected_token_count():
@@ -627,11 +964,9 @@ def get_protected_token_count():
     Enforces that protected tokens don't exceed 75% of model context length.
     """
     val = get_value("protected_token_count")
+    # Enforce the 75% limit of the model context length
+    max_protected_tokens = _max_protected_tokens()
     try:
-        # Get the model context length to enforce the 75% limit
-        model_context_length = get_model_context_length()
-        max_protected_tokens = int(model_context_length * 0.75)
-
         # Parse the configured value
         configured_value = int(val) if val else 50000
 
@@ -639,11 +974,20 @@ def get_protected_token_count():
         return max(1000, min(configured_value, max_protected_tokens))
     except (ValueError, TypeError):
         # If parsing fails, return a reasonable default that respects the 75% limit
-        model_context_length = get_model_context_length()
-        max_protected_tokens = int(model_context_length * 0.75)
         return min(50000, max_protected_tokens)
 
 
+def _max_protected_tokens() -> int:
+    """Return 75% of the current model's context length, cached per model name."""
+    model_name = get_global_model_name()
+    limit = _ctx_cache.get(model_name)
+    if limit is None:
+        limit = int(get_model_context_length() * 0.75)
+        _ctx_cache[model_name] = limit
+    return limit
+
+
+@_cached_getter
 def get_compaction_threshold():
     """
     Returns the user-configured compaction threshold as a float between 0.0 and 1.0.
@@ -660,6 +1004,7 @@ def get_compaction_threshold():
         return 0.85
 
 
+@_cached_getter
 def get_compaction_strategy() -> str:
     """
     Returns the user-configured compaction strategy.
@@ -668,21 +1013,19 @@ def get_compaction_strategy() -> str:
     Configurable by 'compaction_strategy' key.
     """
     val = get_value("compaction_strategy")
-    if val and val.lower() in ["summarization", "truncation"]:
-        return val.lower()
-    # Default to summarization
-    return "truncation"
+    val = val.lower() if val else None
+    if val in _VALID_COMPACTION:
+        return val
+    return _CFG_DEFAULTS["compaction_strategy"]
 
 
+@_cached_getter
 def get_http2() -> bool:
     """
     Get the http2 configuration value.
     Returns False if not set (default).
     """
-    val = get_value("http2")
-    if val is None:
-        return False
-    return str(val).lower() in ("1", "true", "yes", "on")
+    return _bool("http2", False)
 
 
 def set_http2(enabled: bool) -> None:
@@ -714,18 +1057,44 @@ def get_message_limit(default: int = 100) -> int:
         return default
 
 
+def _get_history_fh() -> TextIO:
+    """Return the shared append handle for COMMAND_HISTORY_FILE, opening it lazily."""
+    global _history_fh
+    with _history_lock:
+        if _history_fh is None or _history_fh.name != COMMAND_HISTORY_FILE:
+            _close_history_fh()
+            # Long-lived on purpose; closed by _close_history_fh at exit
+            _history_fh = open(  # noqa: SIM115
+                COMMAND_HISTORY_FILE, "a", buffering=1, encoding="utf-8"
+            )
+        return _history_fh
+
+
+def _close_history_fh():
+    """Close the shared history handle; the next save reopens the file."""
+    global _history_fh
+    with _history_lock:
+        if _history_fh is not None:
+            with contextlib.suppress(Exception):
+                _history_fh.close()
+            _history_fh = None
+
+
+atexit.register(_close_history_fh)
+
+
 def save_command_to_history(command: str):
     """Save a command to the history file with an ISO format timestamp.
 
     Args:
         command: The command to save
     """
-    import datetime
-
     try:
+        # isoformat() is several times faster than an equivalent strftime()
         timestamp = datetime.datetime.now().isoformat(timespec="seconds")
-        with open(COMMAND_HISTORY_FILE, "a") as f:
-            f.write(f"\n# {timestamp}\n{command}\n")
+        with _history_lock:
+            # Line buffering flushes each entry as soon as it is written
+            _get_history_fh().write(f"\n# {timestamp}\n{command}\n")
     except Exception as e:
         from rich.console import Console
 
@@ -745,7 +1114,22 @@ def get_agent_pinned_model(agent_name: str) -> str:
     Returns:
         Pinned model name, or None if no model is pinned for this agent.
     """
-    return get_value(f"agent_model_{agent_name}")
+    # Built from the flat snapshot, so one bad '%' value elsewhere in the
+    # section cannot break lookups for every agent
+    config, values = _get_values()
+    with _config_lock:
+        if _agent_model_index["version"] != _config_version:
+            prefix = "agent_model_"
+            _agent_model_index["models"] = {
+                key[len(prefix) :]: value
+                for key, value in values.items()
+                if key.startswith(prefix)
+            }
+            _agent_model_index["version"] = _config_version
+        model = _agent_model_index["models"].get(config.optionxform(agent_name))
+    if model is _INTERP_ERROR:
+        return get_value(f"agent_model_{agent_name}")
+    return model or None
 
 
 def set_agent_pinned_model(agent_name: str, model_name: str):
@@ -769,19 +1153,14 @@ def clear_agent_pinned_model(agent_name: str):
     set_config_value(f"agent_model_{agent_name}", "")
 
 
+@_cached_getter
 def get_auto_save_session() -> bool:
     """
     Checks puppy.cfg for 'auto_save_session' (case-insensitive in value only).
     Defaults to True if not set.
     Allowed values for ON: 1, '1', 'true', 'yes', 'on' (all case-insensitive for value).
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("auto_save_session")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return True
+    return _bool("auto_save_session", True)
 
 
 def set_auto_save_session(enabled: bool):
@@ -793,6 +1172,7 @@ def set_auto_save_session(enabled: bool):
     set_config_value("auto_save_session", "true" if enabled else "false")
 
 
+@_cached_getter
 def get_max_saved_sessions() -> int:
     """
     Gets the maximum number of sessions to keep.
@@ -817,6 +1197,7 @@ def set_max_saved_sessions(max_sessions: int):
     set_config_value("max_saved_sessions", str(max_sessions))
 
 
+@_cached_getter
 def get_diff_highlight_style() -> str:
     """
     Get the diff highlight style preference.
@@ -824,9 +1205,10 @@ def get_diff_highlight_style() -> str:
     Returns 'highlighted' if not set or invalid.
     """
     val = get_value("diff_highlight_style")
-    if val and val.lower() in ["text", "highlighted"]:
-        return val.lower()
-    return "text"  # Default to intelligent highlighting
+    val = val.lower() if val else None
+    if val in _VALID_HIGHLIGHT:
+        return val
+    return _CFG_DEFAULTS["diff_highlight_style"]
 
 
 def set_diff_highlight_style(style: str):
@@ -835,20 +1217,18 @@ def set_diff_highlight_style(style: str):
     Args:
         style: 'text' for plain text diffs, 'highlighted' for intelligent color pairs
     """
-    if style.lower() not in ["text", "highlighted"]:
+    if style.lower() not in _VALID_HIGHLIGHT:
         raise ValueError("diff_highlight_style must be 'text' or 'highlighted'")
     set_config_value("diff_highlight_style", style.lower())
 
 
+@_cached_getter
 def get_diff_addition_color() -> str:
     """
     Get the base color for diff additions.
     Default: green
     """
-    val = get_value("diff_addition_color")
-    if val:
-        return val
-    return "sea_green1"  # Default to green
+    return _get_str("diff_addition_color")
 
 
 def set_diff_addition_color(color: str):
@@ -860,15 +1240,13 @@ def set_diff_addition_color(color: str):
     set_config_value("diff_addition_color", color)
 
 
+@_cached_getter
 def get_diff_deletion_color() -> str:
     """
     Get the base color for diff deletions.
     Default: orange1
     """
-    val = get_value("diff_deletion_color")
-    if val:
-        return val
-    return "orange1"  # Default to orange1
+    return _get_str("diff_deletion_color")
 
 
 def set_diff_deletion_color(color: str):
@@ -880,12 +1258,23 @@ def set_diff_deletion_color(color: str):
     set_config_value("diff_deletion_color", color)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_diff_modules():
+    """Import the diff rendering helpers once, on first use."""
+    from code_puppy.messaging import emit_info
+    from code_puppy.tools.file_modifications import (
+        _colorize_diff,
+        _get_optimal_color_pair,
+    )
+
+    return emit_info, _colorize_diff, _get_optimal_color_pair
+
+
 def _emit_diff_style_example():
     """Emit a small diff example showing the current style configuration."""
 
     try:
-        from code_puppy.messaging import emit_info
-        from code_puppy.tools.file_modifications import _colorize_diff
+        emit_info, _colorize_diff, _get_optimal_color_pair = _get_diff_modules()
 
         # Create a simple diff example
         example_diff = """--- a/example.txt
@@ -902,8 +1291,6 @@ def _emit_diff_style_example():
         del_color = get_diff_deletion_color()
 
         # Get the actual color pairs being used
-        from code_puppy.tools.file_modifications import _get_optimal_color_pair
-
         add_fg, add_bg = _get_optimal_color_pair(add_color, "green")
         del_fg, del_bg = _get_optimal_color_pair(del_color, "orange1")
 
@@ -940,20 +1327,32 @@ def _emit_diff_style_example():
         pass
 
 
+def _autosave_timestamp() -> str:
+    """Local time as YYYYMMDD_HHMMSS for autosave IDs."""
+    # time.strftime skips building a datetime object first (~6x faster)
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
 def get_current_autosave_id() -> str:
     """Get or create the current autosave session ID for this process."""
     global _CURRENT_AUTOSAVE_ID
-    if not _CURRENT_AUTOSAVE_ID:
-        # Use a full timestamp so tests and UX can predict the name if needed
-        _CURRENT_AUTOSAVE_ID = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    return _CURRENT_AUTOSAVE_ID
+    current = _CURRENT_AUTOSAVE_ID
+    if current:
+        return current
+    with _autosave_id_lock:
+        if not _CURRENT_AUTOSAVE_ID:
+            # Use a full timestamp so tests and UX can predict the name if needed
+            _CURRENT_AUTOSAVE_ID = _autosave_timestamp()
+        return _CURRENT_AUTOSAVE_ID
 
 
 def rotate_autosave_id() -> str:
     """Force a new autosave session ID and return it."""
     global _CURRENT_AUTOSAVE_ID
-    _CURRENT_AUTOSAVE_ID = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    return _CURRENT_AUTOSAVE_ID
+    new_id = _autosave_timestamp()
+    with _autosave_id_lock:
+        _CURRENT_AUTOSAVE_ID = new_id
+    return new_id
 
 
 def get_current_autosave_session_name() -> str:
@@ -970,25 +1369,101 @@ def set_current_autosave_from_session_name(session_name: str) -> str:
     global _CURRENT_AUTOSAVE_ID
     prefix = "auto_session_"
     if session_name.startswith(prefix):
-        _CURRENT_AUTOSAVE_ID = session_name[len(prefix) :]
+        new_id = session_name[len(prefix) :]
     else:
-        _CURRENT_AUTOSAVE_ID = session_name
-    return _CURRENT_AUTOSAVE_ID
+        new_id = session_name
+    with _autosave_id_lock:
+        _CURRENT_AUTOSAVE_ID = new_id
+    return new_id
 
 
 def auto_save_session_if_enabled() -> bool:
-    """Automatically save the current session if auto_save_session is enabled."""
+    """Automatically save the current session if auto_save_session is enabled.
+
+    The first save in a burst is written immediately; further calls within
+    ``_AUTOSAVE_DEBOUNCE_SECONDS`` schedule one trailing save that picks up the
+    latest history.
+    """
+    global _pending_autosave
     if not get_auto_save_session():
         return False
 
-    try:
-        import pathlib
+    with _autosave_lock:
+        if _pending_autosave is not None:
+            return True
+        wait = _last_autosave_time + _AUTOSAVE_DEBOUNCE_SECONDS - time.monotonic()
+        if wait > 0:
+            timer = threading.Timer(
+                wait, _run_pending_autosave, args=(_autosave_generation,)
+            )
+            timer.daemon = True
+            _pending_autosave = timer
+            timer.start()
+            return True
+        return _flush_autosave()
+
+
+def _run_pending_autosave(generation: int) -> None:
+    """Timer callback: perform the deferred autosave unless it was cancelled."""
+    global _pending_autosave
+    with _autosave_lock:
+        if generation != _autosave_generation:
+            return
+        _pending_autosave = None
+        _flush_autosave()
+
+
+def _cancel_pending_autosave() -> None:
+    """Drop any deferred autosave and reset the debounce window."""
+    global _pending_autosave, _last_autosave_time, _autosave_generation
+    with _autosave_lock:
+        if _pending_autosave is not None:
+            _pending_autosave.cancel()
+            _pending_autosave = None
+        _autosave_generation += 1
+        _last_autosave_time = 0.0
+
+
+def _flush_pending_autosave() -> None:
+    """Write a deferred autosave now instead of waiting for its timer."""
+    with _autosave_lock:
+        if _pending_autosave is None:
+            return
+        _cancel_pending_autosave()
+        _flush_autosave()
+
+
+atexit.register(_flush_pending_autosave)
+
+
+_autosave_console = None
+
 
+def _get_autosave_console():
+    """Return the Console used for autosave notices, created on first use."""
+    global _autosave_console
+    if _autosave_console is None:
         from rich.console import Console
 
-        from code_puppy.agents.agent_manager import get_current_agent
+        _autosave_console = Console()
+    return _autosave_console
+
+
+@functools.lru_cache(maxsize=4)
+def _autosave_path(autosave_dir: str):
+    """Return ``autosave_dir`` as a Path (memoized; AUTOSAVE_DIR rarely moves)."""
+    import pathlib
 
-        console = Console()
+    return pathlib.Path(autosave_dir)
+
+
+def _flush_autosave() -> bool:
+    """Serialize the current agent history to the autosave session."""
+    global _last_autosave_time
+    _last_autosave_time = time.monotonic()
+    try:
+        # Deferred: agent_manager imports this module
+        from code_puppy.agents.agent_manager import get_current_agent
 
         current_agent = get_current_agent()
         history = current_agent.get_message_history()
@@ -997,30 +1472,38 @@ def auto_save_session_if_enabled() -> bool:
 
         now = datetime.datetime.now()
         session_name = get_current_autosave_session_name()
-        autosave_dir = pathlib.Path(AUTOSAVE_DIR)
 
+        # Module attribute lookup goes through __getattr__ and honours patches
+        save_session = sys.modules[__name__].save_session
         metadata = save_session(
             history=history,
             session_name=session_name,
-            base_dir=autosave_dir,
+            base_dir=_autosave_path(AUTOSAVE_DIR),
             timestamp=now.isoformat(),
             token_estimator=current_agent.estimate_tokens_for_message,
             auto_saved=True,
+            compress=True,
         )
 
-        console.print(
+        _get_autosave_console().print(
             f"🐾 [dim]Auto-saved session: {metadata.message_count} messages ({metadata.total_tokens} tokens)[/dim]"
         )
 
         return True
 
     except Exception as exc:  # pragma: no cover - defensive logging
-        from rich.console import Console
-
-        Console().print(f"[dim]❌ Failed to auto-save session: {exc}[/dim]")
+        _get_autosave_console().print(
+            f"[dim]❌ Failed to auto-save session: {exc}[/dim]"
+        )
         return False
 
 
+_DIFF_CONTEXT_DEFAULT = 6
+_DIFF_CONTEXT_MIN = 0
+_DIFF_CONTEXT_MAX = 50
+
+
+@_cached_getter
 def get_diff_context_lines() -> int:
     """
     Returns the user-configured number of context lines for diff display.
@@ -1028,21 +1511,23 @@ def get_diff_context_lines() -> int:
     Defaults to 6 if unset or misconfigured.
     Configurable by 'diff_context_lines' key.
     """
-    val = get_value("diff_context_lines")
     try:
-        context_lines = int(val) if val else 6
-        # Apply reasonable bounds: minimum 0, maximum 50
-        return max(0, min(context_lines, 50))
+        context_lines = int(get_value("diff_context_lines") or _DIFF_CONTEXT_DEFAULT)
     except (ValueError, TypeError):
-        return 6
+        return _DIFF_CONTEXT_DEFAULT
+    # Apply reasonable bounds: minimum 0, maximum 50
+    return min(max(context_lines, _DIFF_CONTEXT_MIN), _DIFF_CONTEXT_MAX)
 
 
 def finalize_autosave_session() -> str:
     """Persist the current autosave snapshot and rotate to a fresh session."""
+    # Drop any deferred save so the snapshot is written now, before the rotate
+    _cancel_pending_autosave()
     auto_save_session_if_enabled()
     return rotate_autosave_id()
 
 
+@_cached_getter
 def get_suppress_thinking_messages() -> bool:
     """
     Checks puppy.cfg for 'suppress_thinking_messages' (case-insensitive in value only).
@@ -1050,13 +1535,7 @@ def get_suppress_thinking_messages() -> bool:
     Allowed values for ON: 1, '1', 'true', 'yes', 'on' (all case-insensitive for value).
     When enabled, thinking messages (agent_reasoning, planned_next_steps) will be hidden.
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("suppress_thinking_messages")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return False
+    return _bool("suppress_thinking_messages", False)
 
 
 def set_suppress_thinking_messages(enabled: bool):
@@ -1068,6 +1547,7 @@ def set_suppress_thinking_messages(enabled: bool):
     set_config_value("suppress_thinking_messages", "true" if enabled else "false")
 
 
+@_cached_getter
 def get_suppress_informational_messages() -> bool:
     """
     Checks puppy.cfg for 'suppress_informational_messages' (case-insensitive in value only).
@@ -1075,13 +1555,7 @@ def get_suppress_informational_messages() -> bool:
     Allowed values for ON: 1, '1', 'true', 'yes', 'on' (all case-insensitive for value).
     When enabled, informational messages (info, success, warning) will be hidden.
     """
-    true_vals = {"1", "true", "yes", "on"}
-    cfg_val = get_value("suppress_informational_messages")
-    if cfg_val is not None:
-        if str(cfg_val).strip().lower() in true_vals:
-            return True
-        return False
-    return False
+    return _bool("suppress_informational_messages", False)
 
 
 def set_suppress_informational_messages(enabled: bool):
@@ -1116,6 +1590,19 @@ def set_api_key(key_name: str, value: str):
     set_config_value(key_name, value)
 
 
+_API_KEY_NAMES = (
+    "OPENAI_API_KEY",
+    "GEMINI_API_KEY",
+    "ANTHROPIC_API_KEY",
+    "CEREBRAS_API_KEY",
+    "SYN_API_KEY",
+    "AZURE_OPENAI_API_KEY",
+    "AZURE_OPENAI_ENDPOINT",
+    "OPENROUTER_API_KEY",
+    "ZAI_API_KEY",
+)
+
+
 def load_api_keys_to_environment():
     """Load all API keys from .env and puppy.cfg into environment variables.
 
@@ -1126,43 +1613,42 @@ def load_api_keys_to_environment():
 
     This should be called on startup to ensure API keys are available.
     """
-    from pathlib import Path
-
-    api_key_names = [
-        "OPENAI_API_KEY",
-        "GEMINI_API_KEY",
-        "ANTHROPIC_API_KEY",
-        "CEREBRAS_API_KEY",
-        "SYN_API_KEY",
-        "AZURE_OPENAI_API_KEY",
-        "AZURE_OPENAI_ENDPOINT",
-        "OPENROUTER_API_KEY",
-        "ZAI_API_KEY",
-    ]
-
     # Step 1: Load from .env file if it exists (highest priority)
-    # Look for .env in current working directory
-    env_file = Path.cwd() / ".env"
-    if env_file.exists():
-        try:
-            from dotenv import load_dotenv
-
-            # override=True means .env values take precedence over existing env vars
-            load_dotenv(env_file, override=True)
-        except ImportError:
-            # python-dotenv not installed, skip .env loading
-            pass
+    # Look for .env in current working directory; skip it if unchanged since
+    # the last load
+    env_file = os.path.join(os.getcwd(), ".env")
+    try:
+        st = os.stat(env_file)
+    except OSError:
+        st = None
+    if st is not None:
+        key = (env_file, st.st_mtime_ns, st.st_size)
+        if _dotenv_key["key"] != key:
+            try:
+                from dotenv import load_dotenv
+
+                # override=True means .env values take precedence over existing env vars
+                load_dotenv(env_file, override=True)
+                _dotenv_key["key"] = key
+            except ImportError:
+                # python-dotenv not installed, skip .env loading
+                pass
 
     # Step 2: Load from puppy.cfg, but only if not already set
     # This ensures .env has priority over puppy.cfg
-    for key_name in api_key_names:
-        # Only load from config if not already in environment
-        if key_name not in os.environ or not os.environ[key_name]:
+    missing = [name for name in _API_KEY_NAMES if not os.environ.get(name)]
+    if not missing:
+        return
+    config, values = _get_values()
+    for key_name in missing:
+        value = values.get(config.optionxform(key_name))
+        if value is _INTERP_ERROR:
             value = get_api_key(key_name)
-            if value:
-                os.environ[key_name] = value
+        if value:
+            os.environ[key_name] = value
 
 
+@_cached_getter
 def get_default_agent() -> str:
     """
     Get the default agent name from puppy.cfg.
@@ -1181,3 +1667,13 @@ def set_default_agent(agent_name: str) -> None:
         agent_name: The name of the agent to set as default.
     """
     set_config_value("default_agent", agent_name)
+
+
+def __getattr__(name: str):
+    # PEP 562: defer importing session storage until save_session is needed
+    if name == "save_session":
+        from code_puppy.session_storage import save_session
+
+        globals()["save_session"] = save_session
+        return save_session
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
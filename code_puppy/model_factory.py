@@ -24,7 +24,7 @@ from code_puppy.plugins.claude_code_oauth.utils import load_claude_models_filter
 
 from . import callbacks
 from .claude_cache_client import ClaudeCacheAsyncClient, patch_anthropic_client_messages
-from .config import EXTRA_MODELS_FILE
+from .config import EXTRA_MODELS_FILE, _load_json_file
 from .http_utils import create_async_client, get_cert_bundle_path, get_http2
 from .round_robin_model import RoundRobinModel
 
@@ -119,8 +119,7 @@ class ModelFactory:
                 with open(pathlib.Path(MODELS_FILE), "w") as target:
                     target.write(src.read())
 
-            with open(MODELS_FILE, "r") as f:
-                config = json.load(f)
+            config = _load_json_file(MODELS_FILE)
 
         extra_sources = [
             (pathlib.Path(EXTRA_MODELS_FILE), "extra models"),
@@ -137,8 +136,7 @@ class ModelFactory:
                 if "Claude Code OAuth" in label:
                     extra_config = load_claude_models_filtered()
                 else:
-                    with open(path, "r") as f:
-                        extra_config = json.load(f)
+                    extra_config = _load_json_file(path)
                 config.update(extra_config)
             except json.JSONDecodeError as exc:
                 logging.getLogger(__name__).warning(
@@ -13,13 +13,14 @@ Supports:
 """
 
 from .command_wrapper import SandboxCommandWrapper
-from .config import SandboxConfig
+from .config import SandboxConfig, get_sandbox_config
 from .filesystem_isolation import get_filesystem_isolator
 from .retry_handler import SandboxRetryHandler
 
 __all__ = [
     "SandboxCommandWrapper",
     "SandboxConfig",
+    "get_sandbox_config",
     "get_filesystem_isolator",
     "SandboxRetryHandler",
 ]
@@ -2,13 +2,56 @@
 Base classes and interfaces for sandbox implementations.
 """
 
+import functools
+import os
 import platform
+import types
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from dataclasses import dataclass
 from typing import Optional
 
-
-@dataclass
+# Default denied paths for security
+_DEFAULT_DENIED_READ_PATHS = (
+    "~/.ssh",
+    "~/.aws",
+    "~/.gnupg",
+    "~/.config/gcloud",
+    "/etc/passwd",
+    "/etc/shadow",
+)
+
+# Proxy settings exported to sandboxed commands under network isolation
+_PROXY_URL = "socks5://localhost:9050"  # Will be configured later
+_PROXY_ENV = types.MappingProxyType(
+    {
+        "HTTP_PROXY": _PROXY_URL,
+        "HTTPS_PROXY": _PROXY_URL,
+        "http_proxy": _PROXY_URL,
+        "https_proxy": _PROXY_URL,
+    }
+)
+
+
+@functools.lru_cache(maxsize=8)
+def _default_denied_under(home: str) -> tuple[str, ...]:
+    """Return the default denied paths with ``~`` expanded to ``home``."""
+    return tuple(
+        os.path.join(home, p[2:]) if p.startswith("~/") else p
+        for p in _DEFAULT_DENIED_READ_PATHS
+    )
+
+
+def _expanded_default_denied() -> tuple[str, ...]:
+    """Return the default denied paths under the current home directory.
+
+    Only the expansion is cached, keyed on the home directory, so a later
+    HOME change still masks the right directories.
+    """
+    return _default_denied_under(os.path.expanduser("~"))
+
+
+@dataclass(slots=True)
 class SandboxOptions:
     """Options for sandbox execution."""
 
@@ -31,7 +74,7 @@ class SandboxOptions:
     cwd: str = "."
 
     # Environment variables
-    env: Optional[dict[str, str]] = None
+    env: Optional[Mapping[str, str]] = None
 
     # Resource limits
     max_memory_mb: Optional[int] = None  # Maximum memory in MB
@@ -45,15 +88,7 @@ class SandboxOptions:
         if self.allowed_write_paths is None:
             self.allowed_write_paths = []
         if self.denied_read_paths is None:
-            # Default denied paths for security
-            self.denied_read_paths = [
-                "~/.ssh",
-                "~/.aws",
-                "~/.gnupg",
-                "~/.config/gcloud",
-                "/etc/passwd",
-                "/etc/shadow",
-            ]
+            self.denied_read_paths = list(_expanded_default_denied())
 
 
 class FilesystemIsolator(ABC):
@@ -87,6 +122,28 @@ class FilesystemIsolator(ABC):
         """Get the platform this isolator supports."""
         pass
 
+    def wrap_command_argv(
+        self,
+        command: str,
+        options: SandboxOptions,
+    ) -> Optional[tuple[list[str], dict[str, str]]]:
+        """
+        Wrap a command as an argv that can be executed without a shell.
+
+        Args:
+            command: The shell command to wrap
+            options: Sandbox configuration options
+
+        Returns:
+            Tuple of (argv, environment_dict), or None if this isolator only
+            produces shell strings
+        """
+        return None
+
+    def wraps_anything(self) -> bool:
+        """Whether wrap_command changes commands; False lets callers skip it."""
+        return True
+
 
 def get_current_platform() -> str:
     """Get the current platform name."""
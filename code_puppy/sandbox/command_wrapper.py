@@ -2,17 +2,29 @@
 Main sandbox command wrapper that integrates filesystem and network isolation.
 """
 
+import dataclasses
 import logging
 import os
-from typing import Optional
+import types
+from collections.abc import Mapping
+from typing import Optional, Union
 
 from .base import SandboxOptions
-from .config import SandboxConfig
+from .config import SandboxConfig, get_sandbox_config
 from .filesystem_isolation import get_filesystem_isolator
 from .network_proxy import NetworkProxyServer
 
 logger = logging.getLogger(__name__)
 
+# Shared read-only environment returned when the caller passed none
+_EMPTY_ENV: Mapping[str, str] = types.MappingProxyType({})
+
+
+def _base_cmd(command: str) -> str:
+    """Return the first word (actual command) of a shell command, or ''."""
+    parts = command.split(None, 1)
+    return parts[0] if parts else ""
+
 
 class SandboxCommandWrapper:
     """
@@ -31,18 +43,36 @@ class SandboxCommandWrapper:
             config: Sandbox configuration (creates default if None)
             proxy_server: Network proxy server instance (creates if None)
         """
-        self.config = config or SandboxConfig()
+        self.config = config or get_sandbox_config()
         self.proxy_server = proxy_server
         self._isolator = None
+        self._isolator_available = False
+        self._isolator_platform = "noop"
+        self._excl_version: Optional[int] = None
+        self._excluded_basenames: frozenset[str] = frozenset()
+        self._excluded_paths: frozenset[str] = frozenset()
+        self._excluded_suffixes: tuple[str, ...] = ()
+        self._excl_cache: dict[str, bool] = {}
+        self._options_template: Optional[SandboxOptions] = None
+        self._options_version: Optional[int] = None
+        self._passthrough = False
 
     def _get_isolator(self):
         """Get or create the filesystem isolator."""
         if self._isolator is None:
             self._isolator = get_filesystem_isolator()
+            # Probe once; availability checks may shell out to `which`
+            self._isolator_available = self._isolator.is_available()
+            self._isolator_platform = self._isolator.get_platform()
             logger.info(
                 f"Using filesystem isolator: {self._isolator.__class__.__name__} "
-                f"(platform: {self._isolator.get_platform()})"
+                f"(platform: {self._isolator_platform})"
             )
+            if not (self._isolator_available and self._isolator.wraps_anything()):
+                logger.warning(
+                    "Filesystem isolation not available (%s), running unsandboxed",
+                    self._isolator.__class__.__name__,
+                )
         return self._isolator
 
     def is_sandboxing_available(self) -> bool:
@@ -52,8 +82,8 @@ class SandboxCommandWrapper:
         Returns:
             True if sandboxing can be enabled
         """
-        isolator = self._get_isolator()
-        return isolator.is_available() and isolator.get_platform() != "noop"
+        self._get_isolator()
+        return self._isolator_available and self._isolator_platform != "noop"
 
     def is_command_excluded(self, command: str) -> bool:
         """
@@ -65,27 +95,71 @@ class SandboxCommandWrapper:
         Returns:
             True if command matches exclusion list
         """
-        # Extract the first word (actual command) from the shell command
-        cmd_parts = command.strip().split()
-        if not cmd_parts:
-            return False
-
-        base_command = cmd_parts[0]
+        return self._is_base_excluded(_base_cmd(command))
 
-        # Check against excluded commands
-        for excluded in self.config.excluded_commands:
-            if base_command == excluded or base_command.endswith(f"/{excluded}"):
-                logger.info(f"Command '{base_command}' is excluded from sandboxing")
-                return True
+    def _is_base_excluded(self, base_command: str) -> bool:
+        """Check an already-extracted base command against the exclusion list."""
+        if not base_command:
+            return False
 
-        return False
+        # Rebuild the lookup tables if the config changed
+        version = self.config.version
+        if version != self._excl_version:
+            self._excl_version = version
+            excluded = self.config.excluded_commands
+            # Plain names match any path to that binary via one basename lookup;
+            # entries containing "/" keep exact and suffix matching
+            self._excluded_basenames = frozenset(e for e in excluded if "/" not in e)
+            pathy = [e for e in excluded if "/" in e]
+            self._excluded_paths = frozenset(pathy)
+            self._excluded_suffixes = tuple(f"/{e}" for e in pathy)
+            self._excl_cache.clear()
+
+        result = self._excl_cache.get(base_command)
+        if result is None:
+            result = os.path.basename(base_command) in self._excluded_basenames or (
+                bool(self._excluded_paths)
+                and (
+                    base_command in self._excluded_paths
+                    or base_command.endswith(self._excluded_suffixes)
+                )
+            )
+            self._excl_cache[base_command] = result
+
+        if result:
+            logger.info(f"Command '{base_command}' is excluded from sandboxing")
+        return result
+
+    def _get_options_template(self) -> SandboxOptions:
+        """Return SandboxOptions built from the config, rebuilt when it changes."""
+        version = self.config.version
+        if self._options_template is None or self._options_version != version:
+            config = self.config
+            self._options_template = SandboxOptions(
+                filesystem_isolation=config.filesystem_isolation,
+                network_isolation=config.network_isolation,
+                allowed_read_paths=list(config.allowed_read_paths),
+                allowed_write_paths=list(config.allowed_write_paths),
+                denied_read_paths=list(config.denied_read_paths_expanded),
+                read_scope=config.read_scope,
+                max_memory_mb=config.max_memory_mb,
+                max_cpu_percent=config.max_cpu_percent,
+                max_execution_time=config.max_execution_time,
+            )
+            self._options_version = version
+            # With both isolation layers off there is nothing to wrap
+            self._passthrough = not (
+                config.filesystem_isolation or config.network_isolation
+            )
+        return self._options_template
 
     def wrap_command(
         self,
         command: str,
         cwd: Optional[str] = None,
-        env: Optional[dict[str, str]] = None,
-    ) -> tuple[str, dict[str, str], bool]:
+        env: Optional[Mapping[str, str]] = None,
+        as_argv: bool = False,
+    ) -> tuple[Union[str, list[str]], Mapping[str, str], bool]:
         """
         Wrap a command with sandboxing if enabled.
 
@@ -93,60 +167,63 @@ class SandboxCommandWrapper:
             command: The shell command to wrap
             cwd: Working directory for the command
             env: Environment variables for the command
+            as_argv: Return a sandboxed command as an argv list, to be run
+                without a shell, when the isolator supports it
 
         Returns:
-            Tuple of (wrapped_command, environment_dict, was_excluded)
+            Tuple of (wrapped_command, environment_dict, was_excluded); the
+            command is a list only if as_argv was set and it was wrapped, and
+            the environment is a shared read-only mapping when env was None
         """
         # If sandboxing is disabled, return command unchanged
         if not self.config.enabled:
-            return command, env or {}, False
+            return command, env if env is not None else _EMPTY_ENV, False
 
-        # Check if command is excluded
+        # Check if command is excluded; done first so was_excluded is reported
+        # the same way whether or not any isolation layer is on
         if self.is_command_excluded(command):
-            return command, env or {}, True
+            return command, env if env is not None else _EMPTY_ENV, True
+
+        template = self._get_options_template()
+        if self._passthrough:
+            return command, env if env is not None else _EMPTY_ENV, False
+
+        # Only filesystem isolators rewrite the command; without a real one
+        # there is nothing to build options for
+        if not self.config.filesystem_isolation:
+            return command, env if env is not None else _EMPTY_ENV, False
+        isolator = self._get_isolator()
+        if not (self._isolator_available and isolator.wraps_anything()):
+            return command, env if env is not None else _EMPTY_ENV, False
 
         # Get working directory
         if cwd is None:
             cwd = os.getcwd()
 
-        # Build sandbox options
-        options = SandboxOptions(
-            filesystem_isolation=self.config.filesystem_isolation,
-            network_isolation=self.config.network_isolation,
-            allowed_read_paths=self.config.allowed_read_paths,
-            allowed_write_paths=self.config.allowed_write_paths,
-            denied_read_paths=self.config.denied_read_paths,
-            read_scope=self.config.read_scope,
+        # Build sandbox options from the per-config template
+        proxy_socket_path = None
+        if self.config.network_isolation and self.proxy_server:
+            proxy_socket_path = f"127.0.0.1:{self.config.proxy_port}"
+        options = dataclasses.replace(
+            template,
             cwd=cwd,
             env=env,
-            max_memory_mb=self.config.max_memory_mb,
-            max_cpu_percent=self.config.max_cpu_percent,
-            max_execution_time=self.config.max_execution_time,
+            proxy_socket_path=proxy_socket_path,
         )
 
-        # Set proxy socket path if network isolation is enabled
-        if self.config.network_isolation and self.proxy_server:
-            options.proxy_socket_path = f"127.0.0.1:{self.config.proxy_port}"
-
-        # Wrap with filesystem isolation if enabled
-        if self.config.filesystem_isolation:
-            isolator = self._get_isolator()
-
-            if isolator.is_available():
-                try:
-                    wrapped_cmd, wrapped_env = isolator.wrap_command(command, options)
-                    logger.debug(f"Wrapped command with {isolator.__class__.__name__}")
-                    return wrapped_cmd, wrapped_env, False
-                except Exception as e:
-                    logger.error(f"Failed to wrap command with sandboxing: {e}")
-                    logger.warning("Falling back to unsandboxed execution")
-            else:
-                logger.warning(
-                    f"Filesystem isolation not available "
-                    f"({isolator.__class__.__name__}), running unsandboxed"
-                )
+        # Wrap with filesystem isolation
+        try:
+            wrapped = isolator.wrap_command_argv(command, options) if as_argv else None
+            wrapped_cmd, wrapped_env = wrapped or isolator.wrap_command(
+                command, options
+            )
+            logger.debug(f"Wrapped command with {isolator.__class__.__name__}")
+            return wrapped_cmd, wrapped_env, False
+        except Exception as e:
+            logger.error(f"Failed to wrap command with sandboxing: {e}")
+            logger.warning("Falling back to unsandboxed execution")
 
-        return command, env or {}, False
+        return command, env if env is not None else _EMPTY_ENV, False
 
     async def start_network_proxy(self, approval_callback=None):
         """
@@ -187,7 +264,9 @@ class SandboxCommandWrapper:
         return {
             **self.config.get_status(),
             "isolator": isolator.__class__.__name__,
-            "isolator_platform": isolator.get_platform(),
-            "isolator_available": isolator.is_available(),
-            "proxy_running": self.proxy_server.is_running() if self.proxy_server else False,
+            "isolator_platform": self._isolator_platform,
+            "isolator_available": self._isolator_available,
+            "proxy_running": self.proxy_server.is_running()
+            if self.proxy_server
+            else False,
         }
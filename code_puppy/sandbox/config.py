@@ -2,14 +2,121 @@
 Configuration management for sandboxing.
 """
 
+import atexit
+import contextlib
+import functools
 import json
 import logging
+import os
+import types
+import weakref
 from pathlib import Path
 from typing import Optional, Set
 
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - optional dep
+    _orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _dumps(obj, pretty: bool = False) -> bytes:
+    """Serialize ``obj`` to JSON bytes, using orjson when it is installed."""
+    if _orjson is not None:
+        return _orjson.dumps(obj, option=_orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+_loads = _orjson.loads if _orjson is not None else json.loads
+
+# Fold the change log into sandbox_config.json once it grows past this many entries
+_LOG_COMPACT_THRESHOLD = 64
+
+# Changes to these keys are fsynced to the change log as they are written
+_DURABLE_KEYS = frozenset({"enabled"})
+
+# Instances compacted at interpreter exit
+_live_configs: "weakref.WeakSet[SandboxConfig]" = weakref.WeakSet()
+
+
+@atexit.register
+def _compact_live_configs():
+    for config in list(_live_configs):
+        config.compact()
+
+
+# Resolved once at import; SandboxConfig() is constructed on several paths
+_HOME = Path.home()
+
+
+# Default configuration; list-valued keys are stored as tuples and copied
+# into fresh lists for each instance
+_DEFAULT_CONFIG = types.MappingProxyType(
+    {
+        "enabled": False,  # Opt-in by default
+        "filesystem_isolation": True,
+        "network_isolation": True,
+        "allowed_domains": (),
+        "allowed_read_paths": (),
+        "allowed_write_paths": (),
+        "denied_read_paths": (),
+        "require_approval_for_new_domains": True,
+        # Read scope: "broad" (entire system except denied) or "restricted" (only allowed)
+        "read_scope": "broad",
+        # Proxy configuration
+        "http_proxy_port": 9050,
+        "socks_proxy_port": 9051,
+        # Excluded commands (always run unsandboxed)
+        "excluded_commands": ("docker", "watchman", "podman", "systemctl"),
+        # Allow retry with dangerouslyDisableSandbox
+        "allow_unsandboxed_commands": True,
+        # Resource limits
+        "max_memory_mb": None,  # No limit by default
+        "max_cpu_percent": None,  # No limit by default
+        "max_execution_time": None,  # No limit by default (uses command_runner timeout)
+    }
+)
+
+
+# Accepted values for read_scope
+_READ_SCOPES = ("broad", "restricted")
+
+
+def _valid_value(key: str, value) -> bool:
+    """Whether ``value`` has the type the default for ``key`` implies.
+
+    Enumerated settings such as ``read_scope`` must also be a known value.
+    """
+    if key not in _DEFAULT_CONFIG:
+        # Keys this version does not know about are kept as-is
+        return True
+    default = _DEFAULT_CONFIG[key]
+    if isinstance(default, bool):
+        return isinstance(value, bool)
+    if isinstance(default, tuple):
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+    if key == "read_scope":
+        return value in _READ_SCOPES
+    if isinstance(default, str):
+        return isinstance(value, str)
+    # Ports, and resource limits where None means "no limit"
+    if value is None:
+        return default is None
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validated(values: dict, source) -> dict:
+    """Drop entries of ``values`` whose type does not match the schema, with a warning."""
+    invalid = [key for key, value in values.items() if not _valid_value(key, value)]
+    for key in invalid:
+        logger.warning("Ignoring invalid sandbox setting %r in %s", key, source)
+        del values[key]
+    return values
+
+
 class SandboxConfig:
     """Manages sandbox configuration and persistence."""
 
@@ -21,57 +128,165 @@ class SandboxConfig:
             config_dir: Directory to store sandbox config (default: ~/.code_puppy)
         """
         if config_dir is None:
-            config_dir = Path.home() / ".code_puppy"
+            config_dir = _HOME / ".code_puppy"
 
         self.config_dir = config_dir
         self.config_file = self.config_dir / "sandbox_config.json"
 
-        # Default configuration
-        self._config = {
-            "enabled": False,  # Opt-in by default
-            "filesystem_isolation": True,
-            "network_isolation": True,
-            "allowed_domains": [],
-            "allowed_read_paths": [],
-            "allowed_write_paths": [],
-            "denied_read_paths": [],
-            "require_approval_for_new_domains": True,
-            # Read scope: "broad" (entire system except denied) or "restricted" (only allowed)
-            "read_scope": "broad",
-            # Proxy configuration
-            "http_proxy_port": 9050,
-            "socks_proxy_port": 9051,
-            # Excluded commands (always run unsandboxed)
-            "excluded_commands": ["docker", "watchman", "podman", "systemctl"],
-            # Allow retry with dangerouslyDisableSandbox
-            "allow_unsandboxed_commands": True,
-            # Resource limits
-            "max_memory_mb": None,  # No limit by default
-            "max_cpu_percent": None,  # No limit by default
-            "max_execution_time": None,  # No limit by default (uses command_runner timeout)
+        # Default configuration; sandbox_config.json is merged in on first access
+        self._values = {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in _DEFAULT_CONFIG.items()
         }
 
-        # Load existing configuration
-        self._load()
+        # Bumped on every change so consumers can cache derived state
+        self._version = 0
+        # Keys changed but not yet logged, and nesting depth of batch() blocks
+        self._dirty_keys: Set[str] = set()
+        self._batch_depth = 0
+        # Changes are appended here and folded into config_file by compact()
+        self._log_file = self.config_dir / "sandbox_config.log"
+        self._log_entries = 0
+        _live_configs.add(self)
+        self._loaded = False
+        # Set mirrors of list-valued keys, built on first membership test
+        self._sets: dict[str, Set[str]] = {}
+        # denied_read_paths with ~ expanded, and the version it was built at
+        self._denied_expanded: Optional[tuple[str, ...]] = None
+        self._denied_expanded_version = -1
+
+    @property
+    def _config(self) -> dict:
+        """The configuration dict, loaded from disk on first access."""
+        if not self._loaded:
+            self._ensure_loaded()
+        return self._values
+
+    def _ensure_loaded(self):
+        """Load existing configuration once, deferred until it is needed."""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
 
     def _load(self):
-        """Load configuration from disk."""
+        """Load configuration from disk, replaying the change log on top."""
         if self.config_file.exists():
             try:
-                with open(self.config_file) as f:
-                    loaded = json.load(f)
-                    self._config.update(loaded)
+                with open(self.config_file, "rb") as f:
+                    loaded = _loads(f.read())
+                self._values.update(_validated(loaded, self.config_file))
             except Exception as e:
-                logger.warning(f"Failed to load sandbox config: {e}")
+                logger.warning("Failed to load sandbox config: %s", e)
+        if self._log_file.exists():
+            try:
+                with open(self._log_file, "rb") as f:
+                    for line in f:
+                        try:
+                            entry = _loads(line)
+                        except ValueError:
+                            # A torn final line from an interrupted write
+                            continue
+                        self._values.update(
+                            _validated({entry["k"]: entry["v"]}, self._log_file)
+                        )
+                        self._log_entries += 1
+            except Exception as e:
+                logger.warning("Failed to replay sandbox config log: %s", e)
 
-    def save(self):
-        """Save configuration to disk."""
+    def save(self, fsync: bool = False):
+        """Write the full configuration to disk (atomically) and clear the change log.
+
+        Args:
+            fsync: Force the snapshot to stable storage before it replaces the
+                old one, so it survives a crash rather than just a process exit
+        """
+        tmp_file = self.config_file.with_suffix(".json.tmp")
+        try:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                # Kept indented: users edit this file by hand
+                f.write(_dumps(self._config, pretty=True))
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, self.config_file)
+            self._log_file.unlink(missing_ok=True)
+            self._dirty_keys.clear()
+            self._log_entries = 0
+        except Exception as e:
+            logger.error("Failed to save sandbox config: %s", e)
+
+    def compact(self):
+        """Fold any logged changes into sandbox_config.json."""
+        if self._dirty_keys or (self._log_entries and self._log_file.exists()):
+            self.save()
+
+    def _mark_dirty(self, key: str):
+        """Record a change to ``key`` and persist it, unless a batch() block is open."""
+        self._version += 1
+        self._dirty_keys.add(key)
+        if self._batch_depth == 0:
+            self._flush_changes()
+
+    def _flush_changes(self):
+        """Append the current values of all changed keys to the change log."""
+        if not self._dirty_keys:
+            return
+        keys = sorted(self._dirty_keys)
+        lines = b"".join(
+            _dumps({"k": key, "v": self._values[key]}) + b"\n" for key in keys
+        )
         try:
             self.config_dir.mkdir(parents=True, exist_ok=True)
-            with open(self.config_file, "w") as f:
-                json.dump(self._config, f, indent=2)
+            with open(self._log_file, "ab") as f:
+                f.write(lines)
+                # Only turning sandboxing on/off is worth a disk flush; other
+                # edits (allowlist entries etc.) just need to reach the OS
+                if _DURABLE_KEYS.intersection(keys):
+                    f.flush()
+                    os.fsync(f.fileno())
         except Exception as e:
-            logger.error(f"Failed to save sandbox config: {e}")
+            logger.error("Failed to save sandbox config: %s", e)
+            return
+        self._dirty_keys.clear()
+        self._log_entries += len(keys)
+        if self._log_entries >= _LOG_COMPACT_THRESHOLD:
+            self.save()
+
+    def _members(self, key: str) -> Set[str]:
+        """Set mirror of the list stored under ``key``, for O(1) membership tests."""
+        members = self._sets.get(key)
+        if members is None:
+            members = self._sets[key] = set(self._config.get(key, []))
+        return members
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Group several changes into a single write when the block exits."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_changes()
+
+    def reload(self):
+        """Discard in-memory state and re-read the configuration from disk."""
+        self._flush_changes()
+        self._values = {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in _DEFAULT_CONFIG.items()
+        }
+        self._sets.clear()
+        self._log_entries = 0
+        self._loaded = False
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever the configuration is modified."""
+        return self._version
 
     @property
     def enabled(self) -> bool:
@@ -82,7 +297,7 @@ class SandboxConfig:
     def enabled(self, value: bool):
         """Enable or disable sandboxing."""
         self._config["enabled"] = value
-        self.save()
+        self._mark_dirty("enabled")
 
     @property
     def filesystem_isolation(self) -> bool:
@@ -93,7 +308,7 @@ class SandboxConfig:
     def filesystem_isolation(self, value: bool):
         """Enable or disable filesystem isolation."""
         self._config["filesystem_isolation"] = value
-        self.save()
+        self._mark_dirty("filesystem_isolation")
 
     @property
     def network_isolation(self) -> bool:
@@ -104,28 +319,32 @@ class SandboxConfig:
     def network_isolation(self, value: bool):
         """Enable or disable network isolation."""
         self._config["network_isolation"] = value
-        self.save()
+        self._mark_dirty("network_isolation")
 
     @property
     def allowed_domains(self) -> Set[str]:
         """Get the set of allowed domains."""
-        return set(self._config.get("allowed_domains", []))
+        return set(self._members("allowed_domains"))
 
     def add_allowed_domain(self, domain: str):
         """Add a domain to the allowlist."""
         domains = self._config.get("allowed_domains", [])
-        if domain not in domains:
+        members = self._members("allowed_domains")
+        if domain not in members:
+            members.add(domain)
             domains.append(domain)
             self._config["allowed_domains"] = domains
-            self.save()
+            self._mark_dirty("allowed_domains")
 
     def remove_allowed_domain(self, domain: str):
         """Remove a domain from the allowlist."""
         domains = self._config.get("allowed_domains", [])
-        if domain in domains:
+        members = self._members("allowed_domains")
+        if domain in members:
+            members.discard(domain)
             domains.remove(domain)
             self._config["allowed_domains"] = domains
-            self.save()
+            self._mark_dirty("allowed_domains")
 
     @property
     def allowed_read_paths(self) -> list[str]:
@@ -136,10 +355,12 @@ class SandboxConfig:
         """Add a path to the read allowlist."""
         paths = self._config.get("allowed_read_paths", [])
         abs_path = str(Path(path).resolve())
-        if abs_path not in paths:
+        members = self._members("allowed_read_paths")
+        if abs_path not in members:
+            members.add(abs_path)
             paths.append(abs_path)
             self._config["allowed_read_paths"] = paths
-            self.save()
+            self._mark_dirty("allowed_read_paths")
 
     @property
     def allowed_write_paths(self) -> list[str]:
@@ -150,10 +371,12 @@ class SandboxConfig:
         """Add a path to the write allowlist."""
         paths = self._config.get("allowed_write_paths", [])
         abs_path = str(Path(path).resolve())
-        if abs_path not in paths:
+        members = self._members("allowed_write_paths")
+        if abs_path not in members:
+            members.add(abs_path)
             paths.append(abs_path)
             self._config["allowed_write_paths"] = paths
-            self.save()
+            self._mark_dirty("allowed_write_paths")
 
     @property
     def require_approval_for_new_domains(self) -> bool:
@@ -164,7 +387,7 @@ class SandboxConfig:
     def require_approval_for_new_domains(self, value: bool):
         """Set whether approval is required for new domains."""
         self._config["require_approval_for_new_domains"] = value
-        self.save()
+        self._mark_dirty("require_approval_for_new_domains")
 
     @property
     def http_proxy_port(self) -> int:
@@ -175,7 +398,7 @@ class SandboxConfig:
     def http_proxy_port(self, value: int):
         """Set the HTTP proxy port."""
         self._config["http_proxy_port"] = value
-        self.save()
+        self._mark_dirty("http_proxy_port")
 
     @property
     def socks_proxy_port(self) -> int:
@@ -186,7 +409,7 @@ class SandboxConfig:
     def socks_proxy_port(self, value: int):
         """Set the SOCKS proxy port."""
         self._config["socks_proxy_port"] = value
-        self.save()
+        self._mark_dirty("socks_proxy_port")
 
     @property
     def read_scope(self) -> str:
@@ -196,10 +419,10 @@ class SandboxConfig:
     @read_scope.setter
     def read_scope(self, value: str):
         """Set the read scope."""
-        if value not in ("broad", "restricted"):
+        if value not in _READ_SCOPES:
             raise ValueError("read_scope must be 'broad' or 'restricted'")
         self._config["read_scope"] = value
-        self.save()
+        self._mark_dirty("read_scope")
 
     @property
     def excluded_commands(self) -> list[str]:
@@ -209,18 +432,22 @@ class SandboxConfig:
     def add_excluded_command(self, command: str):
         """Add a command to the exclusion list."""
         commands = self._config.get("excluded_commands", [])
-        if command not in commands:
+        members = self._members("excluded_commands")
+        if command not in members:
+            members.add(command)
             commands.append(command)
             self._config["excluded_commands"] = commands
-            self.save()
+            self._mark_dirty("excluded_commands")
 
     def remove_excluded_command(self, command: str):
         """Remove a command from the exclusion list."""
         commands = self._config.get("excluded_commands", [])
-        if command in commands:
+        members = self._members("excluded_commands")
+        if command in members:
+            members.discard(command)
             commands.remove(command)
             self._config["excluded_commands"] = commands
-            self.save()
+            self._mark_dirty("excluded_commands")
 
     @property
     def allow_unsandboxed_commands(self) -> bool:
@@ -231,21 +458,36 @@ class SandboxConfig:
     def allow_unsandboxed_commands(self, value: bool):
         """Set whether unsandboxed retry is allowed."""
         self._config["allow_unsandboxed_commands"] = value
-        self.save()
+        self._mark_dirty("allow_unsandboxed_commands")
 
     @property
     def denied_read_paths(self) -> list[str]:
         """Get the list of denied read paths."""
         return self._config.get("denied_read_paths", [])
 
+    @property
+    def denied_read_paths_expanded(self) -> tuple[str, ...]:
+        """Denied read paths with ``~`` expanded, recomputed only when the config changes."""
+        if (
+            self._denied_expanded is None
+            or self._denied_expanded_version != self._version
+        ):
+            self._denied_expanded = tuple(
+                os.path.expanduser(p) for p in self.denied_read_paths
+            )
+            self._denied_expanded_version = self._version
+        return self._denied_expanded
+
     def add_denied_read_path(self, path: str):
         """Add a path to the denied read list."""
         paths = self._config.get("denied_read_paths", [])
         abs_path = str(Path(path).resolve())
-        if abs_path not in paths:
+        members = self._members("denied_read_paths")
+        if abs_path not in members:
+            members.add(abs_path)
             paths.append(abs_path)
             self._config["denied_read_paths"] = paths
-            self.save()
+            self._mark_dirty("denied_read_paths")
 
     @property
     def max_memory_mb(self) -> Optional[int]:
@@ -256,7 +498,7 @@ class SandboxConfig:
     def max_memory_mb(self, value: Optional[int]):
         """Set maximum memory limit in MB."""
         self._config["max_memory_mb"] = value
-        self.save()
+        self._mark_dirty("max_memory_mb")
 
     @property
     def max_cpu_percent(self) -> Optional[int]:
@@ -267,7 +509,7 @@ class SandboxConfig:
     def max_cpu_percent(self, value: Optional[int]):
         """Set maximum CPU percentage."""
         self._config["max_cpu_percent"] = value
-        self.save()
+        self._mark_dirty("max_cpu_percent")
 
     @property
     def max_execution_time(self) -> Optional[int]:
@@ -278,7 +520,7 @@ class SandboxConfig:
     def max_execution_time(self, value: Optional[int]):
         """Set maximum execution time in seconds."""
         self._config["max_execution_time"] = value
-        self.save()
+        self._mark_dirty("max_execution_time")
 
     def get_status(self) -> dict:
         """Get current sandbox status as a dictionary."""
@@ -300,3 +542,13 @@ class SandboxConfig:
             "max_cpu_percent": self.max_cpu_percent,
             "max_execution_time": self.max_execution_time,
         }
+
+
+@functools.lru_cache(maxsize=1)
+def get_sandbox_config() -> SandboxConfig:
+    """Return the process-wide SandboxConfig, loading it from disk once.
+
+    Sharing one instance keeps /sandbox changes visible to the command runner.
+    Call ``get_sandbox_config().reload()`` to pick up edits made outside it.
+    """
+    return SandboxConfig()
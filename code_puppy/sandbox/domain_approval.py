@@ -20,7 +20,11 @@ class DomainApprovalHandler:
                              Should accept (domain: str) -> bool
         """
         self.approval_callback = approval_callback
-        self._pending_approvals = {}
+        # domain -> (event, result slot) for prompts still awaiting an answer
+        self._pending_approvals: dict[str, tuple[asyncio.Event, list[bool]]] = {}
+        # Answers the user has already given, so each domain is asked once
+        self._approved: set[str] = set()
+        self._denied: set[str] = set()
 
     async def request_approval(self, domain: str) -> bool:
         """
@@ -32,33 +36,43 @@ class DomainApprovalHandler:
         Returns:
             True if approved, False otherwise
         """
+        if domain in self._approved:
+            return True
+        if domain in self._denied:
+            return False
+
         # Check if there's already a pending approval for this domain
-        if domain in self._pending_approvals:
-            return await self._pending_approvals[domain]
+        pending = self._pending_approvals.get(domain)
+        if pending is not None:
+            event, result = pending
+            await event.wait()
+            return result[0]
 
-        # Create a future for this approval request
-        future = asyncio.Future()
-        self._pending_approvals[domain] = future
+        event = asyncio.Event()
+        result = [False]
+        self._pending_approvals[domain] = (event, result)
 
         try:
             # Use the callback if provided
             if self.approval_callback:
-                approved = await self.approval_callback(domain)
+                approved = bool(await self.approval_callback(domain))
+                (self._approved if approved else self._denied).add(domain)
             else:
                 # Default to denying if no callback
                 approved = False
 
-            future.set_result(approved)
+            result[0] = approved
             return approved
 
         except Exception as e:
             logger.error(f"Error requesting domain approval: {e}")
-            future.set_result(False)
             return False
 
         finally:
-            # Clean up
+            # Wake waiters even if the prompt failed or was cancelled; they see
+            # the default False in that case
             self._pending_approvals.pop(domain, None)
+            event.set()
 
 
 def create_cli_approval_callback(console):
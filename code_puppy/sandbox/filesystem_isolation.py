@@ -24,6 +24,20 @@ class NoOpIsolator(FilesystemIsolator):
         """Return command unchanged."""
         return command, options.env or {}
 
+    def wraps_anything(self) -> bool:
+        """Commands pass through untouched."""
+        return False
+
+
+# Stateless, so one instance serves every fallback
+_NOOP = NoOpIsolator()
+
+# Platform-specific isolators, keyed by the platform they support
+_ISOLATORS = {
+    "linux": BubblewrapIsolator,
+    "macos": SandboxExecIsolator,
+}
+
 
 def get_filesystem_isolator(platform: Optional[str] = None) -> FilesystemIsolator:
     """
@@ -38,15 +52,12 @@ def get_filesystem_isolator(platform: Optional[str] = None) -> FilesystemIsolato
     if platform is None:
         platform = get_current_platform()
 
-    # Try platform-specific isolators
-    isolators = [
-        BubblewrapIsolator(),
-        SandboxExecIsolator(),
-    ]
-
-    for isolator in isolators:
-        if isolator.get_platform() == platform and isolator.is_available():
+    # Only construct and probe the isolator for this platform
+    isolator_cls = _ISOLATORS.get(platform)
+    if isolator_cls is not None:
+        isolator = isolator_cls()
+        if isolator.is_available():
             return isolator
 
     # Fallback to no-op isolator
-    return NoOpIsolator()
+    return _NOOP
@@ -2,11 +2,114 @@
 Linux filesystem isolation using bubblewrap (bwrap).
 """
 
+import functools
 import os
 import shlex
 import shutil
-
-from .base import FilesystemIsolator, SandboxOptions
+from typing import Optional
+
+from .base import _PROXY_ENV, FilesystemIsolator, SandboxOptions
+
+# Invariant prefix of every bwrap invocation
+_BASE_ARGS = (
+    "bwrap",
+    "--unshare-all",  # Unshare all namespaces
+    "--share-net",  # But keep network (for proxy)
+    "--die-with-parent",  # Kill sandbox when parent dies
+    "--new-session",  # New session to avoid signal leakage
+)
+
+# Broad read scope starts by mounting the whole filesystem read-only
+_BROAD_PREFIX = _BASE_ARGS + ("--ro-bind", "/", "/")
+
+# System directories mounted read-only in restricted read scope
+_ESSENTIAL_PATHS = ("/usr", "/lib", "/lib64", "/bin", "/sbin")
+
+# Environment variables passed through into the sandbox
+_SAFE_ENV_VARS = ("PATH", "HOME", "USER", "LANG", "LC_ALL", "TERM", "SHELL")
+
+
+def _setenv_args(env: dict[str, str]) -> tuple[str, ...]:
+    """Flatten ``env`` into bwrap ``--setenv NAME VALUE`` arguments."""
+    return tuple(arg for var, value in env.items() for arg in ("--setenv", var, value))
+
+
+_PROXY_ARGS = _setenv_args(_PROXY_ENV)
+
+
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> Optional[str]:
+    """shutil.which, memoized: binaries do not come and go mid-session."""
+    return shutil.which(name)
+
+
+# shlex.quote for bwrap options: paths and env values recur on every wrap
+_quote = functools.lru_cache(maxsize=1024)(shlex.quote)
+
+
+@functools.lru_cache(maxsize=1)
+def _restricted_prefix() -> tuple[str, ...]:
+    """Invariant start of a restricted-scope bwrap invocation, built once.
+
+    That is the system directories this host has, mounted read-only, plus
+    /proc, /dev (required for most programs) and a tmpfs for /tmp. Unlike
+    user-configured paths these are part of the OS layout and do not come
+    and go during a session.
+    """
+    essential_mounts = tuple(
+        arg
+        for path in _ESSENTIAL_PATHS
+        if os.path.exists(path)
+        for arg in ("--ro-bind", path, path)
+    )
+    return (
+        _BASE_ARGS
+        + essential_mounts
+        + ("--proc", "/proc", "--dev", "/dev", "--tmpfs", "/tmp")
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_paths(paths: tuple[str, ...], base: str) -> tuple[str, ...]:
+    """Expand ``~`` and make ``paths`` absolute against ``base``, once per input.
+
+    Existence is deliberately not cached: a denied path created mid-session
+    must still be hidden.
+    """
+    return tuple(
+        os.path.normpath(os.path.join(base, os.path.expanduser(p))) for p in paths
+    )
+
+
+def _existing_paths(paths) -> set[str]:
+    """Return the subset of absolute, normalized ``paths`` that exist right now.
+
+    Paths sharing a parent directory are checked with one ``os.scandir`` of that
+    parent instead of a ``stat`` each. Symlinks (which may dangle) and parents
+    that cannot be listed fall back to ``os.path.exists``. Nothing is cached
+    across calls.
+    """
+    by_parent: dict[str, list[str]] = {}
+    for path in paths:
+        by_parent.setdefault(os.path.dirname(path), []).append(path)
+
+    present = set()
+    for parent, candidates in by_parent.items():
+        if len(candidates) == 1:
+            if os.path.exists(candidates[0]):
+                present.add(candidates[0])
+            continue
+        try:
+            with os.scandir(parent) as it:
+                entries = {entry.name: entry.is_symlink() for entry in it}
+        except OSError:
+            present.update(p for p in candidates if os.path.exists(p))
+            continue
+        for path in candidates:
+            is_link = entries.get(os.path.basename(path))
+            if is_link is False or (is_link and os.path.exists(path)):
+                present.add(path)
+    return present
 
 
 class BubblewrapIsolator(FilesystemIsolator):
@@ -14,7 +117,7 @@ class BubblewrapIsolator(FilesystemIsolator):
 
     def is_available(self) -> bool:
         """Check if bwrap is available on the system."""
-        return shutil.which("bwrap") is not None
+        return _which("bwrap") is not None
 
     def get_platform(self) -> str:
         """Get the platform this isolator supports."""
@@ -35,134 +138,119 @@ class BubblewrapIsolator(FilesystemIsolator):
         Returns:
             Tuple of (wrapped_command, environment_dict)
         """
-        bwrap_args = ["bwrap"]
+        bwrap_args, command, env_vars = self._build_args(command, options)
+
+        # Run the command via shell. Options repeat between commands, so their
+        # quoting is memoized; the command itself is quoted fresh
+        wrapped_command = (
+            " ".join(map(_quote, bwrap_args)) + " -- /bin/sh -c " + shlex.quote(command)
+        )
+
+        return wrapped_command, env_vars
+
+    def wrap_command_argv(
+        self,
+        command: str,
+        options: SandboxOptions,
+    ) -> tuple[list[str], dict[str, str]]:
+        """
+        Wrap a command with bubblewrap isolation as an argv for direct exec.
+
+        Args:
+            command: The shell command to wrap
+            options: Sandbox configuration options
 
-        # Core isolation settings
-        bwrap_args.extend([
-            "--unshare-all",  # Unshare all namespaces
-            "--share-net",  # But keep network (for proxy)
-            "--die-with-parent",  # Kill sandbox when parent dies
-            "--new-session",  # New session to avoid signal leakage
-        ])
+        Returns:
+            Tuple of (argv, environment_dict)
+        """
+        bwrap_args, command, env_vars = self._build_args(command, options)
+        bwrap_args += ("--", "/bin/sh", "-c", command)
+        return bwrap_args, env_vars
 
+    def _build_args(
+        self,
+        command: str,
+        options: SandboxOptions,
+    ) -> tuple[list[str], str, dict[str, str]]:
+        """Build the bwrap options, the (possibly resource-limited) command and env."""
         # Get the working directory (resolve to absolute path)
         cwd = os.path.abspath(options.cwd)
 
         # Mount filesystem based on read_scope
-        if options.read_scope == "broad":
+        if (
+            options.read_scope == "broad"
+            and not options.denied_read_paths
+            and not options.allowed_write_paths
+        ):
+            # Common case with nothing extra to hide or bind: no path resolution
+            bwrap_args = [*_BROAD_PREFIX, "--bind", cwd, cwd, "--bind", "/tmp", "/tmp"]
+
+        elif options.read_scope == "broad":
             # Broad scope: Mount entire filesystem as read-only, then overlay write access
-            bwrap_args.extend([
-                "--ro-bind", "/", "/",  # Mount entire filesystem read-only
-            ])
+            bwrap_args = list(_BROAD_PREFIX)
 
             # Deny specific sensitive paths by unmounting/hiding them
-            for denied_path in options.denied_read_paths:
-                expanded_path = os.path.expanduser(denied_path)
-                if os.path.exists(expanded_path):
+            denied_paths = _resolve_paths(tuple(options.denied_read_paths), cwd)
+            write_paths = _resolve_paths(tuple(options.allowed_write_paths), cwd)
+            present = _existing_paths(denied_paths + write_paths)
+            for expanded_path in denied_paths:
+                if expanded_path in present:
                     # Bind an empty tmpfs over denied paths
-                    bwrap_args.extend(["--tmpfs", expanded_path])
+                    bwrap_args += ("--tmpfs", expanded_path)
 
-            # Allow write access to working directory (unbind and rebind as writable)
-            bwrap_args.extend(["--bind", cwd, cwd])
-
-            # Allow write access to /tmp
-            bwrap_args.extend(["--bind", "/tmp", "/tmp"])
+            # Allow write access to working directory (unbind and rebind as writable),
+            # and to /tmp
+            bwrap_args += ("--bind", cwd, cwd, "--bind", "/tmp", "/tmp")
 
             # Add additional allowed write paths
-            for write_path in options.allowed_write_paths:
-                abs_path = os.path.abspath(write_path)
-                if os.path.exists(abs_path):
-                    bwrap_args.extend(["--bind", abs_path, abs_path])
+            for abs_path in write_paths:
+                if abs_path in present:
+                    bwrap_args += ("--bind", abs_path, abs_path)
 
         else:
-            # Restricted scope: Only mount specific paths
-            essential_paths = [
-                "/usr",
-                "/lib",
-                "/lib64",
-                "/bin",
-                "/sbin",
-            ]
-
-            for path in essential_paths:
-                if os.path.exists(path):
-                    bwrap_args.extend(["--ro-bind", path, path])
-
-            # Mount /proc and /dev (required for most programs)
-            bwrap_args.extend([
-                "--proc", "/proc",
-                "--dev", "/dev",
-            ])
-
-            # Create tmpfs for /tmp
-            bwrap_args.extend(["--tmpfs", "/tmp"])
-
-            # Allow read-write access to working directory
-            bwrap_args.extend(["--bind", cwd, cwd])
+            # Restricted scope: Only mount specific paths, starting with the
+            # system directories, and allow read-write access to working directory
+            bwrap_args = [*_restricted_prefix(), "--bind", cwd, cwd]
+            read_paths = _resolve_paths(tuple(options.allowed_read_paths), cwd)
+            write_paths = _resolve_paths(tuple(options.allowed_write_paths), cwd)
+            present = _existing_paths(read_paths + write_paths)
 
             # Add additional allowed read paths
-            for read_path in options.allowed_read_paths:
-                abs_path = os.path.abspath(read_path)
-                if os.path.exists(abs_path):
-                    bwrap_args.extend(["--ro-bind", abs_path, abs_path])
+            for abs_path in read_paths:
+                if abs_path in present:
+                    bwrap_args += ("--ro-bind", abs_path, abs_path)
 
             # Add additional allowed write paths
-            for write_path in options.allowed_write_paths:
-                abs_path = os.path.abspath(write_path)
-                if os.path.exists(abs_path):
-                    bwrap_args.extend(["--bind", abs_path, abs_path])
+            for abs_path in write_paths:
+                if abs_path in present:
+                    bwrap_args += ("--bind", abs_path, abs_path)
 
         # Set working directory
-        bwrap_args.extend(["--chdir", cwd])
+        bwrap_args += ("--chdir", cwd)
 
         # Pass through specific environment variables
+        # (options.env first, then the live process environment)
         env_vars = options.env or {}
-        safe_env_vars = [
-            "PATH",
-            "HOME",
-            "USER",
-            "LANG",
-            "LC_ALL",
-            "TERM",
-            "SHELL",
-        ]
-
-        for var in safe_env_vars:
+        for var in _SAFE_ENV_VARS:
             value = env_vars.get(var) or os.environ.get(var)
             if value:
-                bwrap_args.extend(["--setenv", var, value])
+                bwrap_args += ("--setenv", var, value)
 
         # Add proxy environment variables if network isolation is enabled
         if options.network_isolation and options.proxy_socket_path:
-            proxy_url = "socks5://localhost:9050"  # Will be configured later
-            bwrap_args.extend([
-                "--setenv", "HTTP_PROXY", proxy_url,
-                "--setenv", "HTTPS_PROXY", proxy_url,
-                "--setenv", "http_proxy", proxy_url,
-                "--setenv", "https_proxy", proxy_url,
-            ])
+            bwrap_args += _PROXY_ARGS
 
         # Build the actual command with resource limits if specified
         if options.max_memory_mb or options.max_cpu_percent:
             # Use systemd-run for resource limits if available
-            if shutil.which("systemd-run"):
+            if _which("systemd-run"):
                 command = self._wrap_with_systemd_run(
                     command,
                     max_memory_mb=options.max_memory_mb,
                     max_cpu_percent=options.max_cpu_percent,
                 )
 
-        # Run the command via shell
-        bwrap_args.extend([
-            "--",
-            "/bin/sh",
-            "-c",
-            command,
-        ])
-
-        wrapped_command = " ".join(shlex.quote(arg) for arg in bwrap_args)
-
-        return wrapped_command, env_vars
+        return bwrap_args, command, env_vars
 
     def _wrap_with_systemd_run(
         self,
@@ -200,4 +288,4 @@ class BubblewrapIsolator(FilesystemIsolator):
         # Add the command
         systemd_args.extend(["--", "/bin/sh", "-c", command])
 
-        return " ".join(shlex.quote(arg) for arg in systemd_args)
+        return shlex.join(systemd_args)
@@ -2,40 +2,28 @@
 macOS filesystem isolation using sandbox-exec.
 """
 
+import functools
 import os
 import shlex
 import shutil
-import tempfile
 from pathlib import Path
+from typing import Optional
 
-from .base import FilesystemIsolator, SandboxOptions
+from .base import _PROXY_ENV, FilesystemIsolator, SandboxOptions
 
 
-class SandboxExecIsolator(FilesystemIsolator):
-    """Filesystem isolation using sandbox-exec on macOS."""
+@functools.lru_cache(maxsize=None)
+def _which(name: str) -> Optional[str]:
+    """shutil.which, memoized: binaries do not come and go mid-session."""
+    return shutil.which(name)
 
-    def is_available(self) -> bool:
-        """Check if sandbox-exec is available on the system."""
-        return shutil.which("sandbox-exec") is not None
 
-    def get_platform(self) -> str:
-        """Get the platform this isolator supports."""
-        return "macos"
-
-    def _generate_sandbox_profile(self, options: SandboxOptions) -> str:
-        """
-        Generate a sandbox profile in Scheme for sandbox-exec.
-
-        Args:
-            options: Sandbox configuration options
+# shlex.quote for the profile text and other arguments that repeat per command
+_quote = functools.lru_cache(maxsize=64)(shlex.quote)
 
-        Returns:
-            Sandbox profile as a string
-        """
-        cwd = os.path.abspath(options.cwd)
 
-        # Create the sandbox profile in Scheme
-        profile = """(version 1)
+# Static sections of the sandbox-exec profile
+_PROFILE_HEADER = """(version 1)
 
 ;; Allow basic system operations
 (allow process-exec*)
@@ -50,29 +38,12 @@ class SandboxExecIsolator(FilesystemIsolator):
 
 """
 
-        # Configure read access based on read_scope
-        if options.read_scope == "broad":
-            # Broad scope: Allow reading everything except denied paths
-            profile += """;; Broad read scope: Allow reading entire filesystem
+_PROFILE_BROAD_READ = """;; Broad read scope: Allow reading entire filesystem
 (allow file-read*)
 
 """
-            # Explicitly deny sensitive paths
-            for denied_path in options.denied_read_paths:
-                expanded_path = os.path.expanduser(denied_path)
-                profile += f""";; Deny access to: {expanded_path}
-(deny file-read*
-    (subpath "{expanded_path}")
-)
 
-"""
-            # Allow write access to specific paths
-            profile += f""";; Allow read-write access to working directory
-(allow file*
-    (subpath "{cwd}")
-)
-
-;; Allow write access to /tmp
+_PROFILE_TMP_WRITE = """;; Allow write access to /tmp
 (allow file*
     (subpath "/tmp")
     (subpath "/private/tmp")
@@ -80,18 +51,8 @@ class SandboxExecIsolator(FilesystemIsolator):
 )
 
 """
-            # Add additional allowed write paths
-            for write_path in options.allowed_write_paths:
-                abs_path = os.path.abspath(write_path)
-                profile += f""";; Allow write access to: {abs_path}
-(allow file*
-    (subpath "{abs_path}")
-)
 
-"""
-        else:
-            # Restricted scope: Only allow specific paths
-            profile += """;; Restricted read scope: Only allow specific paths
+_PROFILE_RESTRICTED_READ = """;; Restricted read scope: Only allow specific paths
 
 ;; Allow reading from essential system directories
 (allow file-read*
@@ -114,40 +75,152 @@ class SandboxExecIsolator(FilesystemIsolator):
 )
 
 """
-            # Build allowed read paths list
-            allowed_read = [cwd] + [os.path.abspath(p) for p in options.allowed_read_paths]
 
-            # Build allowed write paths list
-            allowed_write = [cwd] + [os.path.abspath(p) for p in options.allowed_write_paths]
+# Applied in both scopes; HOME is supplied with -D when the profile is used
+_PROFILE_DENY_SENSITIVE = """;; Explicitly deny access to sensitive directories
+(deny file*
+    (subpath (string-append (param "HOME") "/.ssh"))
+    (subpath (string-append (param "HOME") "/.aws"))
+    (subpath (string-append (param "HOME") "/.gnupg"))
+)
+"""
+
+
+def _absolute_paths(paths, base: str, cwd: str) -> tuple[str, ...]:
+    """Resolve ``paths`` against ``base``, dropping duplicates and ``cwd``.
+
+    The working directory always gets its own read-write rule, so listing it
+    again would only add a redundant ``subpath`` entry to the profile.
+    """
+    resolved = dict.fromkeys(os.path.normpath(os.path.join(base, p)) for p in paths)
+    resolved.pop(cwd, None)
+    return tuple(resolved)
+
+
+@functools.lru_cache(maxsize=32)
+def _build_profile(
+    cwd: str,
+    read_scope: str,
+    denied_read_paths: tuple[str, ...],
+    allowed_read_paths: tuple[str, ...],
+    allowed_write_paths: tuple[str, ...],
+) -> str:
+    """Build the Scheme profile text from already-normalized inputs.
+
+    Options rarely change between commands, so the result is memoized.
+    """
+    parts = [_PROFILE_HEADER]
+
+    # Configure read access based on read_scope
+    if read_scope == "broad":
+        # Broad scope: Allow reading everything except denied paths
+        parts.append(_PROFILE_BROAD_READ)
+
+        # Explicitly deny sensitive paths, as one rule listing each path once
+        if denied_read_paths:
+            subpaths = "".join(
+                f'    (subpath "{path}")\n' for path in dict.fromkeys(denied_read_paths)
+            )
+            parts.append(f""";; Deny read access to sensitive paths
+(deny file-read*
+{subpaths})
 
-            # Add allowed read paths
-            for path in allowed_read:
-                profile += f""";; Allow read access to: {path}
+""")
+        # Allow write access to the working directory and temp directories
+        parts.append(f""";; Allow read-write access to working directory
+(allow file*
+    (subpath "{cwd}")
+)
+
+""")
+        parts.append(_PROFILE_TMP_WRITE)
+
+        # Add additional allowed write paths
+        for abs_path in allowed_write_paths:
+            parts.append(f""";; Allow write access to: {abs_path}
+(allow file*
+    (subpath "{abs_path}")
+)
+
+""")
+    else:
+        # Restricted scope: Only allow specific paths
+        parts.append(_PROFILE_RESTRICTED_READ)
+
+        # Add allowed read paths
+        for path in (cwd,) + allowed_read_paths:
+            parts.append(f""";; Allow read access to: {path}
 (allow file-read*
     (subpath "{path}")
 )
 
-"""
+""")
 
-            # Add allowed write paths
-            for path in allowed_write:
-                profile += f""";; Allow read-write access to: {path}
+        # Add allowed write paths
+        for path in (cwd,) + allowed_write_paths:
+            parts.append(f""";; Allow read-write access to: {path}
 (allow file*
     (subpath "{path}")
 )
 
-"""
+""")
 
-        # Explicitly block access to sensitive directories (in both modes)
-        profile += """;; Explicitly deny access to sensitive directories
-(deny file*
-    (subpath (string-append (param "HOME") "/.ssh"))
-    (subpath (string-append (param "HOME") "/.aws"))
-    (subpath (string-append (param "HOME") "/.gnupg"))
-)
-"""
+    # Explicitly block access to sensitive directories (in both modes)
+    parts.append(_PROFILE_DENY_SENSITIVE)
+
+    return "".join(parts)
+
+
+# Profiles for options without extra paths, the common case for one-shot
+# commands; only the working directory varies, so it is filled in per call
+_CWD_PLACEHOLDER = "@CWD@"
+_STATIC_PROFILES = {
+    scope: _build_profile.__wrapped__(_CWD_PLACEHOLDER, scope, (), (), ())
+    for scope in ("broad", "restricted")
+}
+
+
+class SandboxExecIsolator(FilesystemIsolator):
+    """Filesystem isolation using sandbox-exec on macOS."""
+
+    def is_available(self) -> bool:
+        """Check if sandbox-exec is available on the system."""
+        return _which("sandbox-exec") is not None
+
+    def get_platform(self) -> str:
+        """Get the platform this isolator supports."""
+        return "macos"
+
+    def _generate_sandbox_profile(self, options: SandboxOptions) -> str:
+        """
+        Generate a sandbox profile in Scheme for sandbox-exec.
+
+        Args:
+            options: Sandbox configuration options
 
-        return profile
+        Returns:
+            Sandbox profile as a string
+        """
+        if not (
+            options.allowed_read_paths
+            or options.allowed_write_paths
+            or options.denied_read_paths
+        ):
+            scope = "broad" if options.read_scope == "broad" else "restricted"
+            return _STATIC_PROFILES[scope].replace(
+                _CWD_PLACEHOLDER, os.path.abspath(options.cwd)
+            )
+
+        # One getcwd for every relative path, rather than one per abspath call
+        base = os.getcwd()
+        cwd = os.path.normpath(os.path.join(base, options.cwd))
+        return _build_profile(
+            cwd,
+            options.read_scope,
+            tuple(os.path.expanduser(p) for p in options.denied_read_paths),
+            _absolute_paths(options.allowed_read_paths, base, cwd),
+            _absolute_paths(options.allowed_write_paths, base, cwd),
+        )
 
     def wrap_command(
         self,
@@ -164,31 +237,44 @@ class SandboxExecIsolator(FilesystemIsolator):
         Returns:
             Tuple of (wrapped_command, environment_dict)
         """
-        # Generate the sandbox profile
-        profile = self._generate_sandbox_profile(options)
+        sandbox_args, env_vars = self.wrap_command_argv(command, options)
 
-        # Write profile to a temporary file
-        # We'll use a predictable path so it can be cleaned up
-        profile_dir = Path(tempfile.gettempdir()) / "code_puppy_sandbox"
-        profile_dir.mkdir(exist_ok=True)
+        # The profile and HOME recur between commands; only the command is new
+        wrapped_command = (
+            " ".join(map(_quote, sandbox_args[:-1]))
+            + " "
+            + shlex.quote(sandbox_args[-1])
+        )
 
-        profile_file = profile_dir / f"profile_{os.getpid()}.sb"
-        profile_file.write_text(profile)
+        return wrapped_command, env_vars
 
-        # Build the sandbox-exec command
-        sandbox_args = [
-            "sandbox-exec",
-            "-f", str(profile_file),
-        ]
+    def wrap_command_argv(
+        self,
+        command: str,
+        options: SandboxOptions,
+    ) -> tuple[list[str], dict[str, str]]:
+        """
+        Wrap a command with sandbox-exec isolation as an argv for direct exec.
+
+        Args:
+            command: The shell command to wrap
+            options: Sandbox configuration options
+
+        Returns:
+            Tuple of (argv, environment_dict)
+        """
+        # Generate the sandbox profile
+        profile = self._generate_sandbox_profile(options)
+
+        # Build the sandbox-exec command, passing the profile inline
+        sandbox_args = ["sandbox-exec", "-p", profile]
 
         # Set HOME parameter for the profile
         env_vars = options.env or {}
         home = env_vars.get("HOME") or os.environ.get("HOME", str(Path.home()))
 
         # Add parameters for the sandbox profile
-        sandbox_args.extend([
-            "-D", f"HOME={home}",
-        ])
+        sandbox_args.extend(["-D", f"HOME={home}"])
 
         # Wrap command with resource limits if specified
         if options.max_memory_mb or options.max_cpu_percent:
@@ -199,25 +285,14 @@ class SandboxExecIsolator(FilesystemIsolator):
             )
 
         # Add the shell command to execute
-        sandbox_args.extend([
-            "/bin/sh",
-            "-c",
-            command,
-        ])
-
-        wrapped_command = " ".join(shlex.quote(arg) for arg in sandbox_args)
+        sandbox_args.extend(["/bin/sh", "-c", command])
 
         # Add proxy environment variables if network isolation is enabled
         if options.network_isolation and options.proxy_socket_path:
-            proxy_url = "socks5://localhost:9050"
-            env_vars.update({
-                "HTTP_PROXY": proxy_url,
-                "HTTPS_PROXY": proxy_url,
-                "http_proxy": proxy_url,
-                "https_proxy": proxy_url,
-            })
+            # Copy rather than update: env_vars may be the caller's options.env
+            env_vars = {**env_vars, **_PROXY_ENV}
 
-        return wrapped_command, env_vars
+        return sandbox_args, env_vars
 
     def _wrap_with_resource_limits(
         self,
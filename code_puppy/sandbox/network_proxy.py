@@ -4,11 +4,53 @@ Network proxy server for monitoring and restricting network access.
 
 import asyncio
 import logging
+import socket
+import time
 import urllib.parse
 from typing import Callable, Optional, Set
 
 logger = logging.getLogger(__name__)
 
+# Bytes moved per relay iteration. Proxy streams are opened with this as their
+# buffer limit, and it matches the 256 KiB asyncio reads from a socket at once,
+# so a full buffer is handed on in one write
+_RELAY_CHUNK_SIZE = 262144
+
+# Listen queue for bursts of sandboxed clients connecting at once (the kernel
+# caps it at net.core.somaxconn)
+_ACCEPT_BACKLOG = 4096
+
+# How long a resolved upstream address is reused before looking it up again
+_DNS_CACHE_TTL = 60.0
+
+# Commonly-used safe domains every proxy allows (package registries, git hosts, etc.)
+_DEFAULT_ALLOWED_DOMAINS: frozenset[str] = frozenset(
+    {
+        # Package registries
+        "pypi.org",
+        "files.pythonhosted.org",
+        "npmjs.com",
+        "registry.npmjs.org",
+        "rubygems.org",
+        "crates.io",
+        # Version control
+        "github.com",
+        "raw.githubusercontent.com",
+        "gitlab.com",
+        "bitbucket.org",
+        # CDNs
+        "cdn.jsdelivr.net",
+        "unpkg.com",
+        # Documentation
+        "docs.python.org",
+        "nodejs.org",
+        # AI providers (for code-puppy itself)
+        "api.openai.com",
+        "api.anthropic.com",
+        "generativelanguage.googleapis.com",
+    }
+)
+
 
 class NetworkProxyServer:
     """
@@ -34,50 +76,35 @@ class NetworkProxyServer:
             approval_callback: Async function to ask user for domain approval
             port: Port to listen on
         """
-        self.allowed_domains = allowed_domains or set()
+        self.allowed_domains = set(allowed_domains or ())
+        self.allowed_domains |= _DEFAULT_ALLOWED_DOMAINS
         self.approval_callback = approval_callback
         self.port = port
         self.server: Optional[asyncio.Server] = None
         self._running = False
-
-        # Default allowed domains (package registries, git hosts, etc.)
-        self._add_default_domains()
-
-    def _add_default_domains(self):
-        """Add commonly-used safe domains."""
-        default_domains = {
-            # Package registries
-            "pypi.org",
-            "files.pythonhosted.org",
-            "npmjs.com",
-            "registry.npmjs.org",
-            "rubygems.org",
-            "crates.io",
-            # Version control
-            "github.com",
-            "raw.githubusercontent.com",
-            "gitlab.com",
-            "bitbucket.org",
-            # CDNs
-            "cdn.jsdelivr.net",
-            "unpkg.com",
-            # Documentation
-            "docs.python.org",
-            "nodejs.org",
-            # AI providers (for code-puppy itself)
-            "api.openai.com",
-            "api.anthropic.com",
-            "generativelanguage.googleapis.com",
+        # (host, port) -> (expiry, address) for recently resolved upstreams
+        self._resolved: dict[tuple[str, int], tuple[float, str]] = {}
+
+        # "*.example.com" entries stored as "example.com", so lookups can walk
+        # the request's suffixes without building wildcard strings (the
+        # defaults contain no wildcards)
+        self._wildcard_suffixes: set[str] = {
+            d[2:] for d in allowed_domains or () if d.startswith("*.")
         }
-        self.allowed_domains.update(default_domains)
 
     def add_allowed_domain(self, domain: str):
-        """Add a domain to the allowlist."""
-        self.allowed_domains.add(domain.lower())
+        """Add a domain (or a ``*.`` wildcard) to the allowlist."""
+        domain = domain.lower()
+        self.allowed_domains.add(domain)
+        if domain.startswith("*."):
+            self._wildcard_suffixes.add(domain[2:])
 
     def remove_allowed_domain(self, domain: str):
-        """Remove a domain from the allowlist."""
-        self.allowed_domains.discard(domain.lower())
+        """Remove a domain (or a ``*.`` wildcard) from the allowlist."""
+        domain = domain.lower()
+        self.allowed_domains.discard(domain)
+        if domain.startswith("*."):
+            self._wildcard_suffixes.discard(domain[2:])
 
     async def _handle_client(
         self,
@@ -91,36 +118,50 @@ class NetworkProxyServer:
             if not request_line:
                 return
 
-            request_line = request_line.decode("utf-8").strip()
-            logger.debug(f"Proxy request: {request_line}")
-
-            # Parse the request
-            parts = request_line.split()
+            # CONNECT host:port (every HTTPS request) is split at the bytes
+            # level; only plain-HTTP absolute URLs need urlparse
+            parts = request_line.split(None, 2)
             if len(parts) < 2:
                 await self._send_error(writer, 400, "Bad Request")
                 return
 
-            method, url = parts[0], parts[1]
+            if parts[0] == b"CONNECT":
+                method = "CONNECT"
+                host, sep, port = parts[1].rpartition(b":")
+                if not sep:
+                    host, port = parts[1], b""
+                if not host or (port and not port.isdigit()):
+                    await self._send_error(writer, 400, "Bad Request")
+                    return
+                domain = host.strip(b"[]").decode("ascii", "replace")
+                port = int(port) if port else 443
+                logger.debug("Proxy request: CONNECT %s:%s", domain, port)
+            else:
+                request_line = request_line.decode("utf-8").strip()
+                logger.debug("Proxy request: %s", request_line)
+                method, url = request_line.split(None, 2)[:2]
 
-            # Extract the domain from the URL
-            parsed = urllib.parse.urlparse(url if url.startswith("http") else f"http://{url}")
-            domain = parsed.netloc.split(":")[0]  # Remove port if present
+                # Extract the domain from the URL
+                parsed = urllib.parse.urlparse(
+                    url if url.startswith("http") else f"http://{url}"
+                )
+                domain = parsed.netloc.split(":")[0]  # Remove port if present
 
             # Check if domain is allowed
             if not await self._is_domain_allowed(domain):
-                logger.warning(f"Blocked request to unauthorized domain: {domain}")
+                logger.warning("Blocked request to unauthorized domain: %s", domain)
                 await self._send_error(writer, 403, f"Domain not allowed: {domain}")
                 return
 
             # For CONNECT requests (HTTPS), establish a tunnel
             if method == "CONNECT":
-                await self._handle_connect(reader, writer, domain, parsed.port or 443)
+                await self._handle_connect(reader, writer, domain, port)
             else:
                 # For regular HTTP, forward the request
                 await self._forward_request(reader, writer, method, url, request_line)
 
         except Exception as e:
-            logger.error(f"Error handling proxy client: {e}", exc_info=True)
+            logger.error("Error handling proxy client: %s", e, exc_info=True)
         finally:
             try:
                 writer.close()
@@ -136,12 +177,16 @@ class NetworkProxyServer:
         if domain in self.allowed_domains:
             return True
 
-        # Check for wildcard matches (e.g., *.github.com)
-        parts = domain.split(".")
-        for i in range(len(parts)):
-            wildcard = "*." + ".".join(parts[i:])
-            if wildcard in self.allowed_domains:
-                return True
+        # Check for wildcard matches (e.g., *.github.com also covers github.com)
+        if self._wildcard_suffixes:
+            suffix = domain
+            while True:
+                if suffix in self._wildcard_suffixes:
+                    return True
+                dot = suffix.find(".")
+                if dot < 0:
+                    break
+                suffix = suffix[dot + 1 :]
 
         # Ask user for approval if callback is provided
         if self.approval_callback:
@@ -164,6 +209,30 @@ class NetworkProxyServer:
         writer.write(response.encode("utf-8"))
         await writer.drain()
 
+    async def _open_upstream(self, host: str, port: int):
+        """Connect to an upstream server, reusing a recent DNS answer for ``host``."""
+        key = (host, port)
+        cached = self._resolved.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            try:
+                return await asyncio.open_connection(
+                    cached[1], port, limit=_RELAY_CHUNK_SIZE
+                )
+            except OSError:
+                # The address went stale; resolve afresh below
+                self._resolved.pop(key, None)
+
+        reader, writer = await asyncio.open_connection(
+            host, port, limit=_RELAY_CHUNK_SIZE
+        )
+        peer = writer.get_extra_info("peername")
+        if peer and writer.get_extra_info("socket").family in (
+            socket.AF_INET,
+            socket.AF_INET6,
+        ):
+            self._resolved[key] = (time.monotonic() + _DNS_CACHE_TTL, peer[0])
+        return reader, writer
+
     async def _handle_connect(
         self,
         client_reader: asyncio.StreamReader,
@@ -174,7 +243,7 @@ class NetworkProxyServer:
         """Handle HTTPS CONNECT tunnel."""
         try:
             # Connect to the target server
-            target_reader, target_writer = await asyncio.open_connection(host, port)
+            target_reader, target_writer = await self._open_upstream(host, port)
 
             # Send success response to client
             response = "HTTP/1.1 200 Connection Established\r\n\r\n"
@@ -189,7 +258,7 @@ class NetworkProxyServer:
             )
 
         except Exception as e:
-            logger.error(f"Error in CONNECT tunnel to {host}:{port}: {e}")
+            logger.error("Error in CONNECT tunnel to %s:%s: %s", host, port, e)
         finally:
             try:
                 target_writer.close()
@@ -213,7 +282,7 @@ class NetworkProxyServer:
             port = int(parsed.port) if parsed.port else 80
 
             # Connect to target
-            target_reader, target_writer = await asyncio.open_connection(host, port)
+            target_reader, target_writer = await self._open_upstream(host, port)
 
             # Forward the request
             target_writer.write(f"{request_line}\r\n".encode("utf-8"))
@@ -235,7 +304,7 @@ class NetworkProxyServer:
             )
 
         except Exception as e:
-            logger.error(f"Error forwarding request to {url}: {e}")
+            logger.error("Error forwarding request to %s: %s", url, e)
         finally:
             try:
                 target_writer.close()
@@ -250,15 +319,19 @@ class NetworkProxyServer:
         label: str,
     ):
         """Relay data from reader to writer."""
+        transport = writer.transport
         try:
             while True:
-                data = await reader.read(8192)
-                if not data:
+                data = await reader.read(_RELAY_CHUNK_SIZE)
+                if not data or transport.is_closing():
                     break
                 writer.write(data)
-                await writer.drain()
+                # Only yield for backpressure when the write did not go out
+                # immediately; drain() is a no-op otherwise
+                if transport.get_write_buffer_size():
+                    await writer.drain()
         except Exception as e:
-            logger.debug(f"Relay {label} ended: {e}")
+            logger.debug("Relay %s ended: %s", label, e)
 
     async def start(self):
         """Start the proxy server."""
@@ -269,10 +342,12 @@ class NetworkProxyServer:
             self._handle_client,
             "127.0.0.1",
             self.port,
+            limit=_RELAY_CHUNK_SIZE,
+            backlog=_ACCEPT_BACKLOG,
         )
 
         self._running = True
-        logger.info(f"Network proxy started on 127.0.0.1:{self.port}")
+        logger.info("Network proxy started on 127.0.0.1:%s", self.port)
 
     async def stop(self):
         """Stop the proxy server."""
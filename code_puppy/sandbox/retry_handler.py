@@ -9,6 +9,13 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Exit codes that commonly indicate a sandbox-related failure:
+# - 1: General error (could be sandbox-related)
+# - 126: Permission denied
+# - 127: Command not found (could be sandboxing blocking path)
+# - 139: Segmentation fault (can happen with sandbox misconfig)
+_SANDBOX_FAILURE_CODES = frozenset({1, 126, 127, 139})
+
 
 class SandboxRetryHandler:
     """Handles retry logic for failed sandboxed commands."""
@@ -39,21 +46,14 @@ class SandboxRetryHandler:
             return False
 
         # Check if this is likely a sandbox-related failure
-        # Common sandbox failure codes:
-        # - 1: General error (could be sandbox-related)
-        # - 126: Permission denied
-        # - 127: Command not found (could be sandboxing blocking path)
-        # - 139: Segmentation fault (can happen with sandbox misconfig)
-        sandbox_related_codes = {1, 126, 127, 139}
-
-        if exit_code in sandbox_related_codes:
-            logger.info(
-                f"Command failed with exit code {exit_code}, "
-                f"which may be sandbox-related"
-            )
-            return True
+        if exit_code not in _SANDBOX_FAILURE_CODES:
+            return False
 
-        return False
+        logger.info(
+            "Command failed with exit code %d, which may be sandbox-related",
+            exit_code,
+        )
+        return True
 
     async def request_unsandboxed_retry(
         self,
@@ -74,12 +74,12 @@ class SandboxRetryHandler:
             try:
                 approved = await approval_callback(command)
                 if approved:
-                    logger.info(f"User approved unsandboxed retry for: {command}")
+                    logger.info("User approved unsandboxed retry for: %s", command)
                 else:
-                    logger.info(f"User rejected unsandboxed retry for: {command}")
+                    logger.info("User rejected unsandboxed retry for: %s", command)
                 return approved
             except Exception as e:
-                logger.error(f"Error in approval callback: {e}")
+                logger.error("Error in approval callback: %s", e)
                 return False
 
         # No callback provided, default to deny
@@ -125,7 +125,7 @@ def create_retry_approval_callback(console):
                 return response.lower().strip() in ("y", "yes")
 
         except Exception as e:
-            logger.error(f"Error in retry approval callback: {e}")
+            logger.error("Error in retry approval callback: %s", e)
             return False
 
         return False
@@ -10,6 +10,7 @@ from __future__ import annotations
 
 import json
 import pickle
+import zlib
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Callable, List
@@ -17,6 +18,11 @@ from typing import Any, Callable, List
 SessionHistory = List[Any]
 TokenEstimator = Callable[[Any], int]
 
+# Z_BEST_SPEED: most of the size win for a fraction of the CPU of higher levels
+_COMPRESS_LEVEL = 1
+# Every zlib stream starts with 0x78; pickles (protocol 2+) start with 0x80
+_ZLIB_MAGIC = b"\x78"
+
 
 @dataclass(slots=True)
 class SessionPaths:
@@ -64,12 +70,17 @@ def save_session(
     timestamp: str,
     token_estimator: TokenEstimator,
     auto_saved: bool = False,
+    compress: bool = False,
 ) -> SessionMetadata:
     ensure_directory(base_dir)
     paths = build_session_paths(base_dir, session_name)
 
-    with paths.pickle_path.open("wb") as pickle_file:
-        pickle.dump(history, pickle_file)
+    if compress:
+        payload = zlib.compress(pickle.dumps(history), _COMPRESS_LEVEL)
+        paths.pickle_path.write_bytes(payload)
+    else:
+        with paths.pickle_path.open("wb") as pickle_file:
+            pickle.dump(history, pickle_file)
 
     total_tokens = sum(token_estimator(message) for message in history)
     metadata = SessionMetadata(
@@ -92,8 +103,10 @@ def load_session(session_name: str, base_dir: Path) -> SessionHistory:
     paths = build_session_paths(base_dir, session_name)
     if not paths.pickle_path.exists():
         raise FileNotFoundError(paths.pickle_path)
-    with paths.pickle_path.open("rb") as pickle_file:
-        return pickle.load(pickle_file)
+    data = paths.pickle_path.read_bytes()
+    if data[:1] == _ZLIB_MAGIC:
+        data = zlib.decompress(data)
+    return pickle.loads(data)
 
 
 def list_sessions(base_dir: Path) -> List[str]:
@@ -1,18 +1,23 @@
 import os
+import select
+import selectors
 import signal
 import subprocess
 import sys
 import threading
 import time
 import traceback
+from collections import deque
 from contextlib import contextmanager
-from typing import Callable, Literal, Optional, Set
+from typing import Callable, Literal, Optional
 
 from pydantic import BaseModel
 from pydantic_ai import RunContext
 from rich.markdown import Markdown
 from rich.text import Text
 
+from code_puppy.callbacks import count_callbacks, on_run_shell_command
+from code_puppy.config import get_puppy_name, get_yolo_mode
 from code_puppy.messaging import (
     emit_divider,
     emit_error,
@@ -23,6 +28,11 @@ from code_puppy.messaging import (
 from code_puppy.tools.common import generate_group_id, get_user_approval_async
 from code_puppy.tui_state import is_tui_mode
 
+try:
+    from code_puppy.messaging.spinner import pause_all_spinners, resume_all_spinners
+except ImportError:  # Spinner functionality not available
+    pause_all_spinners = resume_all_spinners = None
+
 # Import sandboxing components
 try:
     from code_puppy.sandbox import SandboxCommandWrapper, SandboxConfig
@@ -33,6 +43,8 @@ except ImportError:
     SandboxCommandWrapper = None
     SandboxConfig = None
 
+_IS_WINDOWS = sys.platform.startswith("win")
+
 # Maximum line length for shell command output to prevent massive token usage
 # This helps avoid exceeding model context limits when commands produce very long lines
 MAX_LINE_LENGTH = 256
@@ -45,18 +57,151 @@ def _truncate_line(line: str) -> str:
     return line
 
 
+# Lines of stdout/stderr kept for a streamed command's result
+_OUTPUT_TAIL_LINES = 256
+
+# Bytes read from a command's output pipe at a time
+_READ_CHUNK_SIZE = 65536
+
+# Messages for a streamed command killed by one of its timeouts
+_ABSOLUTE_TIMEOUT_MSG = Text(
+    "Process killed: absolute timeout reached", style="bold red"
+)
+_INACTIVITY_TIMEOUT_MSG = Text(
+    "Process killed: inactivity timeout reached", style="bold red"
+)
+
+# Upper bound on reads when draining a pipe after its command exits, in case
+# a background child keeps writing to it
+_MAX_DRAIN_READS = 64
+
+
+class _LineSplitter:
+    """Split a command's output bytes into decoded, length-limited lines.
+
+    As with text-mode pipes, LF, CRLF and a lone CR all end a line. Only the
+    first few hundred bytes of each line are kept: the rest would be cut by
+    the MAX_LINE_LENGTH limit anyway, so it is dropped before decoding.
+    """
+
+    # Enough bytes for MAX_LINE_LENGTH characters of any UTF-8 text
+    _MAX_LINE_BYTES = 4 * MAX_LINE_LENGTH
+
+    __slots__ = ("_overflow", "_pending", "_skip_lf")
+
+    def __init__(self):
+        self._pending = bytearray()
+        self._overflow = False
+        # The last chunk ended in CR, so an LF starting the next one is its CRLF
+        self._skip_lf = False
+
+    def feed(self, chunk: bytes, final: bool = False) -> list[str]:
+        """Consume ``chunk``; return the lines it completes (all, if ``final``)."""
+        if self._skip_lf and chunk.startswith(b"\n"):
+            chunk = chunk[1:]
+        self._skip_lf = False
+
+        lines = []
+        for piece in chunk.splitlines(keepends=True):
+            if piece.endswith((b"\n", b"\r")):
+                self._skip_lf = piece.endswith(b"\r")
+                if self._pending or self._overflow:
+                    self._append(piece.rstrip(b"\r\n"))
+                    lines.append(self._finish())
+                else:
+                    # A whole line in one chunk: decode it without buffering
+                    lines.append(self._decode(piece.rstrip(b"\r\n")))
+            else:
+                self._append(piece)
+        if final and (self._pending or self._overflow):
+            lines.append(self._finish())
+        return lines
+
+    def _append(self, data: bytes) -> None:
+        room = self._MAX_LINE_BYTES - len(self._pending)
+        if len(data) > room:
+            data = data[:room]
+            self._overflow = True
+        self._pending += data
+
+    def _decode(self, data: bytes) -> str:
+        if len(data) > self._MAX_LINE_BYTES:
+            line = data[: self._MAX_LINE_BYTES].decode("utf-8", errors="replace")
+            return line[:MAX_LINE_LENGTH] + "... [truncated]"
+        return _truncate_line(data.decode("utf-8", errors="replace"))
+
+    def _finish(self) -> str:
+        line = self._pending.decode("utf-8", errors="replace")
+        if self._overflow:
+            line = line[:MAX_LINE_LENGTH] + "... [truncated]"
+        else:
+            line = _truncate_line(line)
+        self._pending.clear()
+        self._overflow = False
+        return line
+
+
+def _open_exit_handle(pid: int):
+    """Return something that becomes readable when process ``pid`` exits.
+
+    That is a pidfd on Linux 5.3+ or a kqueue watching for NOTE_EXIT on macOS
+    and the BSDs; either can sit in a selector next to the output pipes. Returns
+    None where neither is available. Release it with ``_close_exit_handle``.
+    """
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None:
+        try:
+            return pidfd_open(pid)
+        except OSError:
+            return None
+    if hasattr(select, "kqueue"):
+        kq = select.kqueue()
+        try:
+            kq.control(
+                [
+                    select.kevent(
+                        pid,
+                        filter=select.KQ_FILTER_PROC,
+                        flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT,
+                        fflags=select.KQ_NOTE_EXIT,
+                    )
+                ],
+                0,
+            )
+        except OSError:
+            # Already exited and reaped
+            kq.close()
+            return None
+        return kq
+    return None
+
+
+def _close_exit_handle(handle) -> None:
+    """Release a handle from ``_open_exit_handle`` (None is ignored)."""
+    if isinstance(handle, int):
+        os.close(handle)
+    elif handle is not None:
+        handle.close()
+
+
 _AWAITING_USER_INPUT = False
 
 _CONFIRMATION_LOCK = threading.Lock()
 
 # Track running shell processes so we can kill them on Ctrl-C from the UI
-_RUNNING_PROCESSES: Set[subprocess.Popen] = set()
+# (keyed by pid; the lock only orders writers, readers take a snapshot)
+_RUNNING_PROCESSES: dict[int, subprocess.Popen] = {}
 _RUNNING_PROCESSES_LOCK = threading.Lock()
 _USER_KILLED_PROCESSES = set()
 
-# Global state for shell command keyboard handling
-_SHELL_CTRL_X_STOP_EVENT: Optional[threading.Event] = None
+# Global state for shell command keyboard handling. One Ctrl-X listener
+# thread serves every command: it parks on _SHELL_CTRL_X_ARMED between
+# commands and listens (with the terminal in cbreak mode) until
+# _SHELL_CTRL_X_STOP_EVENT is set, then sets _SHELL_CTRL_X_IDLE.
 _SHELL_CTRL_X_THREAD: Optional[threading.Thread] = None
+_SHELL_CTRL_X_ARMED = threading.Event()
+_SHELL_CTRL_X_STOP_EVENT = threading.Event()
+_SHELL_CTRL_X_IDLE = threading.Event()
 _ORIGINAL_SIGINT_HANDLER = None
 
 # Global sandbox wrapper (lazy initialization)
@@ -79,12 +224,34 @@ def _get_sandbox_wrapper() -> Optional[SandboxCommandWrapper]:
 
 def _register_process(proc: subprocess.Popen) -> None:
     with _RUNNING_PROCESSES_LOCK:
-        _RUNNING_PROCESSES.add(proc)
+        _RUNNING_PROCESSES[proc.pid] = proc
 
 
 def _unregister_process(proc: subprocess.Popen) -> None:
     with _RUNNING_PROCESSES_LOCK:
-        _RUNNING_PROCESSES.discard(proc)
+        # Once reaped, a pid may already belong to a newer process
+        if _RUNNING_PROCESSES.get(proc.pid) is proc:
+            del _RUNNING_PROCESSES[proc.pid]
+
+
+def _wait_for_exit(proc: subprocess.Popen, exit_handle, timeout: float) -> bool:
+    """Wait up to ``timeout`` seconds for ``proc`` to exit; return True if it has.
+
+    Sleeps on ``exit_handle`` (see ``_open_exit_handle``) when there is one, so
+    the wait ends the moment the process exits. Otherwise Popen.wait is used,
+    which blocks on the process handle on Windows.
+    """
+    if exit_handle is None:
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return False
+        return True
+
+    with selectors.DefaultSelector() as selector:
+        selector.register(exit_handle, selectors.EVENT_READ)
+        selector.select(timeout)
+    return proc.poll() is not None
 
 
 def _kill_process_group(proc: subprocess.Popen) -> None:
@@ -93,20 +260,23 @@ def _kill_process_group(proc: subprocess.Popen) -> None:
     Cross-platform best-effort. On POSIX, uses process groups. On Windows, tries taskkill with /T flag for tree kill.
     """
     try:
-        if sys.platform.startswith("win"):
+        if _IS_WINDOWS:
+            # Without a live root, taskkill cannot find the tree to kill, so
+            # skip spawning it
+            if proc.poll() is not None:
+                return
+
             # On Windows, use taskkill to kill the process tree
             # /F = force, /T = kill tree (children), /PID = process ID
             try:
-                import subprocess as sp
-
                 # Try taskkill first - more reliable on Windows
-                sp.run(
+                subprocess.run(
                     ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
                     capture_output=True,
                     timeout=2,
                     check=False,
                 )
-                time.sleep(0.3)
+                _wait_for_exit(proc, None, 0.3)
             except Exception:
                 # Fallback to Python's built-in methods
                 pass
@@ -115,53 +285,62 @@ def _kill_process_group(proc: subprocess.Popen) -> None:
             if proc.poll() is None:
                 try:
                     proc.kill()
-                    time.sleep(0.3)
+                    _wait_for_exit(proc, None, 0.3)
                 except Exception:
                     pass
             return
 
-        # POSIX
+        # POSIX: escalate signals, moving on as soon as the process exits
         pid = proc.pid
+        exit_handle = _open_exit_handle(pid)
         try:
-            pgid = os.getpgid(pid)
-            os.killpg(pgid, signal.SIGTERM)
-            time.sleep(1.0)
-            if proc.poll() is None:
-                os.killpg(pgid, signal.SIGINT)
-                time.sleep(0.6)
-            if proc.poll() is None:
-                os.killpg(pgid, signal.SIGKILL)
-                time.sleep(0.5)
-        except (OSError, ProcessLookupError):
-            # Fall back to direct kill of the process
             try:
-                if proc.poll() is None:
-                    proc.kill()
+                pgid = os.getpgid(pid)
+                os.killpg(pgid, signal.SIGTERM)
+                if not _wait_for_exit(proc, exit_handle, 1.0):
+                    os.killpg(pgid, signal.SIGINT)
+                if not _wait_for_exit(proc, exit_handle, 0.6):
+                    os.killpg(pgid, signal.SIGKILL)
+                    _wait_for_exit(proc, exit_handle, 0.5)
             except (OSError, ProcessLookupError):
-                pass
+                # Fall back to direct kill of the process
+                try:
+                    if proc.poll() is None:
+                        proc.kill()
+                except (OSError, ProcessLookupError):
+                    pass
 
-        if proc.poll() is None:
-            # Last ditch attempt; may be unkillable zombie
-            try:
-                for _ in range(3):
-                    os.kill(proc.pid, signal.SIGKILL)
-                    time.sleep(0.2)
-                    if proc.poll() is not None:
-                        break
-            except Exception:
-                pass
+            if proc.poll() is None:
+                # Last ditch attempt; may be unkillable zombie
+                try:
+                    for _ in range(3):
+                        os.kill(proc.pid, signal.SIGKILL)
+                        if _wait_for_exit(proc, exit_handle, 0.2):
+                            break
+                except Exception:
+                    pass
+        finally:
+            _close_exit_handle(exit_handle)
     except Exception as e:
         emit_error(f"Kill process error: {e}")
 
 
+def _close_process_pipes(proc: subprocess.Popen) -> None:
+    """Close whichever of ``proc``'s standard streams are still open."""
+    try:
+        for stream in (proc.stdout, proc.stderr, proc.stdin):
+            if stream and not stream.closed:
+                stream.close()
+    except (OSError, ValueError):
+        pass
+
+
 def kill_all_running_shell_processes() -> int:
     """Kill all currently tracked running shell processes.
 
     Returns the number of processes signaled.
     """
-    procs: list[subprocess.Popen]
-    with _RUNNING_PROCESSES_LOCK:
-        procs = list(_RUNNING_PROCESSES)
+    procs = list(_RUNNING_PROCESSES.values())
     count = 0
     for p in procs:
         try:
@@ -175,18 +354,12 @@ def kill_all_running_shell_processes() -> int:
 
 
 def get_running_shell_process_count() -> int:
-    """Return the number of currently-active shell processes being tracked."""
-    with _RUNNING_PROCESSES_LOCK:
-        alive = 0
-        stale: Set[subprocess.Popen] = set()
-        for proc in _RUNNING_PROCESSES:
-            if proc.poll() is None:
-                alive += 1
-            else:
-                stale.add(proc)
-        for proc in stale:
-            _RUNNING_PROCESSES.discard(proc)
-    return alive
+    """Return the number of currently-active shell processes being tracked.
+
+    Every process is unregistered once its command finishes, so no
+    liveness check is needed here.
+    """
+    return len(_RUNNING_PROCESSES)
 
 
 # Function to check if user input is awaited
@@ -203,22 +376,14 @@ def set_awaiting_user_input(awaiting=True):
     _AWAITING_USER_INPUT = awaiting
 
     # When we're setting this flag, also pause/resume all active spinners
+    if pause_all_spinners is None:
+        return
     if awaiting:
-        # Pause all active spinners (imported here to avoid circular imports)
-        try:
-            from code_puppy.messaging.spinner import pause_all_spinners
-
-            pause_all_spinners()
-        except ImportError:
-            pass  # Spinner functionality not available
+        # Pause all active spinners
+        pause_all_spinners()
     else:
         # Resume all active spinners
-        try:
-            from code_puppy.messaging.spinner import resume_all_spinners
-
-            resume_all_spinners()
-        except ImportError:
-            pass  # Spinner functionality not available
+        resume_all_spinners()
 
 
 class ShellCommandOutput(BaseModel):
@@ -295,8 +460,6 @@ def _listen_for_ctrl_x_posix(
     on_escape: Callable[[], None],
 ) -> None:
     """POSIX-specific Ctrl-X listener."""
-    import select
-    import sys
     import termios
     import tty
 
@@ -314,15 +477,16 @@ def _listen_for_ctrl_x_posix(
         tty.setcbreak(fd)
         while not stop_event.is_set():
             try:
-                read_ready, _, _ = select.select([stdin], [], [], 0.05)
+                read_ready, _, _ = select.select([fd], [], [], 0.05)
             except Exception:
                 break
             if not read_ready:
                 continue
-            data = stdin.read(1)
+            # Take everything typed or pasted since the last wake in one read
+            data = os.read(fd, 64)
             if not data:
                 break
-            if data == "\x18":  # Ctrl+X
+            if b"\x18" in data:  # Ctrl+X
                 try:
                     on_escape()
                 except Exception:
@@ -353,15 +517,22 @@ def _spawn_ctrl_x_key_listener(
         return None
 
     def listener() -> None:
-        try:
-            if sys.platform.startswith("win"):
-                _listen_for_ctrl_x_windows(stop_event, on_escape)
-            else:
-                _listen_for_ctrl_x_posix(stop_event, on_escape)
-        except Exception:
-            emit_warning(
-                "Ctrl+X key listener stopped unexpectedly; press Ctrl+C to cancel."
-            )
+        # Serve one command per arming; the terminal is only in cbreak mode
+        # while a command runs, so prompts between commands read normally
+        while True:
+            _SHELL_CTRL_X_ARMED.wait()
+            _SHELL_CTRL_X_ARMED.clear()
+            try:
+                if _IS_WINDOWS:
+                    _listen_for_ctrl_x_windows(stop_event, on_escape)
+                else:
+                    _listen_for_ctrl_x_posix(stop_event, on_escape)
+            except Exception:
+                emit_warning(
+                    "Ctrl+X key listener stopped unexpectedly; press Ctrl+C to cancel."
+                )
+            finally:
+                _SHELL_CTRL_X_IDLE.set()
 
     thread = threading.Thread(
         target=listener, name="shell-command-ctrl-x-listener", daemon=True
@@ -370,6 +541,12 @@ def _spawn_ctrl_x_key_listener(
     return thread
 
 
+def _handle_ctrl_x_press() -> None:
+    """Ctrl-X during a shell command: kill all running shell processes."""
+    emit_warning("\n🛑 Ctrl-X detected! Interrupting shell command...")
+    kill_all_running_shell_processes()
+
+
 @contextmanager
 def _shell_command_keyboard_context():
     """Context manager to handle keyboard interrupts during shell command execution.
@@ -379,30 +556,29 @@ def _shell_command_keyboard_context():
     2. Enables a Ctrl-X listener to kill the running shell process
     3. Restores the original Ctrl-C handler when done
     """
-    global _SHELL_CTRL_X_STOP_EVENT, _SHELL_CTRL_X_THREAD, _ORIGINAL_SIGINT_HANDLER
+    global _SHELL_CTRL_X_THREAD, _ORIGINAL_SIGINT_HANDLER
 
     # Skip all this in TUI mode
     if is_tui_mode():
         yield
         return
 
-    # Handler for Ctrl-X: kill all running shell processes
-    def handle_ctrl_x_press() -> None:
-        emit_warning("\n🛑 Ctrl-X detected! Interrupting shell command...")
-        kill_all_running_shell_processes()
-
     # Handler for Ctrl-C during shell execution: just kill the shell process, don't cancel agent
     def shell_sigint_handler(_sig, _frame):
         """During shell execution, Ctrl-C kills the shell but doesn't cancel the agent."""
         emit_warning("\n🛑 Ctrl-C detected! Interrupting shell command...")
         kill_all_running_shell_processes()
 
-    # Set up Ctrl-X listener
-    _SHELL_CTRL_X_STOP_EVENT = threading.Event()
-    _SHELL_CTRL_X_THREAD = _spawn_ctrl_x_key_listener(
-        _SHELL_CTRL_X_STOP_EVENT,
-        handle_ctrl_x_press,
-    )
+    # Arm the Ctrl-X listener, starting it on first use
+    if _SHELL_CTRL_X_THREAD is None or not _SHELL_CTRL_X_THREAD.is_alive():
+        _SHELL_CTRL_X_THREAD = _spawn_ctrl_x_key_listener(
+            _SHELL_CTRL_X_STOP_EVENT,
+            _handle_ctrl_x_press,
+        )
+    if _SHELL_CTRL_X_THREAD is not None:
+        _SHELL_CTRL_X_STOP_EVENT.clear()
+        _SHELL_CTRL_X_IDLE.clear()
+        _SHELL_CTRL_X_ARMED.set()
 
     # Replace SIGINT handler temporarily
     try:
@@ -414,15 +590,10 @@ def _shell_command_keyboard_context():
     try:
         yield
     finally:
-        # Clean up: stop Ctrl-X listener
-        if _SHELL_CTRL_X_STOP_EVENT:
+        # Clean up: disarm the Ctrl-X listener and let it restore the terminal
+        if _SHELL_CTRL_X_THREAD is not None:
             _SHELL_CTRL_X_STOP_EVENT.set()
-
-        if _SHELL_CTRL_X_THREAD and _SHELL_CTRL_X_THREAD.is_alive():
-            try:
-                _SHELL_CTRL_X_THREAD.join(timeout=0.2)
-            except Exception:
-                pass
+            _SHELL_CTRL_X_IDLE.wait(timeout=0.2)
 
         # Restore original SIGINT handler
         if _ORIGINAL_SIGINT_HANDLER is not None:
@@ -432,8 +603,6 @@ def _shell_command_keyboard_context():
                 pass
 
         # Clean up global state
-        _SHELL_CTRL_X_STOP_EVENT = None
-        _SHELL_CTRL_X_THREAD = None
         _ORIGINAL_SIGINT_HANDLER = None
 
 
@@ -448,76 +617,59 @@ def run_shell_command_streaming(
 
     ABSOLUTE_TIMEOUT_SECONDS = 270
 
-    stdout_lines = []
-    stderr_lines = []
+    # Only the tail of the output is returned, so only the tail is kept
+    stdout_lines = deque(maxlen=_OUTPUT_TAIL_LINES)
+    stderr_lines = deque(maxlen=_OUTPUT_TAIL_LINES)
 
-    stdout_thread = None
-    stderr_thread = None
+    reader_threads = []
+    # Streams that have not hit EOF yet
+    open_streams = [0]
 
-    def read_stdout():
-        try:
-            for line in iter(process.stdout.readline, ""):
-                if line:
-                    line = line.rstrip("\n\r")
-                    # Limit line length to prevent massive token usage
-                    line = _truncate_line(line)
-                    stdout_lines.append(line)
-                    emit_system_message(line, message_group=group_id)
-                    last_output_time[0] = time.time()
-        except Exception:
-            pass
+    def handle_output(lines: deque, new_lines: list[str]):
+        for line in new_lines:
+            lines.append(line)
+            emit_system_message(line, message_group=group_id)
+            last_output_time[0] = time.time()
 
-    def read_stderr():
+    def read_stream(stream, lines: deque):
+        """Thread body for platforms whose pipes cannot be selected on."""
+        splitter = _LineSplitter()
         try:
-            for line in iter(process.stderr.readline, ""):
-                if line:
-                    line = line.rstrip("\n\r")
-                    # Limit line length to prevent massive token usage
-                    line = _truncate_line(line)
-                    stderr_lines.append(line)
-                    emit_system_message(line, message_group=group_id)
-                    last_output_time[0] = time.time()
+            for chunk in iter(lambda: stream.read1(_READ_CHUNK_SIZE), b""):
+                handle_output(lines, splitter.feed(chunk))
         except Exception:
             pass
+        handle_output(lines, splitter.feed(b"", final=True))
+        open_streams[0] -= 1
 
-    def cleanup_process_and_threads(timeout_type: str = "unknown"):
-        nonlocal stdout_thread, stderr_thread
-
-        def nuclear_kill(proc):
-            _kill_process_group(proc)
+    def drain_stream(fd: int, splitter: _LineSplitter, lines: deque):
+        """Read whatever is already buffered in a pipe, without blocking."""
+        os.set_blocking(fd, False)
+        for _ in range(_MAX_DRAIN_READS):
+            try:
+                chunk = os.read(fd, _READ_CHUNK_SIZE)
+            except BlockingIOError:
+                return
+            if not chunk:
+                return
+            handle_output(lines, splitter.feed(chunk))
 
+    def cleanup_process_and_threads(timeout_type: str = "unknown"):
         try:
             if process.poll() is None:
-                nuclear_kill(process)
+                _kill_process_group(process)
 
-            try:
-                if process.stdout and not process.stdout.closed:
-                    process.stdout.close()
-                if process.stderr and not process.stderr.closed:
-                    process.stderr.close()
-                if process.stdin and not process.stdin.closed:
-                    process.stdin.close()
-            except (OSError, ValueError):
-                pass
-
-            # Unregister once we're done cleaning up
-            _unregister_process(process)
+            # Close the pipes before joining the reader threads blocked on them
+            _close_process_pipes(process)
 
-            if stdout_thread and stdout_thread.is_alive():
-                stdout_thread.join(timeout=3)
-                if stdout_thread.is_alive():
-                    emit_warning(
-                        f"stdout reader thread failed to terminate after {timeout_type} timeout",
-                        message_group=group_id,
-                    )
-
-            if stderr_thread and stderr_thread.is_alive():
-                stderr_thread.join(timeout=3)
-                if stderr_thread.is_alive():
-                    emit_warning(
-                        f"stderr reader thread failed to terminate after {timeout_type} timeout",
-                        message_group=group_id,
-                    )
+            for thread in reader_threads:
+                if thread.is_alive():
+                    thread.join(timeout=3)
+                    if thread.is_alive():
+                        emit_warning(
+                            f"{thread.name} reader thread failed to terminate after {timeout_type} timeout",
+                            message_group=group_id,
+                        )
 
         except Exception as e:
             emit_warning(f"Error during process cleanup: {e}", message_group=group_id)
@@ -527,8 +679,8 @@ def run_shell_command_streaming(
             **{
                 "success": False,
                 "command": command,
-                "stdout": "\n".join(stdout_lines[-256:]),
-                "stderr": "\n".join(stderr_lines[-256:]),
+                "stdout": "\n".join(stdout_lines),
+                "stderr": "\n".join(stderr_lines),
                 "exit_code": -9,
                 "execution_time": execution_time,
                 "timeout": True,
@@ -536,85 +688,138 @@ def run_shell_command_streaming(
             }
         )
 
+    exit_handle = None
+    selector = None
     try:
-        stdout_thread = threading.Thread(target=read_stdout, daemon=True)
-        stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-
-        stdout_thread.start()
-        stderr_thread.start()
-
-        while process.poll() is None:
-            current_time = time.time()
-
-            if current_time - start_time > ABSOLUTE_TIMEOUT_SECONDS:
-                error_msg = Text()
-                error_msg.append(
-                    "Process killed: inactivity timeout reached", style="bold red"
+        streams = [
+            (name, stream, lines)
+            for name, stream, lines in (
+                ("stdout", process.stdout, stdout_lines),
+                ("stderr", process.stderr, stderr_lines),
+            )
+            if stream is not None
+        ]
+        open_streams[0] = len(streams)
+
+        if _IS_WINDOWS:
+            # Windows pipes cannot be selected on; read each from its own thread
+            for name, stream, lines in streams:
+                thread = threading.Thread(
+                    target=read_stream, args=(stream, lines), name=name, daemon=True
                 )
-                emit_error(error_msg, message_group=group_id)
-                return cleanup_process_and_threads("absolute")
-
-            if current_time - last_output_time[0] > timeout:
-                error_msg = Text()
-                error_msg.append(
-                    "Process killed: inactivity timeout reached", style="bold red"
+                reader_threads.append(thread)
+                thread.start()
+        else:
+            # One selector drains both pipes and, via a pidfd or kqueue where
+            # available, wakes as soon as the child exits
+            selector = selectors.DefaultSelector()
+            for _, stream, lines in streams:
+                selector.register(
+                    stream, selectors.EVENT_READ, (_LineSplitter(), lines)
                 )
-                emit_error(error_msg, message_group=group_id)
-                return cleanup_process_and_threads("inactivity")
-
-            time.sleep(0.1)
+            exit_handle = _open_exit_handle(process.pid)
+            if exit_handle is not None:
+                selector.register(exit_handle, selectors.EVENT_READ)
+
+        exited_at = None
+        # With an exit handle, the child is only reaped once the handle fires
+        # or its pipes close, rather than with a waitpid on every wakeup
+        exit_signalled = exit_handle is None
+        while True:
+            current_time = time.time()
+            if (
+                exited_at is None
+                and (exit_signalled or not open_streams[0])
+                and process.poll() is not None
+            ):
+                exited_at = current_time
+
+            if exited_at is None:
+                if current_time - start_time > ABSOLUTE_TIMEOUT_SECONDS:
+                    emit_error(_ABSOLUTE_TIMEOUT_MSG, message_group=group_id)
+                    return cleanup_process_and_threads("absolute")
+
+                if current_time - last_output_time[0] > timeout:
+                    emit_error(_INACTIVITY_TIMEOUT_MSG, message_group=group_id)
+                    return cleanup_process_and_threads("inactivity")
+
+                next_deadline = min(
+                    start_time + ABSOLUTE_TIMEOUT_SECONDS,
+                    last_output_time[0] + timeout,
+                )
+            elif selector is not None:
+                # Everything the child wrote is already in the pipes: collect
+                # it without waiting on background children that keep them open
+                for key in list(selector.get_map().values()):
+                    if key.data is not None:
+                        drain_stream(key.fd, *key.data)
+                break
+            else:
+                # Reader threads get a moment to finish up, but don't wait on
+                # background children that keep the pipes open
+                if not open_streams[0] or current_time - exited_at > 5:
+                    break
+                next_deadline = exited_at + 5
+
+            wait = max(next_deadline - current_time, 0)
+            if selector is None:
+                if exited_at is None:
+                    _wait_for_exit(process, None, wait)
+                else:
+                    time.sleep(min(wait, 0.1))
+                continue
 
-        if stdout_thread:
-            stdout_thread.join(timeout=5)
-        if stderr_thread:
-            stderr_thread.join(timeout=5)
+            if exit_handle is None:
+                # Nothing signals the child's exit, so check on it regularly
+                wait = min(wait, 0.1)
+
+            for key, _ in selector.select(wait):
+                if key.data is None:
+                    # The child exited; stop watching its exit handle
+                    selector.unregister(key.fileobj)
+                    exit_signalled = True
+                    continue
+                splitter, lines = key.data
+                chunk = os.read(key.fd, _READ_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(key.fileobj)
+                    open_streams[0] -= 1
+                handle_output(lines, splitter.feed(chunk, final=not chunk))
+
+        if selector is not None:
+            # Keep any unterminated output from streams we stopped waiting on
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    splitter, lines = key.data
+                    handle_output(lines, splitter.feed(b"", final=True))
 
         exit_code = process.returncode
         execution_time = time.time() - start_time
 
-        try:
-            if process.stdout and not process.stdout.closed:
-                process.stdout.close()
-            if process.stderr and not process.stderr.closed:
-                process.stderr.close()
-            if process.stdin and not process.stdin.closed:
-                process.stdin.close()
-        except (OSError, ValueError):
-            pass
-
-        _unregister_process(process)
-
         if exit_code != 0:
             emit_error(
                 f"Command failed with exit code {exit_code}", message_group=group_id
             )
             emit_info(f"Took {execution_time:.2f}s", message_group=group_id)
             time.sleep(1)
-            # Apply line length limits to stdout/stderr before returning
-            truncated_stdout = [_truncate_line(line) for line in stdout_lines[-256:]]
-            truncated_stderr = [_truncate_line(line) for line in stderr_lines[-256:]]
 
             return ShellCommandOutput(
                 success=False,
                 command=command,
                 error="""The process didn't exit cleanly! If the user_interrupted flag is true,
                 please stop all execution and ask the user for clarification!""",
-                stdout="\n".join(truncated_stdout),
-                stderr="\n".join(truncated_stderr),
+                stdout="\n".join(stdout_lines),
+                stderr="\n".join(stderr_lines),
                 exit_code=exit_code,
                 execution_time=execution_time,
                 timeout=False,
                 user_interrupted=process.pid in _USER_KILLED_PROCESSES,
             )
-        # Apply line length limits to stdout/stderr before returning
-        truncated_stdout = [_truncate_line(line) for line in stdout_lines[-256:]]
-        truncated_stderr = [_truncate_line(line) for line in stderr_lines[-256:]]
-
         return ShellCommandOutput(
             success=exit_code == 0,
             command=command,
-            stdout="\n".join(truncated_stdout),
-            stderr="\n".join(truncated_stderr),
+            stdout="\n".join(stdout_lines),
+            stderr="\n".join(stderr_lines),
             exit_code=exit_code,
             execution_time=execution_time,
             timeout=False,
@@ -625,18 +830,22 @@ def run_shell_command_streaming(
             success=False,
             command=command,
             error=f"Error during streaming execution: {str(e)}",
-            stdout="\n".join(stdout_lines[-1000:]),
-            stderr="\n".join(stderr_lines[-1000:]),
+            stdout="\n".join(stdout_lines),
+            stderr="\n".join(stderr_lines),
             exit_code=-1,
             timeout=False,
         )
+    finally:
+        if selector is not None:
+            selector.close()
+        _close_exit_handle(exit_handle)
+        _close_process_pipes(process)
+        _unregister_process(process)
 
 
 async def run_shell_command(
     context: RunContext, command: str, cwd: str = None, timeout: int = 60
 ) -> ShellCommandOutput:
-    command_displayed = False
-
     # Generate unique group_id for this command execution
     group_id = generate_group_id("shell_command", command)
 
@@ -646,10 +855,14 @@ async def run_shell_command(
     )
 
     # Invoke safety check callbacks (only active in yolo_mode)
-    # This allows plugins to intercept and assess commands before execution
-    from code_puppy.callbacks import on_run_shell_command
-
-    callback_results = await on_run_shell_command(context, command, cwd, timeout)
+    # This allows plugins to intercept and assess commands before execution.
+    # The hook is public, so plugins decide for themselves when to act; the
+    # dispatch is only skipped when nothing is registered.
+    callback_results = (
+        await on_run_shell_command(context, command, cwd, timeout)
+        if count_callbacks("run_shell_command")
+        else ()
+    )
 
     # Check if any callback blocked the command
     # Callbacks can return None (allow) or a dict with blocked=True (reject)
@@ -673,8 +886,6 @@ async def run_shell_command(
             **{"success": False, "error": "Command cannot be empty"}
         )
 
-    from code_puppy.config import get_yolo_mode
-
     yolo_mode = get_yolo_mode()
 
     confirmation_lock_acquired = False
@@ -689,11 +900,7 @@ async def run_shell_command(
                 error="Another command is currently awaiting confirmation",
             )
 
-        command_displayed = True
-
         # Get puppy name for personalized messages
-        from code_puppy.config import get_puppy_name
-
         puppy_name = get_puppy_name().title()
 
         # Build panel content
@@ -743,8 +950,6 @@ async def run_shell_command(
                     execution_time=None,
                 )
             return result
-    else:
-        start_time = time.time()
 
     # Now that approval is done, activate the Ctrl-X listener and disable agent Ctrl-C
     with _shell_command_keyboard_context():
@@ -757,8 +962,9 @@ async def run_shell_command(
 
             if sandbox and sandbox.config.enabled:
                 try:
+                    # The sandbox only reads the environment, so no copy
                     wrapped_command, sandbox_env, was_excluded = sandbox.wrap_command(
-                        command, cwd=cwd, env=os.environ.copy()
+                        command, cwd=cwd, env=os.environ, as_argv=True
                     )
                     if was_excluded:
                         emit_info(
@@ -772,68 +978,47 @@ async def run_shell_command(
                         )
                 except Exception as e:
                     emit_warning(
-                        f"Failed to wrap command with sandbox: {e}", message_group=group_id
+                        f"Failed to wrap command with sandbox: {e}",
+                        message_group=group_id,
                     )
 
             creationflags = 0
-            preexec_fn = None
-            if sys.platform.startswith("win"):
+            if _IS_WINDOWS:
                 try:
                     creationflags = subprocess.CREATE_NEW_PROCESS_GROUP  # type: ignore[attr-defined]
                 except Exception:
                     creationflags = 0
-            else:
-                preexec_fn = os.setsid if hasattr(os, "setsid") else None
 
             process = subprocess.Popen(
                 wrapped_command,
-                shell=True,
+                # A sandboxed argv already runs the command under /bin/sh -c
+                shell=isinstance(wrapped_command, str),
+                # Binary pipes: output is decoded line by line as it streams
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
                 cwd=cwd,
-                bufsize=1,
-                universal_newlines=True,
-                preexec_fn=preexec_fn,
+                # setsid() in the fork glue: no Python runs between fork and exec
+                start_new_session=not _IS_WINDOWS,
                 creationflags=creationflags,
-                env=sandbox_env if sandbox_env else None,
+                # An unchanged os.environ is simply inherited
+                env=sandbox_env
+                if sandbox_env and sandbox_env is not os.environ
+                else None,
             )
             _register_process(process)
-            try:
-                return run_shell_command_streaming(
-                    process, timeout=timeout, command=command, group_id=group_id
-                )
-            finally:
-                # Ensure unregistration in case streaming returned early or raised
-                _unregister_process(process)
+            # Streaming closes the pipes and unregisters the process on every path
+            return run_shell_command_streaming(
+                process, timeout=timeout, command=command, group_id=group_id
+            )
         except Exception as e:
             emit_error(traceback.format_exc(), message_group=group_id)
-            if "stdout" not in locals():
-                stdout = None
-            if "stderr" not in locals():
-                stderr = None
-
-            # Apply line length limits to stdout/stderr if they exist
-            truncated_stdout = None
-            if stdout:
-                stdout_lines = stdout.split("\n")
-                truncated_stdout = "\n".join(
-                    [_truncate_line(line) for line in stdout_lines[-256:]]
-                )
-
-            truncated_stderr = None
-            if stderr:
-                stderr_lines = stderr.split("\n")
-                truncated_stderr = "\n".join(
-                    [_truncate_line(line) for line in stderr_lines[-256:]]
-                )
-
             return ShellCommandOutput(
                 success=False,
                 command=command,
                 error=f"Error executing command {str(e)}",
-                stdout=truncated_stdout,
-                stderr=truncated_stderr,
+                # Streaming returns its own result, so nothing was captured here
+                stdout=None,
+                stderr=None,
                 exit_code=-1,
                 timeout=False,
             )
@@ -1,6 +1,7 @@
 import fnmatch
 import hashlib
 import os
+import random
 import sys
 import time
 from pathlib import Path
@@ -1041,6 +1042,10 @@ def _find_best_window(
     return best_span, best_score
 
 
+# Characters of extra_context that feed into a group_id hash
+_GROUP_ID_CONTEXT_CHARS = 256
+
+
 def generate_group_id(tool_name: str, extra_context: str = "") -> str:
     """Generate a unique group_id for tool output grouping.
 
@@ -1052,11 +1057,12 @@ def generate_group_id(tool_name: str, extra_context: str = "") -> str:
         A string in format: tool_name_hash
     """
     # Create a unique identifier using timestamp, context, and a random component
-    import random
-
     timestamp = str(int(time.time() * 1000000))  # microseconds for more uniqueness
     random_component = random.randint(1000, 9999)  # Add randomness
-    context_string = f"{tool_name}_{timestamp}_{random_component}_{extra_context}"
+    # The timestamp and random part carry the uniqueness, so a prefix of the
+    # context is enough (callers pass whole shell commands here)
+    context = extra_context[:_GROUP_ID_CONTEXT_CHARS]
+    context_string = f"{tool_name}_{timestamp}_{random_component}_{context}"
 
     # Generate a short hash
     hash_obj = hashlib.md5(context_string.encode())
@@ -888,6 +888,7 @@ class SettingsScreen(ModalScreen):
     def save_settings(self) -> None:
         """Save the modified settings."""
         from code_puppy.config import (
+            config_transaction,
             get_model_context_length,
             set_auto_save_session,
             set_config_value,
@@ -904,133 +905,143 @@ class SettingsScreen(ModalScreen):
         )
 
         try:
-            # Tab 1: General
-            puppy_name = self.query_one("#puppy-name-input", Input).value.strip()
-            owner_name = self.query_one("#owner-name-input", Input).value.strip()
-            yolo_mode = self.query_one("#yolo-mode-switch", Switch).value
-            allow_recursion = self.query_one("#allow-recursion-switch", Switch).value
-
-            if puppy_name:
-                set_config_value("puppy_name", puppy_name)
-            if owner_name:
-                set_config_value("owner_name", owner_name)
-            set_config_value("yolo_mode", "true" if yolo_mode else "false")
-            set_config_value("allow_recursion", "true" if allow_recursion else "false")
-
-            # Tab 2: Models & AI
-            selected_model = self.query_one("#model-select", Select).value
-            selected_vqa_model = self.query_one("#vqa-model-select", Select).value
-            reasoning_effort = self.query_one("#reasoning-effort-select", Select).value
-
-            model_changed = False
-            if selected_model:
-                set_model_name(selected_model)
-                model_changed = True
-            if selected_vqa_model:
-                set_vqa_model_name(selected_vqa_model)
-            set_openai_reasoning_effort(reasoning_effort)
-
-            # Tab 3: History & Context
-            compaction_strategy = self.query_one(
-                "#compaction-strategy-select", Select
-            ).value
-            compaction_threshold = self.query_one(
-                "#compaction-threshold-input", Input
-            ).value.strip()
-            protected_tokens = self.query_one(
-                "#protected-tokens-input", Input
-            ).value.strip()
-            auto_save = self.query_one("#auto-save-switch", Switch).value
-            max_autosaves = self.query_one("#max-autosaves-input", Input).value.strip()
-
-            if compaction_strategy in ["summarization", "truncation"]:
-                set_config_value("compaction_strategy", compaction_strategy)
-
-            if compaction_threshold:
-                threshold_value = float(compaction_threshold)
-                if 0.8 <= threshold_value <= 0.95:
-                    set_config_value("compaction_threshold", compaction_threshold)
-                else:
-                    raise ValueError(
-                        "Compaction threshold must be between 0.8 and 0.95"
-                    )
+            # Write puppy.cfg once for all settings, and not at all on error
+            with config_transaction():
+                # Tab 1: General
+                puppy_name = self.query_one("#puppy-name-input", Input).value.strip()
+                owner_name = self.query_one("#owner-name-input", Input).value.strip()
+                yolo_mode = self.query_one("#yolo-mode-switch", Switch).value
+                allow_recursion = self.query_one(
+                    "#allow-recursion-switch", Switch
+                ).value
+
+                if puppy_name:
+                    set_config_value("puppy_name", puppy_name)
+                if owner_name:
+                    set_config_value("owner_name", owner_name)
+                set_config_value("yolo_mode", "true" if yolo_mode else "false")
+                set_config_value(
+                    "allow_recursion", "true" if allow_recursion else "false"
+                )
 
-            if protected_tokens.isdigit():
-                tokens_value = int(protected_tokens)
-                model_context_length = get_model_context_length()
-                max_protected_tokens = int(model_context_length * 0.75)
+                # Tab 2: Models & AI
+                selected_model = self.query_one("#model-select", Select).value
+                selected_vqa_model = self.query_one("#vqa-model-select", Select).value
+                reasoning_effort = self.query_one(
+                    "#reasoning-effort-select", Select
+                ).value
+
+                model_changed = False
+                if selected_model:
+                    set_model_name(selected_model)
+                    model_changed = True
+                if selected_vqa_model:
+                    set_vqa_model_name(selected_vqa_model)
+                set_openai_reasoning_effort(reasoning_effort)
 
-                if 1000 <= tokens_value <= max_protected_tokens:
-                    set_config_value("protected_token_count", protected_tokens)
-                else:
-                    raise ValueError(
-                        f"Protected tokens must be between 1000 and {max_protected_tokens}"
-                    )
-
-            set_auto_save_session(auto_save)
-
-            if max_autosaves.isdigit():
-                set_max_saved_sessions(int(max_autosaves))
-
-            # Tab 4: Appearance
-            suppress_thinking = self.query_one(
-                "#suppress-thinking-switch", Switch
-            ).value
-            suppress_informational = self.query_one(
-                "#suppress-informational-switch", Switch
-            ).value
-            diff_style = self.query_one("#diff-style-select", Select).value
-            diff_addition_color = self.query_one(
-                "#diff-addition-color-input", Input
-            ).value.strip()
-            diff_deletion_color = self.query_one(
-                "#diff-deletion-color-input", Input
-            ).value.strip()
-            diff_context_lines = self.query_one(
-                "#diff-context-lines-input", Input
-            ).value.strip()
-
-            set_suppress_thinking_messages(suppress_thinking)
-            set_suppress_informational_messages(suppress_informational)
-            if diff_style:
-                set_diff_highlight_style(diff_style)
-            if diff_addition_color:
-                set_diff_addition_color(diff_addition_color)
-            if diff_deletion_color:
-                set_diff_deletion_color(diff_deletion_color)
-            if diff_context_lines.isdigit():
-                lines_value = int(diff_context_lines)
-                if 0 <= lines_value <= 50:
-                    set_config_value("diff_context_lines", diff_context_lines)
-                else:
-                    raise ValueError("Diff context lines must be between 0 and 50")
+                # Tab 3: History & Context
+                compaction_strategy = self.query_one(
+                    "#compaction-strategy-select", Select
+                ).value
+                compaction_threshold = self.query_one(
+                    "#compaction-threshold-input", Input
+                ).value.strip()
+                protected_tokens = self.query_one(
+                    "#protected-tokens-input", Input
+                ).value.strip()
+                auto_save = self.query_one("#auto-save-switch", Switch).value
+                max_autosaves = self.query_one(
+                    "#max-autosaves-input", Input
+                ).value.strip()
+
+                if compaction_strategy in ["summarization", "truncation"]:
+                    set_config_value("compaction_strategy", compaction_strategy)
+
+                if compaction_threshold:
+                    threshold_value = float(compaction_threshold)
+                    if 0.8 <= threshold_value <= 0.95:
+                        set_config_value("compaction_threshold", compaction_threshold)
+                    else:
+                        raise ValueError(
+                            "Compaction threshold must be between 0.8 and 0.95"
+                        )
 
-            # Tab 5: Agents & Integrations
-            # Save agent model pinning
-            from code_puppy.agents import get_available_agents
-            from code_puppy.config import set_agent_pinned_model
+                if protected_tokens.isdigit():
+                    tokens_value = int(protected_tokens)
+                    model_context_length = get_model_context_length()
+                    max_protected_tokens = int(model_context_length * 0.75)
 
-            agents = get_available_agents()
-            for agent_name in agents.keys():
-                select_id = f"agent-pin-{agent_name}"
-                try:
-                    agent_select = self.query_one(f"#{select_id}", Select)
-                    pinned_model = agent_select.value
-                    # Save the pinned model (empty string means use default)
-                    set_agent_pinned_model(agent_name, pinned_model)
-                except Exception:
-                    # Skip if widget not found
-                    pass
+                    if 1000 <= tokens_value <= max_protected_tokens:
+                        set_config_value("protected_token_count", protected_tokens)
+                    else:
+                        raise ValueError(
+                            f"Protected tokens must be between 1000 and {max_protected_tokens}"
+                        )
 
-            disable_mcp = self.query_one("#disable-mcp-switch", Switch).value
-            enable_dbos = self.query_one("#enable-dbos-switch", Switch).value
+                set_auto_save_session(auto_save)
 
-            set_config_value("disable_mcp", "true" if disable_mcp else "false")
-            set_enable_dbos(enable_dbos)
+                if max_autosaves.isdigit():
+                    set_max_saved_sessions(int(max_autosaves))
 
-            # Tab 6: API Keys & Status
-            # Save API keys to environment and .env file
-            self.save_api_keys()
+                # Tab 4: Appearance
+                suppress_thinking = self.query_one(
+                    "#suppress-thinking-switch", Switch
+                ).value
+                suppress_informational = self.query_one(
+                    "#suppress-informational-switch", Switch
+                ).value
+                diff_style = self.query_one("#diff-style-select", Select).value
+                diff_addition_color = self.query_one(
+                    "#diff-addition-color-input", Input
+                ).value.strip()
+                diff_deletion_color = self.query_one(
+                    "#diff-deletion-color-input", Input
+                ).value.strip()
+                diff_context_lines = self.query_one(
+                    "#diff-context-lines-input", Input
+                ).value.strip()
+
+                set_suppress_thinking_messages(suppress_thinking)
+                set_suppress_informational_messages(suppress_informational)
+                if diff_style:
+                    set_diff_highlight_style(diff_style)
+                if diff_addition_color:
+                    set_diff_addition_color(diff_addition_color)
+                if diff_deletion_color:
+                    set_diff_deletion_color(diff_deletion_color)
+                if diff_context_lines.isdigit():
+                    lines_value = int(diff_context_lines)
+                    if 0 <= lines_value <= 50:
+                        set_config_value("diff_context_lines", diff_context_lines)
+                    else:
+                        raise ValueError("Diff context lines must be between 0 and 50")
+
+                # Tab 5: Agents & Integrations
+                # Save agent model pinning
+                from code_puppy.agents import get_available_agents
+                from code_puppy.config import set_agent_pinned_model
+
+                agents = get_available_agents()
+                for agent_name in agents.keys():
+                    select_id = f"agent-pin-{agent_name}"
+                    try:
+                        agent_select = self.query_one(f"#{select_id}", Select)
+                        pinned_model = agent_select.value
+                        # Save the pinned model (empty string means use default)
+                        set_agent_pinned_model(agent_name, pinned_model)
+                    except Exception:
+                        # Skip if widget not found
+                        pass
+
+                disable_mcp = self.query_one("#disable-mcp-switch", Switch).value
+                enable_dbos = self.query_one("#enable-dbos-switch", Switch).value
+
+                set_config_value("disable_mcp", "true" if disable_mcp else "false")
+                set_enable_dbos(enable_dbos)
+
+                # Tab 6: API Keys & Status
+                # Save API keys to environment and .env file
+                self.save_api_keys()
 
             # Reload agent if model changed
             if model_changed:
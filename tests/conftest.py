@@ -49,6 +49,18 @@ def clear_model_cache_between_tests():
     cp_config.clear_model_cache()
 
 
+@pytest.fixture(autouse=True)
+def clear_config_cache_between_tests():
+    """Drop cached puppy.cfg state, the history handle and pending autosaves."""
+    cp_config.clear_config_cache()
+    cp_config._close_history_fh()
+    cp_config._cancel_pending_autosave()
+    yield
+    cp_config.clear_config_cache()
+    cp_config._close_history_fh()
+    cp_config._cancel_pending_autosave()
+
+
 @pytest.fixture
 def mock_cleanup():
     """Provide a MagicMock that has been called once to satisfy tests expecting a cleanup call.
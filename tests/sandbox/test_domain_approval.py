@@ -0,0 +1,106 @@
+"""Tests for the domain approval handler."""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+from code_puppy.messaging.queue_console import QueueConsole
+from code_puppy.sandbox.domain_approval import (
+    DomainApprovalHandler,
+    create_cli_approval_callback,
+)
+
+
+class TestDomainApprovalHandler(unittest.IsolatedAsyncioTestCase):
+    """Test cases for DomainApprovalHandler."""
+
+    async def test_denies_without_callback(self):
+        """Test that requests are denied when no callback is configured."""
+        handler = DomainApprovalHandler()
+        self.assertFalse(await handler.request_approval("example.com"))
+
+    async def test_answer_is_remembered(self):
+        """Test that the callback runs once per domain."""
+        calls = []
+
+        async def callback(domain):
+            calls.append(domain)
+            return domain == "good.com"
+
+        handler = DomainApprovalHandler(callback)
+
+        self.assertTrue(await handler.request_approval("good.com"))
+        self.assertTrue(await handler.request_approval("good.com"))
+        self.assertFalse(await handler.request_approval("bad.com"))
+        self.assertFalse(await handler.request_approval("bad.com"))
+        self.assertEqual(calls, ["good.com", "bad.com"])
+
+    async def test_concurrent_requests_share_one_prompt(self):
+        """Test that concurrent requests for a domain wait on a single prompt."""
+        calls = []
+        release = asyncio.Event()
+
+        async def callback(domain):
+            calls.append(domain)
+            await release.wait()
+            return True
+
+        handler = DomainApprovalHandler(callback)
+        tasks = [
+            asyncio.create_task(handler.request_approval("example.com"))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*tasks), [True, True, True])
+        self.assertEqual(calls, ["example.com"])
+
+    async def test_failed_prompt_is_not_remembered(self):
+        """Test that callback errors deny the request without caching it."""
+        answers = [RuntimeError("prompt failed"), True]
+
+        async def callback(domain):
+            answer = answers.pop(0)
+            if isinstance(answer, Exception):
+                raise answer
+            return answer
+
+        handler = DomainApprovalHandler(callback)
+
+        self.assertFalse(await handler.request_approval("example.com"))
+        self.assertTrue(await handler.request_approval("example.com"))
+
+    async def test_cancelled_prompt_releases_waiters(self):
+        """Test that waiters are released if the prompting request is cancelled."""
+        started = asyncio.Event()
+
+        async def callback(domain):
+            started.set()
+            await asyncio.Event().wait()
+
+        handler = DomainApprovalHandler(callback)
+        first = asyncio.create_task(handler.request_approval("example.com"))
+        await started.wait()
+        second = asyncio.create_task(handler.request_approval("example.com"))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertFalse(await asyncio.wait_for(second, timeout=1))
+
+
+class TestCliApprovalCallback(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the CLI approval prompt."""
+
+    async def test_reads_answer_with_input(self):
+        """Test that the answer is read by input() off the event loop."""
+        callback = create_cli_approval_callback(MagicMock(spec=QueueConsole))
+
+        with patch("builtins.input", return_value=" Yes ") as mock_input:
+            self.assertTrue(await callback("example.com"))
+
+        self.assertIn("example.com", mock_input.call_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
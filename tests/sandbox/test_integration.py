@@ -1,13 +1,21 @@
 """Integration tests for complete sandboxing functionality."""
 
+import json
+import os
+import sys
 import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 
+from code_puppy.sandbox.base import SandboxOptions
 from code_puppy.sandbox.command_wrapper import SandboxCommandWrapper
 from code_puppy.sandbox.config import SandboxConfig
 from code_puppy.sandbox.filesystem_isolation import get_filesystem_isolator
 
+# Keep the throwaway config dirs in memory where a tmpfs is available
+_TMPFS_DIR = "/dev/shm" if sys.platform == "linux" and os.path.isdir("/dev/shm") else None
+
 
 class TestSandboxIntegration(unittest.TestCase):
     """Integration tests for sandboxing components."""
@@ -15,14 +23,15 @@ class TestSandboxIntegration(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         # Create a temporary config directory for testing
-        self.test_config_dir = tempfile.mkdtemp(prefix="code_puppy_test_")
+        self._temp_dir = tempfile.TemporaryDirectory(
+            prefix="code_puppy_test_", dir=_TMPFS_DIR, ignore_cleanup_errors=True
+        )
+        self.test_config_dir = self._temp_dir.name
         self.config = SandboxConfig(config_dir=Path(self.test_config_dir))
 
     def tearDown(self):
         """Clean up test fixtures."""
-        import shutil
-
-        shutil.rmtree(self.test_config_dir, ignore_errors=True)
+        self._temp_dir.cleanup()
 
     def test_sandbox_config_persistence(self):
         """Test that sandbox configuration persists correctly."""
@@ -55,6 +64,143 @@ class TestSandboxIntegration(unittest.TestCase):
         new_config = SandboxConfig(config_dir=Path(self.test_config_dir))
         self.assertTrue(any(test_path in path for path in new_config.allowed_write_paths))
 
+    def test_sandbox_config_loads_lazily(self):
+        """Test that the config file is only read on first access."""
+        self.config.enabled = True
+
+        with patch.object(SandboxConfig, "_load", autospec=True, side_effect=SandboxConfig._load) as mock_load:
+            config = SandboxConfig(config_dir=Path(self.test_config_dir))
+            mock_load.assert_not_called()
+            self.assertTrue(config.enabled)
+            self.assertTrue(config.filesystem_isolation)
+            mock_load.assert_called_once_with(config)
+
+    def test_sandbox_config_batch_writes_once(self):
+        """Test that changes inside batch() are logged in a single write."""
+        log_file = Path(self.test_config_dir) / "sandbox_config.log"
+        with patch.object(
+            self.config, "_flush_changes", wraps=self.config._flush_changes
+        ) as mock_flush:
+            with self.config.batch():
+                self.config.add_allowed_domain("a.com")
+                self.config.add_allowed_domain("b.com")
+                self.config.enabled = True
+                mock_flush.assert_not_called()
+            mock_flush.assert_called_once_with()
+
+        # One line per changed key, not per mutation
+        self.assertEqual(len(log_file.read_text().splitlines()), 2)
+        new_config = SandboxConfig(config_dir=Path(self.test_config_dir))
+        self.assertEqual(new_config.allowed_domains, {"a.com", "b.com"})
+        self.assertTrue(new_config.enabled)
+
+    def test_sandbox_config_fsyncs_only_enabled_changes(self):
+        """Test that only toggling sandboxing forces a disk flush."""
+        with patch("code_puppy.sandbox.config.os.fsync") as mock_fsync:
+            self.config.add_allowed_domain("a.com")
+            mock_fsync.assert_not_called()
+
+            self.config.enabled = True
+            mock_fsync.assert_called_once()
+
+            self.config.save()
+            mock_fsync.assert_called_once()
+            self.config.save(fsync=True)
+            self.assertEqual(mock_fsync.call_count, 2)
+
+    def test_sandbox_config_compact_folds_log_into_snapshot(self):
+        """Test that compact() rewrites the JSON snapshot and drops the log."""
+        config_dir = Path(self.test_config_dir)
+        self.config.add_excluded_command("make")
+        self.assertTrue((config_dir / "sandbox_config.log").exists())
+        self.assertFalse((config_dir / "sandbox_config.json").exists())
+
+        self.config.compact()
+
+        self.assertFalse((config_dir / "sandbox_config.log").exists())
+        self.assertFalse((config_dir / "sandbox_config.json.tmp").exists())
+        new_config = SandboxConfig(config_dir=config_dir)
+        self.assertIn("make", new_config.excluded_commands)
+
+    def test_sandbox_config_round_trips_without_orjson(self):
+        """Test that the stdlib JSON fallback reads and writes the same files."""
+        config_dir = Path(self.test_config_dir)
+        with patch("code_puppy.sandbox.config._orjson", None), patch(
+            "code_puppy.sandbox.config._loads", json.loads
+        ):
+            self.config.add_excluded_command("make")
+            self.config.compact()
+            self.config.read_scope = "restricted"
+            snapshot = json.loads((config_dir / "sandbox_config.json").read_text())
+            new_config = SandboxConfig(config_dir=config_dir)
+
+            self.assertIn("make", snapshot["excluded_commands"])
+            self.assertIn("make", new_config.excluded_commands)
+            self.assertEqual(new_config.read_scope, "restricted")
+
+    def test_sandbox_config_ignores_mistyped_values(self):
+        """Test that values of the wrong type fall back to the defaults."""
+        config_dir = Path(self.test_config_dir)
+        (config_dir / "sandbox_config.json").write_text(
+            json.dumps(
+                {
+                    "enabled": "false",
+                    "allowed_domains": "example.com",
+                    "max_memory_mb": 512,
+                    "http_proxy_port": None,
+                    "future_setting": {"x": 1},
+                }
+            )
+        )
+        (config_dir / "sandbox_config.log").write_text('{"k":"read_scope","v":7}\n')
+
+        config = SandboxConfig(config_dir=config_dir)
+
+        self.assertFalse(config.enabled)
+        self.assertEqual(config.allowed_domains, set())
+        self.assertEqual(config.max_memory_mb, 512)
+        self.assertEqual(config.http_proxy_port, 9050)
+        self.assertEqual(config.read_scope, "broad")
+        self.assertEqual(config._config["future_setting"], {"x": 1})
+
+    def test_sandbox_config_ignores_unknown_read_scope(self):
+        """Test that a read_scope outside broad/restricted falls back to broad."""
+        config_dir = Path(self.test_config_dir)
+        (config_dir / "sandbox_config.json").write_text(
+            json.dumps({"read_scope": "everything"})
+        )
+
+        config = SandboxConfig(config_dir=config_dir)
+
+        self.assertEqual(config.read_scope, "broad")
+
+    def test_get_sandbox_config_shared_instance(self):
+        """Test that the default config is one shared instance."""
+        from code_puppy.sandbox.config import get_sandbox_config
+
+        get_sandbox_config.cache_clear()
+        self.addCleanup(get_sandbox_config.cache_clear)
+        with patch("code_puppy.sandbox.config._HOME", Path(self.test_config_dir)):
+            config = get_sandbox_config()
+
+        self.assertIs(get_sandbox_config(), config)
+        self.assertIs(SandboxCommandWrapper().config, config)
+
+    def test_sandbox_config_reload_reads_external_edits(self):
+        """Test that reload() picks up changes written by another instance."""
+        self.assertFalse(self.config.enabled)
+        version = self.config.version
+
+        other = SandboxConfig(config_dir=Path(self.test_config_dir))
+        other.enabled = True
+        other.add_allowed_domain("example.com")
+        self.assertFalse(self.config.enabled)
+
+        self.config.reload()
+        self.assertTrue(self.config.enabled)
+        self.assertIn("example.com", self.config.allowed_domains)
+        self.assertNotEqual(self.config.version, version)
+
     def test_command_wrapper_disabled_by_default(self):
         """Test that sandboxing is disabled by default."""
         wrapper = SandboxCommandWrapper(config=self.config)
@@ -97,6 +243,98 @@ class TestSandboxIntegration(unittest.TestCase):
         platform = isolator.get_platform()
         self.assertIn(platform, ["linux", "macos", "noop"])
 
+    def test_unknown_platform_gets_shared_noop_isolator(self):
+        """Test that unsupported platforms share one pass-through isolator."""
+        isolator = get_filesystem_isolator(platform="plan9")
+
+        self.assertIs(isolator, get_filesystem_isolator(platform="plan9"))
+        self.assertEqual(isolator.get_platform(), "noop")
+        self.assertFalse(isolator.wraps_anything())
+
+    def test_noop_isolator_skips_wrapping(self):
+        """Test that a pass-through isolator is never asked to wrap."""
+        self.config.enabled = True
+        isolator = MagicMock()
+        isolator.is_available.return_value = True
+        isolator.get_platform.return_value = "noop"
+        isolator.wraps_anything.return_value = False
+
+        with patch(
+            "code_puppy.sandbox.command_wrapper.get_filesystem_isolator",
+            return_value=isolator,
+        ):
+            wrapper = SandboxCommandWrapper(config=self.config)
+            wrapped, env, excluded = wrapper.wrap_command("echo hi")
+
+        self.assertEqual(wrapped, "echo hi")
+        self.assertFalse(excluded)
+        isolator.wrap_command.assert_not_called()
+
+    def test_unavailable_isolator_warns_once(self):
+        """Test that a missing isolator is reported once, not per command."""
+        self.config.enabled = True
+        isolator = MagicMock()
+        isolator.is_available.return_value = False
+        isolator.get_platform.return_value = "linux"
+
+        with patch(
+            "code_puppy.sandbox.command_wrapper.get_filesystem_isolator",
+            return_value=isolator,
+        ):
+            wrapper = SandboxCommandWrapper(config=self.config)
+            with self.assertLogs(
+                "code_puppy.sandbox.command_wrapper", level="WARNING"
+            ) as logs:
+                wrapper.wrap_command("echo one")
+                wrapper.wrap_command("echo two")
+
+        self.assertEqual(len(logs.records), 1)
+        isolator.wrap_command.assert_not_called()
+
+    def test_wrap_command_as_argv(self):
+        """Test that as_argv returns the isolator's argv when it has one."""
+        self.config.enabled = True
+        isolator = MagicMock()
+        isolator.is_available.return_value = True
+        isolator.get_platform.return_value = "linux"
+        isolator.wraps_anything.return_value = True
+        isolator.wrap_command.return_value = ("bwrap -- /bin/sh -c ls", {})
+        isolator.wrap_command_argv.return_value = (["bwrap", "--", "/bin/sh", "-c", "ls"], {})
+
+        with patch(
+            "code_puppy.sandbox.command_wrapper.get_filesystem_isolator",
+            return_value=isolator,
+        ):
+            wrapper = SandboxCommandWrapper(config=self.config)
+            self.assertEqual(wrapper.wrap_command("ls")[0], "bwrap -- /bin/sh -c ls")
+            self.assertEqual(wrapper.wrap_command("ls", as_argv=True)[0], ["bwrap", "--", "/bin/sh", "-c", "ls"])
+
+            # Isolators without an argv form fall back to the shell string
+            isolator.wrap_command_argv.return_value = None
+            self.assertEqual(wrapper.wrap_command("ls", as_argv=True)[0], "bwrap -- /bin/sh -c ls")
+
+    def test_wrap_command_follows_working_directory(self):
+        """Test that the default cwd is read for every wrap, not cached."""
+        self.config.enabled = True
+        isolator = MagicMock()
+        isolator.is_available.return_value = True
+        isolator.get_platform.return_value = "linux"
+        isolator.wraps_anything.return_value = True
+        isolator.wrap_command.return_value = ("wrapped", {})
+
+        with patch(
+            "code_puppy.sandbox.command_wrapper.get_filesystem_isolator",
+            return_value=isolator,
+        ):
+            wrapper = SandboxCommandWrapper(config=self.config)
+            with patch("os.getcwd", return_value="/first"):
+                wrapper.wrap_command("ls")
+            with patch("os.getcwd", return_value="/second"):
+                wrapper.wrap_command("ls")
+
+        cwds = [call.args[1].cwd for call in isolator.wrap_command.call_args_list]
+        self.assertEqual(cwds, ["/first", "/second"])
+
     def test_command_wrapper_status(self):
         """Test getting wrapper status."""
         wrapper = SandboxCommandWrapper(config=self.config)
@@ -132,6 +370,23 @@ class TestSandboxIntegration(unittest.TestCase):
         # Should require approval for new domains
         self.assertTrue(config.require_approval_for_new_domains)
 
+    def test_sandbox_config_allowlist_membership_uses_set(self):
+        """Test that repeated adds are deduplicated and removals stay in sync."""
+        for _ in range(3):
+            self.config.add_allowed_domain("dup.com")
+            self.config.add_excluded_command("make")
+        self.assertEqual(self.config.excluded_commands.count("make"), 1)
+        self.assertEqual(self.config.allowed_domains, {"dup.com"})
+
+        # Callers may mutate the returned set without touching the config
+        self.config.allowed_domains.add("other.com")
+        self.assertNotIn("other.com", self.config.allowed_domains)
+
+        self.config.remove_excluded_command("make")
+        self.assertNotIn("make", self.config.excluded_commands)
+        self.config.add_excluded_command("make")
+        self.assertIn("make", self.config.excluded_commands)
+
     def test_sandbox_config_remove_domain(self):
         """Test removing domains from allowlist."""
         self.config.add_allowed_domain("temp.com")
@@ -154,6 +409,132 @@ class TestSandboxIntegration(unittest.TestCase):
         # depending on isolator availability
         self.assertIsInstance(env, dict)
 
+    def test_command_exclusion_tracks_config_changes(self):
+        """Test that cached exclusion results follow exclusion list edits."""
+        wrapper = SandboxCommandWrapper(config=self.config)
+
+        self.assertTrue(wrapper.is_command_excluded("docker ps"))
+        self.assertTrue(wrapper.is_command_excluded("  /usr/bin/docker run x"))
+        self.assertFalse(wrapper.is_command_excluded("mydocker ps"))
+        self.assertFalse(wrapper.is_command_excluded("   "))
+
+        self.config.add_excluded_command("make")
+        self.assertTrue(wrapper.is_command_excluded("make test"))
+
+        self.config.remove_excluded_command("docker")
+        self.assertFalse(wrapper.is_command_excluded("docker ps"))
+
+        self.config.add_excluded_command("tools/deploy.sh")
+        self.assertTrue(wrapper.is_command_excluded("tools/deploy.sh prod"))
+        self.assertTrue(wrapper.is_command_excluded("/repo/tools/deploy.sh"))
+        self.assertFalse(wrapper.is_command_excluded("deploy.sh"))
+
+    def test_isolator_probed_once(self):
+        """Test that isolator availability is probed only on first use."""
+        isolator = MagicMock()
+        isolator.is_available.return_value = True
+        isolator.get_platform.return_value = "linux"
+        isolator.wrap_command.return_value = ("wrapped", {})
+        self.config.enabled = True
+        wrapper = SandboxCommandWrapper(config=self.config)
+
+        with patch(
+            "code_puppy.sandbox.command_wrapper.get_filesystem_isolator",
+            return_value=isolator,
+        ):
+            self.assertTrue(wrapper.is_sandboxing_available())
+            wrapper.wrap_command("echo one")
+            wrapper.wrap_command("echo two")
+            status = wrapper.get_status()
+
+        self.assertTrue(status["isolator_available"])
+        self.assertEqual(status["isolator_platform"], "linux")
+        isolator.is_available.assert_called_once()
+        isolator.get_platform.assert_called_once()
+
+    def test_sandbox_options_default_denied_paths(self):
+        """Test that default denied paths are expanded and not shared."""
+        first = SandboxOptions()
+        second = SandboxOptions()
+
+        self.assertIn(os.path.expanduser("~/.ssh"), first.denied_read_paths)
+        self.assertIn("/etc/shadow", first.denied_read_paths)
+        first.denied_read_paths.append("/extra")
+        self.assertNotIn("/extra", second.denied_read_paths)
+        self.assertFalse(hasattr(first, "__dict__"))
+
+    def test_sandbox_options_default_denied_paths_follow_home(self):
+        """Test that a HOME change is reflected in the default denied paths."""
+        SandboxOptions()
+        with patch.dict(os.environ, {"HOME": "/home/other"}):
+            options = SandboxOptions()
+
+        self.assertIn("/home/other/.ssh", options.denied_read_paths)
+        self.assertIn(os.path.expanduser("~/.ssh"), SandboxOptions().denied_read_paths)
+
+    def test_default_lists_not_shared_between_configs(self):
+        """Test that list defaults are copied per config instance."""
+        other = SandboxConfig(config_dir=Path(self.test_config_dir) / "other")
+
+        self.config.add_excluded_command("make")
+        self.assertIn("make", self.config.excluded_commands)
+        self.assertNotIn("make", other.excluded_commands)
+        self.assertIsInstance(other.excluded_commands, list)
+
+    def test_denied_read_paths_expanded_follows_config(self):
+        """Test that expanded denied paths are cached until the config changes."""
+        self.config._config["denied_read_paths"] = ["~/.netrc"]
+        self.config._version += 1
+
+        expanded = self.config.denied_read_paths_expanded
+        self.assertEqual(expanded, (os.path.expanduser("~/.netrc"),))
+        self.assertIs(self.config.denied_read_paths_expanded, expanded)
+
+        self.config.add_denied_read_path(self.test_config_dir)
+        self.assertIn(str(Path(self.test_config_dir).resolve()), self.config.denied_read_paths_expanded)
+
+    def test_options_template_rebuilt_on_config_change(self):
+        """Test that cached sandbox options follow config edits."""
+        wrapper = SandboxCommandWrapper(config=self.config)
+
+        template = wrapper._get_options_template()
+        self.assertIs(wrapper._get_options_template(), template)
+
+        self.config.read_scope = "restricted"
+        rebuilt = wrapper._get_options_template()
+        self.assertIsNot(rebuilt, template)
+        self.assertEqual(rebuilt.read_scope, "restricted")
+
+    def test_wrap_command_passthrough_when_isolation_off(self):
+        """Test that commands skip option building with both isolations off."""
+        from code_puppy.sandbox import command_wrapper
+
+        self.config.enabled = True
+        self.config.filesystem_isolation = False
+        self.config.network_isolation = False
+        wrapper = SandboxCommandWrapper(config=self.config)
+
+        with patch("code_puppy.sandbox.command_wrapper.dataclasses.replace") as mock_replace:
+            wrapped, env, was_excluded = wrapper.wrap_command("echo hi")
+
+        self.assertEqual(wrapped, "echo hi")
+        self.assertIs(env, command_wrapper._EMPTY_ENV)
+        self.assertFalse(was_excluded)
+        mock_replace.assert_not_called()
+
+    def test_wrap_command_passthrough_still_reports_exclusions(self):
+        """Test that excluded commands are flagged with both isolations off."""
+        self.config.enabled = True
+        self.config.filesystem_isolation = False
+        self.config.network_isolation = False
+        self.config.add_excluded_command("make")
+        wrapper = SandboxCommandWrapper(config=self.config)
+
+        _, _, was_excluded = wrapper.wrap_command("make test")
+        self.assertTrue(was_excluded)
+        _, _, was_excluded = wrapper.wrap_command("echo hi")
+        self.assertFalse(was_excluded)
+
 
 if __name__ == "__main__":
     unittest.main()
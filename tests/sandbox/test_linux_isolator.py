@@ -1,10 +1,17 @@
 """Tests for Linux bubblewrap filesystem isolation."""
 
+import os
+import shlex
 import unittest
 from unittest.mock import patch
 
 from code_puppy.sandbox.base import SandboxOptions
-from code_puppy.sandbox.linux_isolator import BubblewrapIsolator
+from code_puppy.sandbox.linux_isolator import (
+    BubblewrapIsolator,
+    _resolve_paths,
+    _restricted_prefix,
+    _which,
+)
 
 
 class TestBubblewrapIsolator(unittest.TestCase):
@@ -12,6 +19,10 @@ class TestBubblewrapIsolator(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures."""
+        _which.cache_clear()
+        _resolve_paths.cache_clear()
+        _restricted_prefix.cache_clear()
+        self.addCleanup(_which.cache_clear)
         self.isolator = BubblewrapIsolator()
 
     def test_platform(self):
@@ -25,6 +36,14 @@ class TestBubblewrapIsolator(unittest.TestCase):
         self.assertTrue(self.isolator.is_available())
         mock_which.assert_called_once_with("bwrap")
 
+    @patch("shutil.which")
+    def test_is_available_probes_path_once(self, mock_which):
+        """Test that repeated availability checks reuse the PATH lookup."""
+        mock_which.return_value = "/usr/bin/bwrap"
+        self.assertTrue(self.isolator.is_available())
+        self.assertTrue(BubblewrapIsolator().is_available())
+        mock_which.assert_called_once_with("bwrap")
+
     @patch("shutil.which")
     def test_is_available_when_bwrap_not_installed(self, mock_which):
         """Test availability check when bwrap is not installed."""
@@ -100,6 +119,21 @@ class TestBubblewrapIsolator(unittest.TestCase):
         self.assertIn("PATH", wrapped_cmd)
         self.assertIn("HOME", wrapped_cmd)
 
+    def test_wrap_command_env_overrides_process_env(self):
+        """Test that options.env overrides the live process environment."""
+        options = SandboxOptions(cwd="/tmp/test", env={"TERM": "dumb", "SECRET": "x"})
+        with patch.dict(os.environ, {"LANG": "C.UTF-8", "TERM": "xterm"}, clear=True):
+            args = shlex.split(self.isolator.wrap_command("ls", options)[0])
+
+        self.assertIn(
+            ["--setenv", "LANG", "C.UTF-8"], [args[i : i + 3] for i in range(len(args))]
+        )
+        self.assertIn(
+            ["--setenv", "TERM", "dumb"], [args[i : i + 3] for i in range(len(args))]
+        )
+        self.assertNotIn("xterm", args)
+        self.assertNotIn("SECRET", args)
+
     def test_wrap_command_escapes_shell_arguments(self):
         """Test that shell arguments are properly escaped."""
         options = SandboxOptions(cwd="/tmp/test")
@@ -111,6 +145,31 @@ class TestBubblewrapIsolator(unittest.TestCase):
         # The original command should be preserved in the wrapped command
         self.assertIn("echo", wrapped_cmd)
 
+    def test_wrapped_command_round_trips_through_shell_parsing(self):
+        """Test that memoized option quoting still yields the exact argv."""
+        options = SandboxOptions(cwd="/tmp/it's a dir", denied_read_paths=[])
+        command = "echo \"$HOME\" && ls 'x y'"
+
+        for _ in range(2):
+            args = shlex.split(self.isolator.wrap_command(command, options)[0])
+            self.assertEqual(args[-4:], ["--", "/bin/sh", "-c", command])
+            self.assertIn(
+                ["--bind", "/tmp/it's a dir", "/tmp/it's a dir"],
+                [args[i : i + 3] for i in range(len(args))],
+            )
+
+    def test_wrap_command_argv_matches_shell_form(self):
+        """Test that the argv form is the shell string's tokens."""
+        options = SandboxOptions(cwd="/tmp/it's a dir", denied_read_paths=[])
+        command = 'echo "$HOME" | wc -c'
+
+        argv, env = self.isolator.wrap_command_argv(command, options)
+
+        self.assertEqual(
+            argv, shlex.split(self.isolator.wrap_command(command, options)[0])
+        )
+        self.assertEqual(argv[-4:], ["--", "/bin/sh", "-c", command])
+
     def test_filesystem_isolation_binds_working_directory(self):
         """Test that working directory is properly bound."""
         test_dir = "/tmp/sandbox_test"
@@ -123,6 +182,98 @@ class TestBubblewrapIsolator(unittest.TestCase):
         self.assertIn("--bind", wrapped_cmd)
         self.assertIn(test_dir, wrapped_cmd)
 
+    def test_allowed_paths_resolved_once_but_checked_each_time(self):
+        """Test that path resolution is cached while existence stays live."""
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = f"{tmp}/later"
+            options = SandboxOptions(cwd=tmp, allowed_write_paths=[target])
+
+            with patch("os.path.expanduser", wraps=os.path.expanduser) as mock_expand:
+                first, _ = self.isolator.wrap_command("true", options)
+                os.mkdir(target)
+                second, _ = self.isolator.wrap_command("true", options)
+
+            self.assertNotIn(target, first)
+            self.assertIn(target, second)
+            expanded = [c.args[0] for c in mock_expand.call_args_list]
+            self.assertEqual(expanded.count(target), 1)
+
+    def test_existing_paths_batches_siblings_without_caching(self):
+        """Test that existence is checked per call, including symlinks."""
+        import tempfile
+
+        from code_puppy.sandbox.linux_isolator import _existing_paths
+
+        with tempfile.TemporaryDirectory() as tmp:
+            present = os.path.join(tmp, "present")
+            missing = os.path.join(tmp, "missing")
+            dangling = os.path.join(tmp, "dangling")
+            os.mkdir(present)
+            os.symlink(missing, dangling)
+
+            self.assertEqual(_existing_paths([present, missing, dangling]), {present})
+
+            os.mkdir(missing)
+            self.assertEqual(
+                _existing_paths([present, missing, dangling]),
+                {present, missing, dangling},
+            )
+
+    def test_restricted_scope_probes_system_paths_once(self):
+        """Test that essential system paths are only checked on the first wrap."""
+        options = SandboxOptions(cwd="/tmp/test", read_scope="restricted")
+
+        with patch(
+            "code_puppy.sandbox.linux_isolator.os.path.exists", wraps=os.path.exists
+        ) as mock_exists:
+            first, _ = self.isolator.wrap_command("ls", options)
+            probes = mock_exists.call_count
+            second, _ = self.isolator.wrap_command("ls", options)
+
+        self.assertEqual(first, second)
+        self.assertGreaterEqual(probes, 5)
+        self.assertEqual(mock_exists.call_count, probes)
+        self.assertIn("--ro-bind /usr /usr", first)
+
+    def test_broad_scope_without_extra_paths_matches_general_path(self):
+        """Test that the default broad fast path yields the same mounts."""
+        plain = SandboxOptions(
+            cwd="/tmp/test", denied_read_paths=[], allowed_write_paths=[]
+        )
+        # A missing path forces the general code path without adding mounts
+        general = SandboxOptions(
+            cwd="/tmp/test", denied_read_paths=["/nonexistent/denied"]
+        )
+
+        with patch(
+            "code_puppy.sandbox.linux_isolator._resolve_paths", wraps=_resolve_paths
+        ) as mock_resolve:
+            fast_cmd, _ = self.isolator.wrap_command("ls", plain)
+            mock_resolve.assert_not_called()
+
+        self.assertEqual(fast_cmd, self.isolator.wrap_command("ls", general)[0])
+
+    def test_large_option_sets_stay_inline(self):
+        """Test that many bind mounts are passed inline, never through a file."""
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i in range(60):
+                path = os.path.join(tmp, f"d{i}")
+                os.mkdir(path)
+                paths.append(path)
+            options = SandboxOptions(cwd=tmp, allowed_write_paths=paths)
+
+            wrapped_cmd, _ = self.isolator.wrap_command("echo hi", options)
+            argv, _ = self.isolator.wrap_command_argv("echo hi", options)
+
+        self.assertEqual(shlex.split(wrapped_cmd), argv)
+        self.assertNotIn("--args", argv)
+        self.assertIn(paths[-1], argv)
+
 
 if __name__ == "__main__":
     unittest.main()
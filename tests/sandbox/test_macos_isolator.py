@@ -1,12 +1,11 @@
 """Tests for macOS sandbox-exec filesystem isolation."""
 
-import tempfile
+import shlex
 import unittest
-from pathlib import Path
 from unittest.mock import patch
 
 from code_puppy.sandbox.base import SandboxOptions
-from code_puppy.sandbox.macos_isolator import SandboxExecIsolator
+from code_puppy.sandbox.macos_isolator import SandboxExecIsolator, _which
 
 
 class TestSandboxExecIsolator(unittest.TestCase):
@@ -14,6 +13,8 @@ class TestSandboxExecIsolator(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures."""
+        _which.cache_clear()
+        self.addCleanup(_which.cache_clear)
         self.isolator = SandboxExecIsolator()
 
     def test_platform(self):
@@ -27,6 +28,14 @@ class TestSandboxExecIsolator(unittest.TestCase):
         self.assertTrue(self.isolator.is_available())
         mock_which.assert_called_once_with("sandbox-exec")
 
+    @patch("shutil.which")
+    def test_is_available_probes_path_once(self, mock_which):
+        """Test that repeated availability checks reuse the first lookup."""
+        mock_which.return_value = "/usr/bin/sandbox-exec"
+        self.assertTrue(self.isolator.is_available())
+        self.assertTrue(SandboxExecIsolator().is_available())
+        mock_which.assert_called_once_with("sandbox-exec")
+
     @patch("shutil.which")
     def test_is_available_when_sandbox_exec_not_installed(self, mock_which):
         """Test availability check when sandbox-exec is not installed."""
@@ -77,6 +86,58 @@ class TestSandboxExecIsolator(unittest.TestCase):
         self.assertIn("/.gnupg", profile)
         self.assertIn("(deny file*", profile)
 
+    def test_generate_sandbox_profile_is_memoized(self):
+        """Test that identical options reuse the built profile."""
+        first = self.isolator._generate_sandbox_profile(SandboxOptions(cwd="/tmp/test"))
+        again = self.isolator._generate_sandbox_profile(SandboxOptions(cwd="/tmp/test"))
+        other = self.isolator._generate_sandbox_profile(
+            SandboxOptions(cwd="/tmp/test", allowed_write_paths=["/opt/out"])
+        )
+
+        self.assertIs(first, again)
+        self.assertNotIn("/opt/out", first)
+        self.assertIn("/opt/out", other)
+
+    def test_generate_sandbox_profile_dedupes_paths(self):
+        """Test that repeated paths and the cwd are listed only once."""
+        options = SandboxOptions(
+            cwd="/tmp/test",
+            allowed_read_paths=["/opt/data", "/opt/./data", "/tmp/test"],
+            allowed_write_paths=["/tmp/test/", "/opt/out", "/opt/out"],
+            read_scope="restricted",
+        )
+
+        profile = self.isolator._generate_sandbox_profile(options)
+
+        self.assertEqual(profile.count('(subpath "/opt/data")'), 1)
+        self.assertEqual(profile.count('(subpath "/opt/out")'), 1)
+        # cwd gets exactly one read rule and one read-write rule
+        self.assertEqual(profile.count('(subpath "/tmp/test")'), 2)
+
+    def test_generate_sandbox_profile_merges_denied_paths(self):
+        """Test that denied paths share a single deny rule, without repeats."""
+        options = SandboxOptions(
+            cwd="/tmp/test",
+            denied_read_paths=["/opt/secret", "/etc/shadow", "/opt/secret"],
+        )
+
+        profile = self.isolator._generate_sandbox_profile(options)
+
+        self.assertEqual(profile.count("(deny file-read*"), 1)
+        self.assertEqual(profile.count('(subpath "/opt/secret")'), 1)
+        self.assertIn('(deny file-read*\n    (subpath "/opt/secret")\n    (subpath "/etc/shadow")\n)', profile)
+
+    def test_generate_sandbox_profile_static_fast_path(self):
+        """Test that options without extra paths match the full builder."""
+        from code_puppy.sandbox.macos_isolator import _build_profile
+
+        for scope in ("broad", "restricted"):
+            options = SandboxOptions(cwd="/tmp/@CWD@ dir", read_scope=scope, denied_read_paths=[])
+
+            profile = self.isolator._generate_sandbox_profile(options)
+
+            self.assertEqual(profile, _build_profile.__wrapped__("/tmp/@CWD@ dir", scope, (), (), ()))
+
     def test_wrap_command_basic(self):
         """Test basic command wrapping."""
         options = SandboxOptions(cwd="/tmp/test")
@@ -87,24 +148,35 @@ class TestSandboxExecIsolator(unittest.TestCase):
         # Check that command contains sandbox-exec
         self.assertIn("sandbox-exec", wrapped_cmd)
 
-        # Check that profile file reference is included
-        self.assertIn("-f", wrapped_cmd)
+        # Check that the profile is passed inline
+        self.assertIn("-p", wrapped_cmd)
 
         # Check that HOME parameter is set
         self.assertIn("-D", wrapped_cmd)
         self.assertIn("HOME=", wrapped_cmd)
 
-    def test_wrap_command_creates_profile_file(self):
-        """Test that a profile file is created."""
+    def test_wrap_command_passes_profile_inline(self):
+        """Test that the profile is passed as an argument, not a file."""
         options = SandboxOptions(cwd="/tmp/test")
 
         command = "ls"
-        wrapped_cmd, env = self.isolator.wrap_command(command, options)
+        with patch("builtins.open") as mock_open:
+            wrapped_cmd, env = self.isolator.wrap_command(command, options)
+        mock_open.assert_not_called()
+
+        args = shlex.split(wrapped_cmd)
+        self.assertEqual(args[:2], ["sandbox-exec", "-p"])
+        self.assertEqual(args[2], self.isolator._generate_sandbox_profile(options))
+        self.assertEqual(args[-3:], ["/bin/sh", "-c", "ls"])
+
+    def test_wrap_command_argv_matches_shell_form(self):
+        """Test that the argv form is the shell string's tokens."""
+        options = SandboxOptions(cwd="/tmp/test")
 
-        # Extract profile path from wrapped command
-        # The profile should be in a temp directory
-        profile_dir = Path(tempfile.gettempdir()) / "code_puppy_sandbox"
-        self.assertTrue(profile_dir.exists())
+        argv, env = self.isolator.wrap_command_argv("ls 'a b'", options)
+
+        self.assertEqual(argv, shlex.split(self.isolator.wrap_command("ls 'a b'", options)[0]))
+        self.assertEqual(argv[-3:], ["/bin/sh", "-c", "ls 'a b'"])
 
     def test_wrap_command_with_network_isolation(self):
         """Test command wrapping with network isolation."""
@@ -122,6 +194,21 @@ class TestSandboxExecIsolator(unittest.TestCase):
         self.assertIn("HTTPS_PROXY", env)
         self.assertEqual(env["HTTP_PROXY"], "socks5://localhost:9050")
 
+    def test_network_isolation_leaves_caller_env_untouched(self):
+        """Test that proxy variables are not written into options.env."""
+        caller_env = {"HOME": "/Users/testuser"}
+        options = SandboxOptions(
+            cwd="/tmp/test",
+            env=caller_env,
+            network_isolation=True,
+            proxy_socket_path="127.0.0.1:9050",
+        )
+
+        _, env = self.isolator.wrap_command("true", options)
+
+        self.assertEqual(env["https_proxy"], "socks5://localhost:9050")
+        self.assertEqual(caller_env, {"HOME": "/Users/testuser"})
+
     def test_wrap_command_preserves_home_env(self):
         """Test that HOME environment variable is preserved."""
         test_home = "/Users/testuser"
@@ -1,5 +1,6 @@
 """Tests for network proxy server."""
 
+import asyncio
 import unittest
 
 from code_puppy.sandbox.network_proxy import NetworkProxyServer
@@ -25,6 +26,16 @@ class TestNetworkProxyServer(unittest.TestCase):
         self.assertIn("pypi.org", self.proxy.allowed_domains)
         self.assertIn("npmjs.com", self.proxy.allowed_domains)
 
+    def test_default_domains_not_shared(self):
+        """Test that each proxy gets its own copy of the defaults."""
+        domains = {"example.com"}
+        other = NetworkProxyServer(allowed_domains=domains)
+        other.add_allowed_domain("extra.com")
+
+        self.assertNotIn("extra.com", self.proxy.allowed_domains)
+        self.assertEqual(domains, {"example.com"})
+        self.assertIn("pypi.org", other.allowed_domains)
+
     def test_add_allowed_domain(self):
         """Test adding a domain to the allowlist."""
         self.proxy.add_allowed_domain("example.com")
@@ -116,5 +127,161 @@ class TestNetworkProxyIntegration(unittest.IsolatedAsyncioTestCase):
         self.assertFalse(proxy.is_running())
 
 
+
+class TestDomainMatching(unittest.IsolatedAsyncioTestCase):
+    """Test cases for allowlist matching."""
+
+    async def test_wildcard_matches_domain_and_subdomains(self):
+        """Test that *.example.com covers the apex and any subdomain."""
+        proxy = NetworkProxyServer(allowed_domains={"*.example.com"})
+
+        self.assertTrue(await proxy._is_domain_allowed("example.com"))
+        self.assertTrue(await proxy._is_domain_allowed("a.b.Example.com"))
+        self.assertFalse(await proxy._is_domain_allowed("badexample.com"))
+        self.assertFalse(await proxy._is_domain_allowed("example.org"))
+
+    async def test_removed_wildcard_no_longer_matches(self):
+        """Test that removing a wildcard stops it matching."""
+        proxy = NetworkProxyServer()
+        proxy.add_allowed_domain("*.Internal.dev")
+        self.assertTrue(await proxy._is_domain_allowed("api.internal.dev"))
+
+        proxy.remove_allowed_domain("*.internal.dev")
+        self.assertFalse(await proxy._is_domain_allowed("api.internal.dev"))
+
+
+class TestRequestParsing(unittest.IsolatedAsyncioTestCase):
+    """Test cases for proxy request-line handling."""
+
+    async def _handle(self, proxy, request_line):
+        from unittest.mock import AsyncMock, MagicMock
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(request_line)
+        reader.feed_eof()
+        writer = MagicMock()
+        writer.drain = AsyncMock()
+        writer.wait_closed = AsyncMock()
+        proxy._handle_connect = AsyncMock()
+        proxy._forward_request = AsyncMock()
+        await proxy._handle_client(reader, writer)
+        return writer
+
+    async def test_connect_target_parsed_from_bytes(self):
+        """Test that CONNECT host:port reaches the tunnel handler."""
+        proxy = NetworkProxyServer()
+        await self._handle(proxy, b"CONNECT github.com:8443 HTTP/1.1\r\n")
+        self.assertEqual(proxy._handle_connect.call_args.args[2:], ("github.com", 8443))
+
+        await self._handle(proxy, b"CONNECT GitHub.com HTTP/1.1\r\n")
+        self.assertEqual(proxy._handle_connect.call_args.args[2:], ("GitHub.com", 443))
+
+    async def test_connect_bad_port_rejected(self):
+        """Test that a non-numeric CONNECT port gets a 400."""
+        proxy = NetworkProxyServer()
+        writer = await self._handle(proxy, b"CONNECT github.com:https HTTP/1.1\r\n")
+
+        proxy._handle_connect.assert_not_called()
+        self.assertIn(b"400", writer.write.call_args.args[0])
+
+    async def test_disallowed_domain_blocked(self):
+        """Test that both CONNECT and plain HTTP enforce the allowlist."""
+        proxy = NetworkProxyServer()
+        writer = await self._handle(proxy, b"CONNECT evil.test:443 HTTP/1.1\r\n")
+        self.assertIn(b"403", writer.write.call_args.args[0])
+
+        writer = await self._handle(proxy, b"GET http://evil.test/x HTTP/1.1\r\n")
+        self.assertIn(b"403", writer.write.call_args.args[0])
+        proxy._forward_request.assert_not_called()
+
+
+class TestRelayData(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the proxy's byte relay."""
+
+    async def test_relay_copies_stream_to_peer(self):
+        """Test that all bytes reach the peer, across several chunks."""
+        received = bytearray()
+        done = asyncio.Event()
+
+        async def sink(reader, writer):
+            received.extend(await reader.read())
+            writer.close()
+            done.set()
+
+        server = await asyncio.start_server(sink, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        payload = bytes(range(256)) * 1024  # 256 KiB
+
+        source = asyncio.StreamReader()
+        source.feed_data(payload)
+        source.feed_eof()
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+
+        await NetworkProxyServer()._relay_data(source, writer, "test")
+        writer.close()
+        await writer.wait_closed()
+        await asyncio.wait_for(done.wait(), timeout=5)
+        server.close()
+        await server.wait_closed()
+
+        self.assertEqual(bytes(received), payload)
+
+    async def test_proxy_listener_settings(self):
+        """Test the listener's buffer limit and accept backlog."""
+        from unittest.mock import AsyncMock, patch
+
+        from code_puppy.sandbox import network_proxy
+
+        with patch.object(network_proxy.asyncio, "start_server", new=AsyncMock()) as mock_start:
+            await NetworkProxyServer(port=0).start()
+
+        kwargs = mock_start.call_args.kwargs
+        self.assertEqual(kwargs["limit"], network_proxy._RELAY_CHUNK_SIZE)
+        self.assertEqual(kwargs["backlog"], network_proxy._ACCEPT_BACKLOG)
+        self.assertNotIn("reuse_port", kwargs)
+
+    async def test_upstream_address_reused(self):
+        """Test that a resolved upstream address is cached and dropped when stale."""
+        from unittest.mock import patch
+
+        from code_puppy.sandbox import network_proxy
+
+        async def accept(reader, writer):
+            writer.close()
+
+        server = await asyncio.start_server(accept, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        proxy = NetworkProxyServer()
+
+        _, writer = await proxy._open_upstream("localhost", port)
+        writer.close()
+        self.assertEqual(proxy._resolved[("localhost", port)][1], "127.0.0.1")
+
+        real_open = asyncio.open_connection
+        with patch.object(network_proxy.asyncio, "open_connection", side_effect=real_open) as mock_open:
+            _, writer = await proxy._open_upstream("localhost", port)
+            writer.close()
+        self.assertEqual(mock_open.call_args.args[0], "127.0.0.1")
+
+        # A dead cached address falls back to resolving the hostname
+        proxy._resolved[("localhost", port)] = (float("inf"), "127.0.0.2")
+        calls = []
+
+        async def flaky_open(host, *args, **kwargs):
+            calls.append(host)
+            if host == "127.0.0.2":
+                raise ConnectionRefusedError
+            return await real_open(host, *args, **kwargs)
+
+        with patch.object(network_proxy.asyncio, "open_connection", side_effect=flaky_open):
+            _, writer = await proxy._open_upstream("localhost", port)
+            writer.close()
+        self.assertEqual(calls, ["127.0.0.2", "localhost"])
+        self.assertEqual(proxy._resolved[("localhost", port)][1], "127.0.0.1")
+
+        server.close()
+        await server.wait_closed()
+
+
 if __name__ == "__main__":
     unittest.main()
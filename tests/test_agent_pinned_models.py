@@ -99,3 +99,25 @@ class TestAgentPinnedModels:
         # Clean up
         clear_agent_pinned_model(agent1_name)
         clear_agent_pinned_model(agent2_name)
+
+    def test_pinned_model_picks_up_external_edit(self):
+        """Test that editing puppy.cfg on disk refreshes the pinned model lookup."""
+        from code_puppy import config as cp_config
+
+        set_agent_pinned_model("agent-external", "gpt-4o")
+        assert get_agent_pinned_model("agent-external") == "gpt-4o"
+
+        with open(cp_config.CONFIG_FILE, "w") as f:
+            f.write("[puppy]\nagent_model_agent-external = gpt-5-edited\n")
+        assert get_agent_pinned_model("agent-external") == "gpt-5-edited"
+
+    def test_pinned_model_ignores_bad_interpolation_elsewhere(self):
+        """Test that a stray '%' in another key does not break pinned lookups."""
+        from code_puppy import config as cp_config
+
+        with open(cp_config.CONFIG_FILE, "w") as f:
+            f.write(
+                "[puppy]\nagent_model_agent-pct = gpt-4o\nsome_prompt = 100% done\n"
+            )
+        assert get_agent_pinned_model("agent-pct") == "gpt-4o"
+        assert get_agent_pinned_model("agent-missing") is None
@@ -1,4 +1,5 @@
 import os
+import threading
 from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
@@ -46,6 +47,8 @@ class TestAutoSaveSession:
         true_values = ["true", "1", "YES", "on"]
         for val in true_values:
             mock_get_value.reset_mock()
+            # Simulate puppy.cfg changing between reads
+            cp_config.clear_config_cache()
             mock_get_value.return_value = val
             assert cp_config.get_auto_save_session() is True, (
                 f"Failed for config value: {val}"
@@ -57,6 +60,8 @@ class TestAutoSaveSession:
         false_values = ["false", "0", "NO", "off", "invalid"]
         for val in false_values:
             mock_get_value.reset_mock()
+            # Simulate puppy.cfg changing between reads
+            cp_config.clear_config_cache()
             mock_get_value.return_value = val
             assert cp_config.get_auto_save_session() is False, (
                 f"Failed for config value: {val}"
@@ -104,6 +109,8 @@ class TestMaxSavedSessions:
         invalid_values = ["invalid", "not_a_number", "", None]
         for val in invalid_values:
             mock_get_value.reset_mock()
+            # Simulate puppy.cfg changing between reads
+            cp_config.clear_config_cache()
             mock_get_value.return_value = val
             assert cp_config.get_max_saved_sessions() == 20  # Default value
             mock_get_value.assert_called_once_with("max_saved_sessions")
@@ -133,18 +140,21 @@ class TestAutoSaveSessionFunctionality:
         assert result is False
         mock_get_auto_save.assert_called_once()
 
+    @patch("code_puppy.config._CURRENT_AUTOSAVE_ID", None)
+    @patch("code_puppy.config._autosave_timestamp", return_value="20240101_010101")
     @patch("code_puppy.config.save_session")
     @patch("code_puppy.config.datetime")
     @patch("code_puppy.config.get_auto_save_session")
     @patch("code_puppy.agents.agent_manager.get_current_agent")
-    @patch("rich.console.Console")
+    @patch("code_puppy.config._get_autosave_console")
     def test_auto_save_session_if_enabled_success(
         self,
-        mock_console_class,
+        mock_get_console,
         mock_get_agent,
         mock_get_auto_save,
         mock_datetime,
         mock_save_session,
+        mock_timestamp,
         mock_cleanup,
         mock_config_paths,
     ):
@@ -157,7 +167,6 @@ class TestAutoSaveSessionFunctionality:
         mock_get_agent.return_value = mock_agent
 
         fake_now = MagicMock()
-        fake_now.strftime.return_value = "20240101_010101"
         fake_now.isoformat.return_value = "2024-01-01T01:01:01"
         mock_datetime.datetime.now.return_value = fake_now
 
@@ -174,7 +183,7 @@ class TestAutoSaveSessionFunctionality:
         mock_save_session.return_value = metadata
 
         mock_console = MagicMock()
-        mock_console_class.return_value = mock_console
+        mock_get_console.return_value = mock_console
 
         result = cp_config.auto_save_session_if_enabled()
 
@@ -188,9 +197,9 @@ class TestAutoSaveSessionFunctionality:
 
     @patch("code_puppy.config.get_auto_save_session")
     @patch("code_puppy.agents.agent_manager.get_current_agent")
-    @patch("rich.console.Console")
+    @patch("code_puppy.config._get_autosave_console")
     def test_auto_save_session_if_enabled_exception(
-        self, mock_console_class, mock_get_agent, mock_get_auto_save, mock_config_paths
+        self, mock_get_console, mock_get_agent, mock_get_auto_save, mock_config_paths
     ):
         mock_get_auto_save.return_value = True
         mock_agent = MagicMock()
@@ -198,12 +207,93 @@ class TestAutoSaveSessionFunctionality:
         mock_get_agent.return_value = mock_agent
 
         mock_console_instance = MagicMock()
-        mock_console_class.return_value = mock_console_instance
+        mock_get_console.return_value = mock_console_instance
 
         result = cp_config.auto_save_session_if_enabled()
         assert result is False
         mock_console_instance.print.assert_called_once()
 
+    @patch("rich.console.Console")
+    def test_autosave_console_is_reused(self, mock_console_class):
+        with patch("code_puppy.config._autosave_console", None):
+            first = cp_config._get_autosave_console()
+            assert cp_config._get_autosave_console() is first
+        mock_console_class.assert_called_once_with()
+
+
+class TestAutoSaveId:
+    @patch("code_puppy.config.time.strftime", return_value="20240101_010101")
+    def test_rotate_autosave_id_uses_timestamp(self, mock_strftime):
+        with patch("code_puppy.config._CURRENT_AUTOSAVE_ID", None):
+            assert cp_config.rotate_autosave_id() == "20240101_010101"
+            assert cp_config.get_current_autosave_id() == "20240101_010101"
+        mock_strftime.assert_called_once_with("%Y%m%d_%H%M%S")
+
+    def test_concurrent_first_calls_share_one_id(self):
+        ids = iter(["20240101_010101", "20240101_010102"])
+        results = []
+
+        def grab():
+            results.append(cp_config.get_current_autosave_id())
+
+        with (
+            patch("code_puppy.config._CURRENT_AUTOSAVE_ID", None),
+            patch(
+                "code_puppy.config._autosave_timestamp",
+                side_effect=lambda: next(ids),
+            ),
+        ):
+            threads = [threading.Thread(target=grab) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert results == ["20240101_010101"] * 8
+
+
+class TestAutoSaveDebounce:
+    @patch("code_puppy.config._flush_autosave", return_value=True)
+    @patch("code_puppy.config.get_auto_save_session", return_value=True)
+    def test_burst_is_coalesced_into_one_trailing_save(
+        self, mock_get_auto_save, mock_flush
+    ):
+        with patch("code_puppy.config.threading.Timer") as mock_timer_class:
+            assert cp_config.auto_save_session_if_enabled() is True
+            cp_config._last_autosave_time = cp_config.time.monotonic()
+            assert cp_config.auto_save_session_if_enabled() is True
+            assert cp_config.auto_save_session_if_enabled() is True
+
+        mock_flush.assert_called_once_with()
+        mock_timer_class.assert_called_once()
+        mock_timer_class.return_value.start.assert_called_once_with()
+
+    @patch("code_puppy.config._flush_autosave", return_value=True)
+    def test_cancelled_timer_does_not_save(self, mock_flush):
+        generation = cp_config._autosave_generation
+        cp_config._cancel_pending_autosave()
+        cp_config._run_pending_autosave(generation)
+        mock_flush.assert_not_called()
+
+        cp_config._run_pending_autosave(cp_config._autosave_generation)
+        mock_flush.assert_called_once_with()
+
+    @patch("code_puppy.config.rotate_autosave_id", return_value="fresh_id")
+    @patch("code_puppy.config._flush_autosave", return_value=True)
+    @patch("code_puppy.config.get_auto_save_session", return_value=True)
+    def test_finalize_flushes_pending_save_immediately(
+        self, mock_get_auto_save, mock_flush, mock_rotate
+    ):
+        pending = MagicMock()
+        cp_config._pending_autosave = pending
+        cp_config._last_autosave_time = cp_config.time.monotonic()
+
+        assert cp_config.finalize_autosave_session() == "fresh_id"
+
+        pending.cancel.assert_called_once_with()
+        mock_flush.assert_called_once_with()
+        mock_rotate.assert_called_once_with()
+
 
 class TestFinalizeAutoSaveSession:
     @patch("code_puppy.config.rotate_autosave_id", return_value="fresh_id")
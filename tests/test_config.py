@@ -29,9 +29,17 @@ def mock_config_paths(monkeypatch):
     return mock_config_dir, mock_config_file
 
 
+@pytest.fixture
+def mock_replace(monkeypatch):
+    # puppy.cfg is written to a temp file and moved into place with os.replace
+    replace = MagicMock()
+    monkeypatch.setattr(os, "replace", replace)
+    return replace
+
+
 class TestEnsureConfigExists:
     def test_no_config_dir_or_file_prompts_and_creates(
-        self, mock_config_paths, monkeypatch
+        self, mock_config_paths, mock_replace, monkeypatch
     ):
         mock_cfg_dir, mock_cfg_file = mock_config_paths
 
@@ -61,7 +69,8 @@ class TestEnsureConfigExists:
             config_parser = cp_config.ensure_config_exists()
 
         mock_makedirs.assert_called_once_with(mock_cfg_dir, exist_ok=True)
-        m_open.assert_called_once_with(mock_cfg_file, "w")
+        m_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
 
         # Check what was written to file
         # The configparser object's write method is called with a file-like object
@@ -72,7 +81,7 @@ class TestEnsureConfigExists:
         assert config_parser.get(DEFAULT_SECTION_NAME, "owner_name") == "TestOwner"
 
     def test_config_dir_exists_file_does_not_prompts_and_creates(
-        self, mock_config_paths, monkeypatch
+        self, mock_config_paths, mock_replace, monkeypatch
     ):
         mock_cfg_dir, mock_cfg_file = mock_config_paths
 
@@ -97,7 +106,8 @@ class TestEnsureConfigExists:
             config_parser = cp_config.ensure_config_exists()
 
         mock_makedirs.assert_not_called()  # Dir already exists
-        m_open.assert_called_once_with(mock_cfg_file, "w")
+        m_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
 
         assert config_parser.sections() == [DEFAULT_SECTION_NAME]
         assert config_parser.get(DEFAULT_SECTION_NAME, "puppy_name") == "DirExistsPuppy"
@@ -149,7 +159,7 @@ class TestEnsureConfigExists:
         )
 
     def test_config_file_exists_missing_one_key_prompts_and_writes(
-        self, mock_config_paths, monkeypatch
+        self, mock_config_paths, mock_replace, monkeypatch
     ):
         mock_cfg_dir, mock_cfg_file = mock_config_paths
 
@@ -180,7 +190,8 @@ class TestEnsureConfigExists:
             returned_config_parser = cp_config.ensure_config_exists()
 
         mock_input.assert_called_once()  # Only called for the missing key
-        m_open.assert_called_once_with(mock_cfg_file, "w")
+        m_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
         mock_config_instance.read.assert_called_once_with(mock_cfg_file)
 
         assert (
@@ -194,44 +205,146 @@ class TestEnsureConfigExists:
 
 
 class TestGetValue:
-    @patch("configparser.ConfigParser")
-    def test_get_value_exists(self, mock_config_parser_class, mock_config_paths):
-        _, mock_cfg_file = mock_config_paths
-        mock_parser_instance = MagicMock()
-        mock_parser_instance.get.return_value = "test_value"
-        mock_config_parser_class.return_value = mock_parser_instance
+    def test_get_value_exists(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\ntest_key = test_value\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        assert cp_config.get_value("test_key") == "test_value"
+        # Option names are case-insensitive, as with ConfigParser.get
+        assert cp_config.get_value("TEST_KEY") == "test_value"
+
+    def test_get_value_not_exists(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\ntest_key = test_value\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        assert cp_config.get_value("missing_key") is None
+
+    def test_get_value_config_file_not_exists_graceful(self, mock_config_paths):
+        assert cp_config.get_value("any_key") is None
+
+    def test_get_value_reads_snapshot_not_parser(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\ntest_key = test_value\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        parser = cp_config._get_parser()
+        cp_config.get_value("test_key")
+        with patch.object(parser, "get", wraps=parser.get) as mock_get:
+            assert cp_config.get_value("test_key") == "test_value"
+            mock_get.assert_not_called()
+
+    def test_get_value_interpolation_error_still_raises(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\nbroken = 50%\nok = fine\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        assert cp_config.get_value("ok") == "fine"
+        with pytest.raises(configparser.InterpolationSyntaxError):
+            cp_config.get_value("broken")
+
+
+class TestConfigParserCache:
+    def test_get_value_reuses_parser_until_file_changes(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\npuppy_name = First\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        with patch(
+            "configparser.ConfigParser", wraps=configparser.ConfigParser
+        ) as mock_cp:
+            assert cp_config.get_value("puppy_name") == "First"
+            assert cp_config.get_value("puppy_name") == "First"
+            assert mock_cp.call_count == 1
+
+            cfg_file.write_text("[puppy]\npuppy_name = SecondName\n")
+            assert cp_config.get_value("puppy_name") == "SecondName"
+            assert mock_cp.call_count == 2
+
+    def test_set_config_value_updates_cache_without_reread(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\npuppy_name = Pup\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        assert cp_config.get_value("puppy_name") == "Pup"
+        with patch(
+            "configparser.ConfigParser", wraps=configparser.ConfigParser
+        ) as mock_cp:
+            cp_config.set_config_value("owner_name", "Owner")
+            assert cp_config.get_value("owner_name") == "Owner"
+            mock_cp.assert_not_called()
+
+        assert "owner_name = Owner" in cfg_file.read_text()
+
+    def test_cached_getter_invalidated_by_setter(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\nyolo_mode = true\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
 
-        val = cp_config.get_value("test_key")
+        assert cp_config.get_yolo_mode() is True
+        with patch("code_puppy.config.get_value") as mock_get_value:
+            assert cp_config.get_yolo_mode() is True
+            mock_get_value.assert_not_called()
 
-        mock_config_parser_class.assert_called_once()
-        mock_parser_instance.read.assert_called_once_with(mock_cfg_file)
-        mock_parser_instance.get.assert_called_once_with(
-            DEFAULT_SECTION_NAME, "test_key", fallback=None
-        )
-        assert val == "test_value"
+        cp_config.set_config_value("yolo_mode", "false")
+        assert cp_config.get_yolo_mode() is False
 
-    @patch("configparser.ConfigParser")
-    def test_get_value_not_exists(self, mock_config_parser_class, mock_config_paths):
-        _, mock_cfg_file = mock_config_paths
-        mock_parser_instance = MagicMock()
-        mock_parser_instance.get.return_value = None  # Simulate key not found
-        mock_config_parser_class.return_value = mock_parser_instance
+    def test_cached_getter_throttles_stat(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\nyolo_mode = true\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
 
-        val = cp_config.get_value("missing_key")
+        assert cp_config.get_yolo_mode() is True
+        with patch("code_puppy.config.os.stat", wraps=os.stat) as mock_stat:
+            assert cp_config.get_yolo_mode() is True
+            mock_stat.assert_not_called()
 
-        assert val is None
+        # An external edit is picked up once the recheck interval has passed
+        cfg_file.write_text("[puppy]\nyolo_mode = false\n")
+        monkeypatch.setattr(cp_config, "_CONFIG_RECHECK_INTERVAL", 0.0)
+        assert cp_config.get_yolo_mode() is False
 
-    @patch("configparser.ConfigParser")
-    def test_get_value_config_file_not_exists_graceful(
-        self, mock_config_parser_class, mock_config_paths
-    ):
-        _, mock_cfg_file = mock_config_paths
-        mock_parser_instance = MagicMock()
-        mock_parser_instance.get.return_value = None
-        mock_config_parser_class.return_value = mock_parser_instance
 
-        val = cp_config.get_value("any_key")
-        assert val is None
+class TestConfigTransaction:
+    def test_transaction_writes_once(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\npuppy_name = Pup\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        with patch("code_puppy.config.os.replace", wraps=os.replace) as mock_replace:
+            with cp_config.config_transaction():
+                cp_config.set_config_value("owner_name", "Owner")
+                cp_config.set_config_value("yolo_mode", "false")
+                assert cp_config.get_yolo_mode() is False
+            mock_replace.assert_called_once()
+
+        content = cfg_file.read_text()
+        assert "owner_name = Owner" in content
+        assert "yolo_mode = false" in content
+
+    def test_unchanged_value_skips_write(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\npuppy_name = Pup\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        with patch("code_puppy.config.os.replace", wraps=os.replace) as mock_replace:
+            cp_config.set_config_value("owner_name", "Owner")
+            cp_config.set_config_value("owner_name", "Owner")
+            mock_replace.assert_called_once()
+
+    def test_exception_discards_pending_changes(self, tmp_path, monkeypatch):
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text("[puppy]\npuppy_name = Pup\n")
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+
+        with pytest.raises(ValueError):
+            with cp_config.config_transaction():
+                cp_config.set_config_value("puppy_name", "Changed")
+                raise ValueError("boom")
+
+        assert "Changed" not in cfg_file.read_text()
+        assert cp_config.get_value("puppy_name") == "Pup"
 
 
 class TestSimpleGetters:
@@ -331,7 +444,7 @@ class TestSetConfigValue:
     @patch("configparser.ConfigParser")
     @patch("builtins.open", new_callable=mock_open)
     def test_set_config_value_new_key_section_exists(
-        self, mock_file_open, mock_config_parser_class, mock_config_paths
+        self, mock_file_open, mock_config_parser_class, mock_config_paths, mock_replace
     ):
         _, mock_cfg_file = mock_config_paths
         mock_parser_instance = MagicMock()
@@ -345,13 +458,14 @@ class TestSetConfigValue:
         cp_config.set_config_value("a_new_key", "a_new_value")
 
         assert section_dict["a_new_key"] == "a_new_value"
-        mock_file_open.assert_called_once_with(mock_cfg_file, "w")
-        mock_parser_instance.write.assert_called_once_with(mock_file_open())
+        mock_file_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
+        mock_parser_instance.write.assert_called_once()
 
     @patch("configparser.ConfigParser")
     @patch("builtins.open", new_callable=mock_open)
     def test_set_config_value_update_existing_key(
-        self, mock_file_open, mock_config_parser_class, mock_config_paths
+        self, mock_file_open, mock_config_parser_class, mock_config_paths, mock_replace
     ):
         _, mock_cfg_file = mock_config_paths
         mock_parser_instance = MagicMock()
@@ -365,13 +479,14 @@ class TestSetConfigValue:
         cp_config.set_config_value("existing_key", "updated_value")
 
         assert section_dict["existing_key"] == "updated_value"
-        mock_file_open.assert_called_once_with(mock_cfg_file, "w")
-        mock_parser_instance.write.assert_called_once_with(mock_file_open())
+        mock_file_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
+        mock_parser_instance.write.assert_called_once()
 
     @patch("configparser.ConfigParser")
     @patch("builtins.open", new_callable=mock_open)
     def test_set_config_value_section_does_not_exist_creates_it(
-        self, mock_file_open, mock_config_parser_class, mock_config_paths
+        self, mock_file_open, mock_config_parser_class, mock_config_paths, mock_replace
     ):
         _, mock_cfg_file = mock_config_paths
         mock_parser_instance = MagicMock()
@@ -402,8 +517,9 @@ class TestSetConfigValue:
             == "value_in_new_section"
         )
 
-        mock_file_open.assert_called_once_with(mock_cfg_file, "w")
-        mock_parser_instance.write.assert_called_once_with(mock_file_open())
+        mock_file_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
+        mock_parser_instance.write.assert_called_once()
 
 
 class TestModelName:
@@ -419,7 +535,7 @@ class TestModelName:
     @patch("configparser.ConfigParser")
     @patch("builtins.open", new_callable=mock_open)
     def test_set_model_name(
-        self, mock_file_open, mock_config_parser_class, mock_config_paths
+        self, mock_file_open, mock_config_parser_class, mock_config_paths, mock_replace
     ):
         _, mock_cfg_file = mock_config_paths
         mock_parser_instance = MagicMock()
@@ -433,8 +549,8 @@ class TestModelName:
         def get_section_or_create(name):
             if name == DEFAULT_SECTION_NAME:
                 # Ensure subsequent checks for section existence pass
-                mock_parser_instance.__contains__ = (
-                    lambda s_name: s_name == DEFAULT_SECTION_NAME
+                mock_parser_instance.__contains__ = lambda s_name: (
+                    s_name == DEFAULT_SECTION_NAME
                 )
                 return section_dict
             raise KeyError(name)
@@ -469,8 +585,9 @@ class TestModelName:
         cp_config.set_model_name("super_model_7000")
 
         assert section_dict["model"] == "super_model_7000"
-        mock_file_open.assert_called_once_with(mock_cfg_file, "w")
-        mock_parser_instance.write.assert_called_once_with(mock_file_open())
+        mock_file_open.assert_called_once_with(mock_cfg_file + ".tmp", "w")
+        mock_replace.assert_called_once_with(mock_cfg_file + ".tmp", mock_cfg_file)
+        mock_parser_instance.write.assert_called_once()
 
 
 class TestGetYoloMode:
@@ -479,6 +596,8 @@ class TestGetYoloMode:
         true_values = ["true", "1", "YES", "ON"]
         for val in true_values:
             mock_get_value.reset_mock()
+            # Simulate puppy.cfg changing between reads
+            cp_config.clear_config_cache()
             mock_get_value.return_value = val
             assert cp_config.get_yolo_mode() is True, f"Failed for config value: {val}"
             mock_get_value.assert_called_once_with("yolo_mode")
@@ -491,6 +610,117 @@ class TestGetYoloMode:
         mock_get_value.assert_called_once_with("yolo_mode")
 
 
+class TestGetDiffContextLines:
+    @pytest.mark.parametrize(
+        "raw,expected",
+        [(None, 6), ("", 6), ("3", 3), ("-4", 0), ("99", 50), ("lots", 6)],
+    )
+    @patch("code_puppy.config.get_value")
+    def test_parses_and_clamps(self, mock_get_value, raw, expected):
+        mock_get_value.return_value = raw
+        assert cp_config.get_diff_context_lines() == expected
+        mock_get_value.assert_called_once_with("diff_context_lines")
+
+
+class TestNormalize:
+    def test_normalize_strips_and_lowers_once(self):
+        cp_config._normalize.cache_clear()
+        assert cp_config._normalize("  On ") == "on"
+        assert cp_config._normalize("  On ") == "on"
+        info = cp_config._normalize.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+
+class TestProtectedTokenCount:
+    @patch("code_puppy.config.get_model_context_length", return_value=100000)
+    @patch("code_puppy.config.get_global_model_name", return_value="some-model")
+    @patch("code_puppy.config.get_value", return_value="90000")
+    def test_context_limit_cached_per_model(
+        self, mock_get_value, mock_model_name, mock_context_length
+    ):
+        assert cp_config.get_protected_token_count() == 75000
+        assert cp_config.get_protected_token_count() == 75000
+        mock_context_length.assert_called_once()
+
+        cp_config.clear_model_cache()
+        cp_config.get_protected_token_count()
+        assert mock_context_length.call_count == 2
+
+
+class TestLoadMcpServerConfigs:
+    def test_missing_file_returns_empty(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            cp_config, "MCP_SERVERS_FILE", str(tmp_path / "mcp_servers.json")
+        )
+        assert cp_config.load_mcp_server_configs() == {}
+
+    def test_reparses_only_after_edit(self, tmp_path, monkeypatch):
+        mcp_file = tmp_path / "mcp_servers.json"
+        mcp_file.write_text('{"mcp_servers": {"one": {"url": "http://a"}}}')
+        monkeypatch.setattr(cp_config, "MCP_SERVERS_FILE", str(mcp_file))
+
+        with patch(
+            "code_puppy.config._load_json_file", wraps=cp_config._load_json_file
+        ) as mock_load:
+            first = cp_config.load_mcp_server_configs()
+            assert cp_config.load_mcp_server_configs() is first
+            assert mock_load.call_count == 1
+
+            mcp_file.write_text('{"mcp_servers": {"two": {"url": "http://bb"}}}')
+            assert cp_config.load_mcp_server_configs() == {"two": {"url": "http://bb"}}
+            assert mock_load.call_count == 2
+
+
+class TestEnsureDir:
+    def test_ensure_dir_creates_missing_directory(self, tmp_path):
+        target = str(tmp_path / "agents")
+
+        cp_config._ensure_dir(target)
+
+        assert os.path.isdir(target)
+
+    def test_ensure_dir_checks_filesystem_once(self, tmp_path):
+        target = str(tmp_path)
+
+        with patch("os.path.exists", wraps=os.path.exists) as mock_exists:
+            cp_config._ensure_dir(target)
+            cp_config._ensure_dir(target)
+            mock_exists.assert_called_once_with(target)
+
+
+class TestLoadApiKeysToEnvironment:
+    @pytest.fixture
+    def api_env(self, tmp_path, monkeypatch):
+        for name in cp_config._API_KEY_NAMES:
+            # setenv first so keys set by the code under test are undone too
+            monkeypatch.setenv(name, "")
+            monkeypatch.delenv(name)
+        cfg_file = tmp_path / "puppy.cfg"
+        cfg_file.write_text(
+            "[puppy]\nopenai_api_key = cfg-openai\ngemini_api_key = cfg-gemini\n"
+        )
+        monkeypatch.setattr(cp_config, "CONFIG_FILE", str(cfg_file))
+        monkeypatch.chdir(tmp_path)
+        return tmp_path
+
+    def test_env_file_wins_over_cfg(self, api_env):
+        (api_env / ".env").write_text("OPENAI_API_KEY=env-openai\n")
+
+        cp_config.load_api_keys_to_environment()
+
+        assert os.environ["OPENAI_API_KEY"] == "env-openai"
+        assert os.environ["GEMINI_API_KEY"] == "cfg-gemini"
+        assert "ANTHROPIC_API_KEY" not in os.environ
+
+    def test_unchanged_env_file_is_not_reloaded(self, api_env):
+        (api_env / ".env").write_text("OPENAI_API_KEY=env-openai\n")
+
+        with patch("dotenv.load_dotenv") as mock_load:
+            cp_config.load_api_keys_to_environment()
+            cp_config.load_api_keys_to_environment()
+            mock_load.assert_called_once()
+
+
 class TestCommandHistory:
     @patch("os.path.isfile")
     @patch("pathlib.Path.touch")
@@ -574,12 +804,28 @@ class TestCommandHistory:
         cp_config.save_command_to_history("test command")
 
         # Assert
-        mock_file.assert_called_once_with(cp_config.COMMAND_HISTORY_FILE, "a")
+        mock_file.assert_called_once_with(
+            cp_config.COMMAND_HISTORY_FILE, "a", buffering=1, encoding="utf-8"
+        )
         mock_file().write.assert_called_once_with(
             "\n# 2023-01-01T12:34:56\ntest command\n"
         )
         mock_now.isoformat.assert_called_once_with(timespec="seconds")
 
+    def test_save_command_to_history_reuses_handle(self, tmp_path, monkeypatch):
+        history_file = tmp_path / "command_history.txt"
+        monkeypatch.setattr(cp_config, "COMMAND_HISTORY_FILE", str(history_file))
+
+        with patch("builtins.open", wraps=open) as mock_file:
+            cp_config.save_command_to_history("first")
+            cp_config.save_command_to_history("second")
+            mock_file.assert_called_once()
+
+        # Line buffering means entries are on disk without closing the handle
+        content = history_file.read_text()
+        assert "\nfirst\n" in content
+        assert "\nsecond\n" in content
+
     @patch("builtins.open")
     @patch("rich.console.Console")
     def test_save_command_to_history_handles_error(
@@ -690,6 +936,46 @@ class TestDefaultModelSelection:
         assert result == "gpt-5"
         mock_load_config.assert_called_once()
 
+    @patch("code_puppy.model_factory.ModelFactory.load_config")
+    def test_models_config_loaded_once_across_helpers(self, mock_load_config):
+        # Test that the default/vision/validation helpers share a single load
+        mock_load_config.return_value = {
+            "test-model-1": {"type": "openai", "supports_vision": True},
+        }
+
+        assert cp_config._default_model_from_models_json() == "test-model-1"
+        assert cp_config._default_vision_model_from_models_json() == "test-model-1"
+        assert cp_config._validate_model_exists("test-model-1") is True
+        mock_load_config.assert_called_once()
+
+        cp_config.clear_model_cache()
+        cp_config._validate_model_exists("test-model-1")
+        assert mock_load_config.call_count == 2
+
+    @patch("code_puppy.model_factory.ModelFactory.load_config")
+    def test_validate_model_exists_follows_models_file_changes(self, mock_load_config):
+        # Test that validation is not stale after models.json changes on disk
+        mock_load_config.return_value = {"old-model": {"type": "openai"}}
+        with patch("code_puppy.config._models_config_key", return_value=("v1",)):
+            assert cp_config._validate_model_exists("new-model") is False
+
+        mock_load_config.return_value = {"new-model": {"type": "openai"}}
+        with patch("code_puppy.config._models_config_key", return_value=("v2",)):
+            assert cp_config._validate_model_exists("new-model") is True
+
+    @patch("code_puppy.model_factory.ModelFactory.load_config")
+    def test_vision_and_vqa_defaults_use_capability_index(self, mock_load_config):
+        # Tagged models win over fallback candidates, which keep their priority order
+        mock_load_config.return_value = {
+            "gpt-4.1-nano": {"type": "openai"},
+            "gpt-4.1-mini": {"type": "openai"},
+            "tagged-vqa": {"type": "openai", "supports_vqa": True},
+        }
+
+        assert cp_config._default_vision_model_from_models_json() == "gpt-4.1-mini"
+        assert cp_config._default_vqa_model_from_models_json() == "tagged-vqa"
+        mock_load_config.assert_called_once()
+
     def test_default_model_from_models_json_actual_file(self):
         # Test that the actual preferred model from models.json is returned
         # This test uses the real models.json file to verify correct behavior
@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from code_puppy.command_line import sandbox_commands
+
+
+@pytest.fixture
+def mock_sandbox_config():
+    config = MagicMock()
+    with patch.object(sandbox_commands, "_get_sandbox_config", return_value=config):
+        yield config
+
+
+@pytest.mark.parametrize(
+    "subcommand,arg_name",
+    [
+        ("allow-domain", "domain"),
+        ("allow-path", "path"),
+        ("allow-read-path", "path"),
+    ],
+)
+def test_allow_usage_error_skips_config(subcommand, arg_name):
+    with (
+        patch.object(sandbox_commands, "_get_sandbox_config") as mock_get_config,
+        patch.object(sandbox_commands, "emit_error") as mock_emit_error,
+    ):
+        result = sandbox_commands.handle_sandbox_command(f"/sandbox {subcommand}")
+
+    assert result is True
+    mock_emit_error.assert_called_once_with(
+        f"Usage: /sandbox {subcommand} <{arg_name}>"
+    )
+    mock_get_config.assert_not_called()
+
+
+def test_allow_domain_rejects_whitespace(mock_sandbox_config):
+    with patch.object(sandbox_commands, "emit_error") as mock_emit_error:
+        result = sandbox_commands.handle_sandbox_command(
+            "/sandbox allow-domain example.com evil.com"
+        )
+
+    assert result is True
+    mock_emit_error.assert_called_once_with("Usage: /sandbox allow-domain <domain>")
+    mock_sandbox_config.add_allowed_domain.assert_not_called()
+
+
+def test_allow_path_preserves_whitespace(mock_sandbox_config):
+    with patch.object(sandbox_commands, "emit_success"):
+        sandbox_commands.handle_sandbox_command("/sandbox allow-path /tmp/my  dir")
+
+    mock_sandbox_config.add_allowed_write_path.assert_called_once_with("/tmp/my  dir")
+
+
+def test_unknown_subcommand_reports_error(mock_sandbox_config):
+    with (
+        patch.object(sandbox_commands, "emit_error") as mock_emit_error,
+        patch.object(sandbox_commands, "emit_info"),
+    ):
+        result = sandbox_commands.handle_sandbox_command("/sandbox bogus")
+
+    assert result is True
+    mock_emit_error.assert_called_once_with("Unknown subcommand: bogus")
+
+
+def test_missing_sandbox_dependency_reports_error():
+    with (
+        patch.dict("sys.modules", {"code_puppy.sandbox": None}),
+        patch.object(sandbox_commands, "emit_error") as mock_emit_error,
+    ):
+        result = sandbox_commands.handle_sandbox_command("/sandbox status")
+
+    assert result is True
+    mock_emit_error.assert_called_once_with(
+        "Sandboxing is not available in this installation"
+    )
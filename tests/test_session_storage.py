@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import zlib
 from pathlib import Path
 from typing import Callable, List
 
@@ -51,6 +52,24 @@ def test_save_and_load_session(tmp_path: Path, history: List[str], token_estimat
     assert loaded_history == history
 
 
+def test_save_and_load_compressed_session(
+    tmp_path: Path, history: List[str], token_estimator
+):
+    metadata = save_session(
+        history=history,
+        session_name="packed",
+        base_dir=tmp_path,
+        timestamp="2024-01-01T00:00:00",
+        token_estimator=token_estimator,
+        auto_saved=True,
+        compress=True,
+    )
+
+    assert zlib.decompress(metadata.pickle_path.read_bytes())
+    assert load_session("packed", tmp_path) == history
+    assert list_sessions(tmp_path) == ["packed"]
+
+
 def test_list_sessions(tmp_path: Path, history: List[str], token_estimator):
     names = ["beta", "alpha", "gamma"]
     for name in names:
@@ -0,0 +1,238 @@
+"""Tests for code_puppy.tools.command_runner shell execution."""
+
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from code_puppy.tools import command_runner
+from code_puppy.tools.command_runner import _LineSplitter, run_shell_command_streaming
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="uses POSIX shell commands"
+)
+
+
+def _spawn(command: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+
+
+@pytest.fixture(autouse=True)
+def quiet_messages():
+    """Keep streamed output and the failure pause out of the tests."""
+    with (
+        patch.object(command_runner, "emit_system_message"),
+        patch.object(command_runner, "emit_error"),
+        patch.object(command_runner, "emit_info"),
+        patch.object(command_runner.time, "sleep"),
+    ):
+        yield
+
+
+def test_streaming_collects_output_and_exit_code():
+    result = run_shell_command_streaming(
+        _spawn("echo out; echo err >&2; exit 3"), command="cmd"
+    )
+
+    assert result.exit_code == 3
+    assert result.stdout == "out"
+    assert result.stderr == "err"
+    assert not result.timeout
+
+
+def test_streaming_notices_exit_promptly():
+    start = time.monotonic()
+    result = run_shell_command_streaming(_spawn("true"), timeout=30)
+
+    assert result.success
+    assert time.monotonic() - start < 5
+
+
+def test_streaming_kills_on_inactivity_timeout():
+    process = _spawn("sleep 30")
+    result = run_shell_command_streaming(process, timeout=1)
+
+    assert result.timeout
+    assert process.wait(timeout=5) is not None
+
+
+def test_streaming_falls_back_without_exit_handle():
+    with patch.object(command_runner, "_open_exit_handle", return_value=None):
+        result = run_shell_command_streaming(_spawn("echo hi"))
+
+    assert result.stdout == "hi"
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "pidfd_open") and not hasattr(select, "kqueue"),
+    reason="no exit handle support",
+)
+def test_streaming_does_not_poll_while_output_flows():
+    process = _spawn("for i in 1 2 3 4 5; do echo $i; sleep 0.05; done")
+    with patch.object(process, "poll", wraps=process.poll) as mock_poll:
+        result = run_shell_command_streaming(process)
+
+    assert result.stdout == "1\n2\n3\n4\n5"
+    assert mock_poll.call_count <= 2
+
+
+def test_streaming_splits_lines_like_text_mode():
+    result = run_shell_command_streaming(
+        _spawn("printf 'a\\r\\nb\\rc\\n\\nd'; printf '\\377' >&2")
+    )
+
+    assert result.stdout == "a\nb\nc\n\nd"
+    assert result.stderr == "\ufffd"
+
+
+def test_line_splitter_handles_split_line_endings():
+    splitter = _LineSplitter()
+
+    assert splitter.feed(b"one\ntwo\r") == ["one", "two"]
+    assert splitter.feed(b"\nthr") == []
+    assert splitter.feed(b"ee", final=True) == ["three"]
+
+
+def test_line_splitter_drops_overlong_tail_before_decoding():
+    splitter = _LineSplitter()
+    limit = command_runner.MAX_LINE_LENGTH
+
+    assert splitter.feed(b"x" * 100_000) == []
+    assert splitter.feed(b"y" * 100_000 + b"\nshort\n") == [
+        "x" * limit + "... [truncated]",
+        "short",
+    ]
+    assert len(splitter._pending) == 0
+
+
+@pytest.mark.parametrize("size", [1, 255, 256, 257, 1024, 5000])
+def test_line_splitter_whole_and_split_lines_match(size):
+    line = ("é" * size).encode()
+    whole = _LineSplitter().feed(line + b"\n")
+    split = _LineSplitter()
+
+    assert split.feed(line[:1]) == []
+    assert split.feed(line[1:] + b"\n") == whole
+
+
+def test_streaming_reader_threads_fallback():
+    process = _spawn("echo out; echo err >&2")
+    with patch.object(command_runner, "_IS_WINDOWS", True):
+        result = run_shell_command_streaming(process)
+
+    assert (result.stdout, result.stderr) == ("out", "err")
+
+
+def test_streaming_keeps_only_output_tail():
+    result = run_shell_command_streaming(_spawn("seq 1 1000"))
+
+    lines = result.stdout.split("\n")
+    assert len(lines) == command_runner._OUTPUT_TAIL_LINES
+    assert lines[-1] == "1000"
+
+
+def test_keyboard_context_reuses_one_listener_thread(monkeypatch):
+    listens = []
+
+    def fake_listen(stop_event, on_escape):
+        listens.append(threading.current_thread())
+        stop_event.wait(5)
+
+    monkeypatch.setattr(command_runner, "_SHELL_CTRL_X_THREAD", None)
+    monkeypatch.setattr(command_runner, "is_tui_mode", lambda: False)
+    monkeypatch.setattr(command_runner, "_listen_for_ctrl_x_posix", fake_listen)
+    monkeypatch.setattr(command_runner.sys.stdin, "isatty", lambda: True, raising=False)
+
+    for runs in (1, 2):
+        with command_runner._shell_command_keyboard_context():
+            deadline = time.monotonic() + 5
+            while len(listens) < runs and time.monotonic() < deadline:
+                time.sleep(0.01)
+        assert command_runner._SHELL_CTRL_X_IDLE.is_set()
+
+    assert len(listens) == 2
+    assert listens[0] is listens[1] is command_runner._SHELL_CTRL_X_THREAD
+
+
+def test_kill_process_group_returns_once_process_exits():
+    process = _spawn("sleep 30")
+
+    start = time.monotonic()
+    command_runner._kill_process_group(process)
+
+    assert process.returncode is not None
+    assert time.monotonic() - start < 0.9
+
+
+def test_process_registry_is_keyed_by_pid(monkeypatch):
+    from unittest.mock import MagicMock
+
+    monkeypatch.setattr(command_runner, "_RUNNING_PROCESSES", {})
+    old, new = MagicMock(pid=42), MagicMock(pid=42)
+
+    command_runner._register_process(old)
+    command_runner._register_process(new)
+    # A stale unregister must not drop the process now holding the pid
+    command_runner._unregister_process(old)
+    assert command_runner.get_running_shell_process_count() == 1
+
+    command_runner._unregister_process(new)
+    assert command_runner.get_running_shell_process_count() == 0
+
+
+def test_posix_ctrl_x_listener_reads_keystrokes_in_batches(monkeypatch):
+    import os
+    import pty
+
+    master, slave = pty.openpty()
+    monkeypatch.setattr(command_runner.sys, "stdin", os.fdopen(slave, "r"))
+    stop = threading.Event()
+    pressed = []
+
+    def on_escape():
+        pressed.append(True)
+        stop.set()
+
+    listener = threading.Thread(
+        target=command_runner._listen_for_ctrl_x_posix, args=(stop, on_escape)
+    )
+    listener.start()
+    # Entering cbreak mode flushes pending input, so type once it is set
+    threading.Event().wait(0.2)
+    os.write(master, b"pasted text\x18more")
+    listener.join(timeout=5)
+    stop.set()
+    command_runner.sys.stdin.close()
+    os.close(master)
+
+    assert pressed == [True]
+
+
+def test_streaming_does_not_wait_on_background_children():
+    start = time.monotonic()
+    result = run_shell_command_streaming(_spawn("echo done; sleep 10 &"))
+
+    assert result.stdout == "done"
+    assert time.monotonic() - start < 3
+
+
+def test_windows_kill_skips_taskkill_for_exited_process(monkeypatch):
+    process = _spawn("true")
+    process.wait()
+    monkeypatch.setattr(command_runner, "_IS_WINDOWS", True)
+
+    with patch.object(command_runner.subprocess, "run") as mock_run:
+        command_runner._kill_process_group(process)
+
+    mock_run.assert_not_called()